@@ -0,0 +1,47 @@
+"""
+Настройки gunicorn для production:
+
+    gunicorn --config config/gunicorn.py
+
+Воркеры gthread: каждый поток держит своё постоянное соединение с базой
+(CONN_MAX_AGE), поэтому пул соединений воркера - GUNICORN_THREADS, а всего
+приложение открывает workers * threads соединений. Это число должно
+помещаться в max_connections Postgres с запасом для миграций и
+администрирования, иначе при запуске пишется предупреждение.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "config.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:9000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+# Воркеры перезапускаются по очереди, чтобы не накапливать память.
+max_requests = 1000
+max_requests_jitter = 100
+accesslog = "-"
+
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", 100))
+DB_RESERVED_CONNECTIONS = int(os.environ.get("DB_RESERVED_CONNECTIONS", 10))
+
+
+def on_starting(server):
+    pool_size = workers * threads
+    available = DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS
+    server.log.info(
+        "Database connections: %s workers x %s threads = %s of %s available",
+        workers,
+        threads,
+        pool_size,
+        available,
+    )
+    if pool_size > available:
+        server.log.warning(
+            "Workers may open %s connections, more than %s available: "
+            "lower GUNICORN_WORKERS/GUNICORN_THREADS or raise max_connections",
+            pool_size,
+            available,
+        )
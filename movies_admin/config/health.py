@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from django.http import JsonResponse
+
+
+class DatabaseHealthCheckMiddleware:
+    """
+    Проверка постоянных соединений с базой (в Django 3.2 нет
+    CONN_HEALTH_CHECKS). Если соединение простояло без запросов дольше
+    CONN_HEALTH_CHECK_INTERVAL, перед запросом выполняется SELECT 1, и
+    разорванное соединение закрывается: запрос откроет новое, а не упадёт
+    на старом.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.interval = getattr(settings, "CONN_HEALTH_CHECK_INTERVAL", 30)
+
+    def __call__(self, request):
+        now = time.monotonic()
+        for db in connections.all():
+            idle = now - getattr(db, "last_request_at", now)
+            if db.connection is not None and idle > self.interval:
+                if not db.is_usable():
+                    db.close()
+        try:
+            return self.get_response(request)
+        finally:
+            for db in connections.all():
+                db.last_request_at = time.monotonic()
+
+
+def healthz(request):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError as error:
+        return JsonResponse({"status": "error", "database": str(error)}, status=503)
+    return JsonResponse({"status": "ok"})
@@ -28,10 +28,12 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "movies",
 ]
 
 MIDDLEWARE = [
+    "config.sql_budget.SQLBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -119,3 +121,64 @@ STATIC_URL = "/static/"
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Форма кинопроизведения с несколькими сотнями участников передаёт по
+# четыре-пять полей на строку inline, стандартного лимита в 1000 не хватает.
+
+DATA_UPLOAD_MAX_NUMBER_FIELDS = int(
+    os.environ.get("DATA_UPLOAD_MAX_NUMBER_FIELDS", 10_000)
+)
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Кеш кинопроизведений API: по умолчанию LRU в памяти процесса, для общего
+# кеша между процессами - FileBasedCache или DatabaseCache (после
+# python manage.py createcachetable).
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "filmworks": {
+        "BACKEND": os.environ.get(
+            "FILMWORK_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("FILMWORK_CACHE_LOCATION", "filmworks"),
+        "TIMEOUT": int(os.environ.get("FILMWORK_CACHE_TIMEOUT", 3600)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("FILMWORK_CACHE_MAX_ENTRIES", 10_000)),
+        },
+    },
+}
+
+# Раз во сколько секунд каждый процесс пишет в лог movies.cache счётчики
+# попаданий кеша кинопроизведений, 0 - не писать.
+FILMWORK_CACHE_STATS_INTERVAL = int(
+    os.environ.get("FILMWORK_CACHE_STATS_INTERVAL", 300)
+)
+
+# Учёт SQL-запросов по HTTP-запросам (config/sql_budget.py).
+
+SQL_BUDGET_SAMPLE_RATE = float(os.environ.get("SQL_BUDGET_SAMPLE_RATE", 1.0))
+SQL_BUDGET_MAX_QUERIES = int(os.environ.get("SQL_BUDGET_MAX_QUERIES", 50))
+SQL_BUDGET_DUPLICATE_THRESHOLD = 5
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "sql_budget": {
+            "handlers": ["console"],
+            "level": os.environ.get("SQL_BUDGET_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "movies.cache": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
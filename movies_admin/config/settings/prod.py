@@ -0,0 +1,41 @@
+import os
+
+from .base import *
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host for host in os.environ.get("ALLOWED_HOSTS", "").split(",") if host
+]
+
+# Статику админки раздаёт само приложение через WhiteNoise: файлы
+# собирает collectstatic при сборке образа, имена с хэшем содержимого
+# отдаются с бессрочным кешированием.
+STATIC_ROOT = BASE_DIR.parent / "static"
+STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# Постоянные соединения: каждый поток воркера gunicorn держит своё
+# соединение до DB_CONN_MAX_AGE секунд вместо нового на каждый запрос.
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 600))
+
+# Соединение, простоявшее дольше этого интервала, проверяется перед запросом.
+CONN_HEALTH_CHECK_INTERVAL = int(os.environ.get("DB_CONN_HEALTH_CHECK_INTERVAL", 30))
+
+# Кеш кинопроизведений и фасетов общий для всех воркеров gunicorn: с кешем
+# в памяти процесса сброс после записи доходит только до воркера, который её
+# обработал. По умолчанию - файлы в томе filmwork-cache (docker-compose.yaml).
+CACHES["filmworks"]["BACKEND"] = os.environ.get(
+    "FILMWORK_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+)
+CACHES["filmworks"]["LOCATION"] = os.environ.get(
+    "FILMWORK_CACHE_LOCATION", "/var/cache/movies_admin/filmworks"
+)
+
+# Учёт SQL - для доли запросов, чтобы не нагружать каждый.
+SQL_BUDGET_SAMPLE_RATE = float(os.environ.get("SQL_BUDGET_SAMPLE_RATE", 0.01))
+
+MIDDLEWARE = ["config.health.DatabaseHealthCheckMiddleware", *MIDDLEWARE]
+MIDDLEWARE.insert(
+    MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+)
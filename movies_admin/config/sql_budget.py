@@ -0,0 +1,147 @@
+"""
+Учёт SQL-запросов по HTTP-запросам: число запросов, суммарное время и
+повторяющиеся формы запросов, похожие на N+1.
+
+Запросы перехватываются через connection.execute_wrapper, поэтому учёт
+работает без DEBUG. В production он включается для доли запросов
+SQL_BUDGET_SAMPLE_RATE, для остальных стоимость - один вызов random().
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger("sql_budget")
+
+# С этого числа повторов одна форма запроса считается признаком N+1.
+DUPLICATE_THRESHOLD = 5
+MAX_QUERIES = 50
+SHAPE_LENGTH = 200
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def query_shape(sql: str) -> str:
+    """Запрос без литералов и с одним %s вместо списка параметров IN (...)."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("%s", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryRecorder:
+    """Обёртка для connection.execute_wrapper, считающая запросы и их формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def duplicates(self, threshold: int = DUPLICATE_THRESHOLD) -> list:
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def violations(self, max_queries: int, threshold: int) -> list:
+        problems = [
+            f"{count} x {shape[:SHAPE_LENGTH]}"
+            for shape, count in self.duplicates(threshold)
+        ]
+        if self.count > max_queries:
+            problems.insert(0, f"{self.count} queries, budget {max_queries}")
+        return problems
+
+
+@contextmanager
+def record_queries(using=None):
+    """Учитывает запросы ко всем базам или к базе using внутри блока."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else [db.alias for db in connections.all()]
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def assert_sql_budget(
+    max_queries: int,
+    duplicate_threshold: int = DUPLICATE_THRESHOLD,
+    using: str = DEFAULT_DB_ALIAS,
+):
+    """
+    Проверка для тестов: блок выполняет не больше max_queries запросов и
+    ни одна форма запроса не повторяется duplicate_threshold раз.
+
+        with assert_sql_budget(10):
+            client.get(url)
+    """
+    with record_queries(using) as recorder:
+        yield recorder
+    problems = recorder.violations(max_queries, duplicate_threshold)
+    if problems:
+        raise AssertionError("SQL budget exceeded: " + "; ".join(problems))
+
+
+class SQLBudgetMiddleware:
+    """
+    Пишет в лог sql_budget строку JSON на каждый учтённый запрос. Запросы
+    с повторяющимися формами или сверх SQL_BUDGET_MAX_QUERIES пишутся с
+    уровнем WARNING. Запросы при отдаче StreamingHttpResponse выполняются
+    после middleware и не учитываются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "SQL_BUDGET_SAMPLE_RATE", 1.0)
+        self.max_queries = getattr(settings, "SQL_BUDGET_MAX_QUERIES", MAX_QUERIES)
+        self.duplicate_threshold = getattr(
+            settings, "SQL_BUDGET_DUPLICATE_THRESHOLD", DUPLICATE_THRESHOLD
+        )
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        over_budget = recorder.count > self.max_queries
+        logger.log(
+            logging.WARNING if duplicates or over_budget else logging.INFO,
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "queries": recorder.count,
+                    "sql_ms": round(recorder.duration * 1000, 2),
+                    "over_budget": over_budget,
+                    "n_plus_one": [
+                        {"count": count, "shape": shape[:SHAPE_LENGTH]}
+                        for shape, count in duplicates
+                    ],
+                },
+                ensure_ascii=False,
+            ),
+        )
+        return response
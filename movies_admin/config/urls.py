@@ -1,6 +1,10 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from config.health import healthz
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/", include("movies.api.urls")),
+    path("healthz/", healthz),
 ]
@@ -1,37 +1,177 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import DatabaseError
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.translation import gettext_lazy as _
+
+from movies.dedup import merge_persons, selection_duplicates
+from movies.exchange import CONTENT_TYPES, export_lines, import_catalog
+from movies.facets import (
+    GenreFacetFilter,
+    RatingFacetFilter,
+    TypeFacetFilter,
+    YearFacetFilter,
+)
+from movies.forms import CatalogImportForm
+from movies.inlines import BatchedAutocompleteInlineMixin
 from movies.models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
+from movies.pagination import EstimatedCountPaginator, KeysetChangeList
+from movies.search import FullTextSearchMixin, TrigramSearchMixin
 
 
-class GenreFilmworkInline(admin.TabularInline):
+class GenreFilmworkInline(BatchedAutocompleteInlineMixin, admin.TabularInline):
     model = GenreFilmwork
     fields = ("genre",)
+    autocomplete_fields = ("genre",)
     extra = 0
 
 
-class PersonFilmworkInline(admin.TabularInline):
+class PersonFilmworkInline(BatchedAutocompleteInlineMixin, admin.TabularInline):
     model = PersonFilmwork
     fields = ("person", "role")
+    autocomplete_fields = ("person",)
     extra = 0
 
 
 @admin.register(Filmwork)
-class FilmworkAdmin(admin.ModelAdmin):
-    list_display = ("title", "type", "creation_date", "rating")
+class FilmworkAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = (
+        "title",
+        "type",
+        "creation_date",
+        "rating",
+        "genres_list",
+        "directors_list",
+        "actors_count",
+    )
+    # Жанры и участники читаются из сводки одним соединением.
+    list_select_related = ("summary",)
+    list_filter = (
+        TypeFacetFilter,
+        RatingFacetFilter,
+        YearFacetFilter,
+        GenreFacetFilter,
+    )
+    search_fields = ("title", "description")
     readonly_fields = ("id",)
-    ordering = ("title",)
+    ordering = ("title", "id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     inlines = [GenreFilmworkInline, PersonFilmworkInline]
+    actions = ("export_csv", "export_jsonl")
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="movies_filmwork_import",
+            ),
+            *super().get_urls(),
+        ]
+
+    @admin.action(description=_("Выгрузить в CSV"))
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, "csv")
+
+    @admin.action(description=_("Выгрузить в JSON Lines"))
+    def export_jsonl(self, request, queryset):
+        return self.export_response(queryset, "jsonl")
+
+    def export_response(self, queryset, export_format: str):
+        response = StreamingHttpResponse(
+            export_lines(queryset, export_format),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="filmworks.{export_format}"'
+        return response
+
+    def import_view(self, request):
+        if not (
+            self.has_add_permission(request) and self.has_change_permission(request)
+        ):
+            raise PermissionDenied
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data["file"].file, encoding="utf-8", newline=""
+            )
+            try:
+                counts = import_catalog(stream, form.cleaned_data["format"])
+            except (ValueError, KeyError, DatabaseError) as error:
+                self.message_user(request, f"Import failed: {error!r}", messages.ERROR)
+            else:
+                self.message_user(
+                    request,
+                    ", ".join(f"{name}: {count}" for name, count in counts.items()),
+                )
+                return redirect("admin:movies_filmwork_changelist")
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "form": form,
+            "title": _("Загрузка кинопроизведений"),
+        }
+        return TemplateResponse(request, "admin/movies/filmwork/import.html", context)
+
+    @admin.display(description=_("Жанры"))
+    def genres_list(self, obj):
+        summary = getattr(obj, "summary", None)
+        return ", ".join(summary.genres) if summary else ""
+
+    @admin.display(description=_("Режиссёры"))
+    def directors_list(self, obj):
+        summary = getattr(obj, "summary", None)
+        return ", ".join(summary.directors) if summary else ""
+
+    @admin.display(description=_("Актёров"))
+    def actors_count(self, obj):
+        summary = getattr(obj, "summary", None)
+        return summary.actors_count if summary else 0
 
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ("name",)
+    search_fields = ("name",)
+    trigram_field = "name"
     fields = ("name", "description")
     ordering = ("name",)
+    paginator = EstimatedCountPaginator
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ("full_name",)
+    search_fields = ("full_name",)
+    trigram_field = "full_name"
     fields = ("full_name", "birth_date")
-    ordering = ("full_name",)
+    ordering = ("full_name", "id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("merge_duplicates",)
+
+    @admin.action(
+        description=_("Объединить выбранных с их дубликатами"),
+        permissions=("change", "delete"),
+    )
+    def merge_duplicates(self, request, queryset):
+        groups = list(selection_duplicates(queryset))
+        if not groups:
+            self.message_user(request, _("Дубликаты не найдены"), messages.WARNING)
+            return
+        counts = merge_persons(groups)
+        self.message_user(
+            request, ", ".join(f"{name}: {count}" for name, count in counts.items())
+        )
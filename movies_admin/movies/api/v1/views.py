@@ -0,0 +1,178 @@
+import uuid
+from collections import defaultdict
+
+from django import forms
+from django.db.models import F, Q
+from django.http import Http404, JsonResponse
+from django.views import View
+from django.views.generic.detail import BaseDetailView
+from django.views.generic.list import BaseListView
+
+from movies.cache import filmwork_cache
+from movies.changes import CHANGES_BATCH_SIZE, MAX_CHANGES_BATCH_SIZE, read_changes
+from movies.models import Filmwork
+from movies.pagination import decode_cursor, encode_cursor
+
+FILMWORK_FIELDS = ("id", "title", "description", "creation_date", "rating", "type")
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class FilmworkFilterForm(forms.Form):
+    type = forms.CharField(required=False)
+    rating_min = forms.FloatField(required=False)
+    rating_max = forms.FloatField(required=False)
+    creation_date_from = forms.DateField(required=False)
+    creation_date_to = forms.DateField(required=False)
+    page_size = forms.IntegerField(required=False, min_value=1, max_value=MAX_PAGE_SIZE)
+    cursor = forms.CharField(required=False)
+
+    def clean_cursor(self):
+        token = self.cleaned_data["cursor"]
+        if not token:
+            return None
+        # Курсор - (title, id) последней строки предыдущей страницы.
+        cursor = decode_cursor(token)
+        if cursor is None or len(cursor) != 2 or not isinstance(cursor[0], str):
+            raise forms.ValidationError("Invalid cursor")
+        title, pk = cursor
+        try:
+            return title, uuid.UUID(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise forms.ValidationError("Invalid cursor")
+
+    def filters(self) -> Q:
+        data = self.cleaned_data
+        lookups = {
+            "type": data["type"],
+            "rating__gte": data["rating_min"],
+            "rating__lte": data["rating_max"],
+            "creation_date__gte": data["creation_date_from"],
+            "creation_date__lte": data["creation_date_to"],
+        }
+        return Q(
+            **{key: value for key, value in lookups.items() if value not in ("", None)}
+        )
+
+
+class ChangesForm(forms.Form):
+    after = forms.IntegerField(required=False, min_value=0)
+    limit = forms.IntegerField(
+        required=False, min_value=1, max_value=MAX_CHANGES_BATCH_SIZE
+    )
+
+
+class MoviesApiMixin:
+    """
+    Кинопроизведения с жанрами и участниками одним запросом: связи берутся
+    из сводки content.film_summary, которую поддерживают триггеры в базе.
+    """
+
+    model = Filmwork
+    http_method_names = ["get"]
+
+    def get_queryset(self):
+        return Filmwork.objects.values(*FILMWORK_FIELDS).annotate(
+            genres=F("summary__genres"), persons=F("summary__persons")
+        )
+
+    @staticmethod
+    def serialize(filmwork: dict) -> dict:
+        persons = defaultdict(list)
+        for person in filmwork["persons"] or ():
+            persons[person.pop("role")].append(person)
+        return {
+            **filmwork,
+            "genres": filmwork["genres"] or [],
+            "persons": dict(persons),
+        }
+
+    def render_to_response(self, context, **response_kwargs):
+        return JsonResponse(context, **response_kwargs)
+
+
+class MoviesListApi(MoviesApiMixin, BaseListView):
+    """
+    Список кинопроизведений по (title, id) с навигацией по курсору:
+    ответ содержит курсор следующей страницы, который передаётся в
+    параметре cursor.
+    """
+
+    def get(self, request, *args, **kwargs):
+        form = FilmworkFilterForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        page_size = form.cleaned_data["page_size"] or PAGE_SIZE
+        queryset = self.get_queryset().filter(form.filters()).order_by("title", "id")
+        cursor = form.cleaned_data["cursor"]
+        if cursor:
+            title, pk = cursor
+            queryset = queryset.filter(
+                Q(title__gte=title) & (Q(title__gt=title) | Q(title=title, id__gt=pk))
+            )
+        rows = list(queryset[: page_size + 1])
+        results = [self.serialize(row) for row in rows[:page_size]]
+        next_cursor = None
+        if len(rows) > page_size:
+            last = results[-1]
+            next_cursor = encode_cursor((last["title"], str(last["id"])))
+        return self.render_to_response({"next": next_cursor, "results": results})
+
+
+class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
+    """Кинопроизведение по id, собранное представление берётся из кеша."""
+
+    cache = filmwork_cache
+
+    def get_object(self, queryset=None):
+        queryset = self.get_queryset() if queryset is None else queryset
+        pk = self.kwargs["pk"]
+        self.cache_hit = True
+
+        def build():
+            self.cache_hit = False
+            filmwork = queryset.filter(pk=pk).first()
+            return filmwork and self.serialize(filmwork)
+
+        filmwork = self.cache.get_or_build(pk, build)
+        if filmwork is None:
+            raise Http404("Filmwork not found")
+        return filmwork
+
+    def get_context_data(self, **kwargs):
+        return self.object
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        response["X-Cache"] = "HIT" if self.cache_hit else "MISS"
+        return response
+
+
+class ChangesApi(View):
+    """
+    Пакет изменений каталога после номера after для индексаторов. Ответ
+    содержит last_seq, который передаётся в after следующего запроса.
+    """
+
+    http_method_names = ["get"]
+
+    def get(self, request, *args, **kwargs):
+        form = ChangesForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        batch = read_changes(
+            form.cleaned_data["after"] or 0,
+            form.cleaned_data["limit"] or CHANGES_BATCH_SIZE,
+        )
+        return JsonResponse(
+            {
+                "last_seq": batch.last_seq,
+                "entries": batch.entries,
+                "has_more": batch.has_more,
+                "full_resync": batch.full_resync,
+                "filmwork_ids": sorted(batch.filmwork_ids),
+                "objects": {
+                    source: sorted(ids) for source, ids in batch.object_ids.items()
+                },
+            }
+        )
@@ -1,8 +1,25 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import pre_migrate
 from django.utils.translation import gettext_lazy as _
 
 
+def create_content_schema(using, **kwargs):
+    """
+    Таблицы приложения лежат в схеме content, которую создаёт
+    db_schema.sql, а не миграции. Без неё миграции не применяются к новой
+    базе, например к тестовой.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS content")
+
+
 class MoviesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "movies"
     verbose_name = _("Кинотеатр")
+
+    def ready(self):
+        from movies import signals  # noqa: F401
+
+        pre_migrate.connect(create_content_schema, sender=self)
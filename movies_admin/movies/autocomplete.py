@@ -0,0 +1,68 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения, который берёт подпись выбранного значения из уже
+    загруженного связанного объекта, а не отдельным запросом на каждую строку.
+    """
+
+    preloaded_labels: dict = {}
+
+    def optgroups(self, name, value, attr=None):
+        selected = [
+            str(item)
+            for item in value
+            if str(item) not in self.choices.field.empty_values
+        ]
+        if not selected or any(item not in self.preloaded_labels for item in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, "", "", False, 0))
+        for item in selected:
+            options.append(
+                self.create_option(
+                    name, item, self.preloaded_labels[item], True, len(options)
+                )
+            )
+        return [(None, options, 0)]
+
+
+class PreloadedInlineFormSet(BaseInlineFormSet):
+    """Передаёт виджетам автодополнения связанные объекты строк inline."""
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if form.instance.pk is None:
+            return form
+        for name, field in form.fields.items():
+            widget = getattr(field.widget, "widget", field.widget)
+            if isinstance(widget, PreloadedAutocompleteSelect):
+                related = getattr(form.instance, name)
+                widget.preloaded_labels = {str(related.pk): str(related)}
+        return form
+
+
+class PreloadedAutocompleteInlineMixin:
+    """
+    Inline со связями через автодополнение: связанные объекты загружаются
+    вместе со строками через select_related, поэтому стоимость страницы
+    зависит от числа строк inline, а не от размера справочника.
+    """
+
+    formset = PreloadedInlineFormSet
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.select_related(*self.get_autocomplete_fields(request))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if "widget" not in kwargs and db_field.name in self.get_autocomplete_fields(
+            request
+        ):
+            kwargs["widget"] = PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+FILMWORK_CACHE_ALIAS = "filmworks"
+
+logger = logging.getLogger("movies.cache")
+
+
+class FilmworkCache:
+    """
+    Кеш собранных представлений кинопроизведений (фильм с жанрами и
+    участниками) по id. Хранилище - любой кеш Django из settings.CACHES,
+    записи сбрасываются сигналами из movies.signals.
+
+    Счётчики попаданий и промахов ведутся в памяти процесса, поэтому раз в
+    stats_interval секунд (при первом обращении после истечения интервала)
+    каждый процесс пишет их в лог movies.cache строкой JSON со своим pid и
+    обнуляет. По сумме строк всех воркеров считается доля попаданий всего
+    сервиса.
+    """
+
+    key_prefix = "filmwork"
+
+    def __init__(
+        self, alias: str = FILMWORK_CACHE_ALIAS, stats_interval: Optional[float] = None
+    ):
+        self.alias = alias
+        if stats_interval is None:
+            stats_interval = getattr(settings, "FILMWORK_CACHE_STATS_INTERVAL", 0)
+        self.stats_interval = stats_interval
+        self.hits = 0
+        self.misses = 0
+        self._stats_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, pk) -> str:
+        return f"{self.key_prefix}:{pk}"
+
+    def get_or_build(self, pk, build: Callable[[], Optional[dict]]) -> Optional[dict]:
+        value = self.cache.get(self.key(pk))
+        self._count(hit=value is not None)
+        if value is None:
+            value = build()
+            if value is not None:
+                self.cache.set(self.key(pk), value)
+        return value
+
+    def invalidate(self, pks: Iterable) -> None:
+        keys = [self.key(pk) for pk in set(pks)]
+        if keys:
+            self.cache.delete_many(keys)
+
+    def clear(self) -> None:
+        """Сбрасывает все записи, для изменений в обход сигналов моделей."""
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return self._stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = 0
+            self._stats_started = time.monotonic()
+
+    def _stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else None,
+        }
+
+    def _count(self, hit: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            seconds = now - self._stats_started
+            if not self.stats_interval or seconds < self.stats_interval:
+                return
+            stats = self._stats()
+            self.hits = self.misses = 0
+            self._stats_started = now
+        logger.info(
+            json.dumps(
+                {
+                    "pid": os.getpid(),
+                    "cache": self.alias,
+                    "seconds": round(seconds, 1),
+                    **stats,
+                }
+            )
+        )
+
+
+filmwork_cache = FilmworkCache()
@@ -0,0 +1,60 @@
+"""
+Чтение журнала изменений каталога content.change_outbox.
+
+Потребитель хранит номер последней обработанной записи и запрашивает
+изменения после него пакетами. Записи читаются по индексу seq, поэтому
+работа пропорциональна числу изменений, а не размеру каталога. Записи
+пакета объединяются: фильм, изменённый несколько раз, попадает в пакет
+один раз.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.utils import timezone
+
+from movies.models import CatalogChange
+
+CHANGES_BATCH_SIZE = 500
+MAX_CHANGES_BATCH_SIZE = 5000
+
+
+@dataclass
+class ChangeBatch:
+    """
+    Изменения после номера after. При full_resync среди записей была
+    очистка таблицы, и потребитель должен перечитать каталог целиком.
+    """
+
+    last_seq: int
+    entries: int = 0
+    has_more: bool = False
+    full_resync: bool = False
+    filmwork_ids: set = field(default_factory=set)
+    # Таблица -> id изменённых объектов: фильмов, жанров или персон.
+    object_ids: dict = field(default_factory=dict)
+
+
+def read_changes(after: int = 0, limit: int = CHANGES_BATCH_SIZE) -> ChangeBatch:
+    entries = list(
+        CatalogChange.objects.filter(seq__gt=after)
+        .order_by("seq")
+        .values_list("seq", "source", "filmwork_ids", "object_ids")[: limit + 1]
+    )
+    batch = ChangeBatch(last_seq=after, has_more=len(entries) > limit)
+    for seq, source, filmwork_ids, object_ids in entries[:limit]:
+        batch.last_seq = seq
+        batch.entries += 1
+        if filmwork_ids is None:
+            batch.full_resync = True
+        else:
+            batch.filmwork_ids.update(filmwork_ids)
+        batch.object_ids.setdefault(source, set()).update(object_ids)
+    return batch
+
+
+def prune_changes(older_than: timedelta) -> int:
+    """Удаляет пронумерованные записи старше older_than."""
+    deleted, _ = CatalogChange.objects.filter(
+        seq__isnull=False, created_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
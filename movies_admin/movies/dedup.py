@@ -0,0 +1,289 @@
+"""
+Поиск и объединение дубликатов персон.
+
+Персоны разбиваются на блоки по ключу content.person_name_key(full_name):
+имя в нижнем регистре без диакритики и лишних пробелов. Пары сравниваются
+только внутри блока, поэтому работа растёт с числом персон линейно, а не
+квадратично. Блоки читаются одним запросом в порядке ключа серверным
+курсором, память не зависит от размера справочника. Для персон,
+выбранных в админке, блоки их ключей читаются со всего справочника по
+индексу person_name_key_idx.
+
+Объединение переносит связи дубликатов на оставляемую персону несколькими
+запросами на пакет групп, не нарушая уникальность (фильм, персона, роль).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from difflib import SequenceMatcher
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from movies.cache import filmwork_cache
+from movies.models import PersonNameKey
+
+MIN_SCORE = 0.8
+# Очень распространённые имена без дат рождения дают большие блоки, в
+# которых совпадение ключа ничего не говорит о человеке.
+MAX_BLOCK_SIZE = 50
+MERGE_BATCH_SIZE = 5000
+# Множитель оценки, если дата рождения известна не у обоих.
+MISSING_BIRTH_DATE_FACTOR = 0.9
+ITERATOR_CHUNK_SIZE = 5000
+
+CANDIDATES_SQL = """
+SELECT p.name_key, p.id, p.full_name, p.birth_date, p.created_at,
+       coalesce(c.credits, 0)
+FROM (
+    SELECT *, count(*) OVER (PARTITION BY name_key) AS block_size
+    FROM (
+        SELECT content.person_name_key(full_name) AS name_key,
+               id, full_name, birth_date, created_at
+        FROM content.person
+    ) keyed
+) p
+LEFT JOIN (
+    SELECT person_id, count(*) AS credits
+    FROM content.person_filmwork
+    GROUP BY person_id
+) c ON c.person_id = p.id
+WHERE p.block_size BETWEEN 2 AND %s
+ORDER BY p.name_key, p.id
+"""
+
+# Блоки с заданными ключами. Условие по выражению индекса
+# person_name_key_idx, число связей - по индексу person_filmwork_person_idx.
+BLOCKS_SQL = """
+SELECT content.person_name_key(p.full_name) AS name_key,
+       p.id, p.full_name, p.birth_date, p.created_at,
+       (SELECT count(*) FROM content.person_filmwork pfw WHERE pfw.person_id = p.id)
+FROM content.person p
+WHERE content.person_name_key(p.full_name) = ANY(%s)
+ORDER BY name_key, p.id
+"""
+
+STAGING_SQL = """
+CREATE TEMP TABLE person_merge (
+    duplicate_id uuid PRIMARY KEY,
+    keep_id uuid NOT NULL
+) ON COMMIT DROP;
+INSERT INTO person_merge (duplicate_id, keep_id)
+SELECT * FROM unnest(%s::uuid[], %s::uuid[]);
+ANALYZE person_merge;
+"""
+
+# Запросы объединения выполняются по порядку, именованные возвращают число
+# строк, а изменённые связи - id фильмов.
+MERGE_SQL = (
+    (
+        # Из строк дубликатов с одинаковыми фильмом и ролью переносится одна
+        # и только если такой строки ещё нет у оставляемой персоны.
+        "credits moved",
+        """
+        UPDATE content.person_filmwork pfw SET person_id = moved.keep_id
+        FROM (
+            SELECT DISTINCT ON (m.keep_id, pfw.filmwork_id, pfw.role)
+                pfw.id, m.keep_id
+            FROM content.person_filmwork pfw
+            JOIN person_merge m ON m.duplicate_id = pfw.person_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM content.person_filmwork kept
+                WHERE kept.filmwork_id = pfw.filmwork_id
+                  AND kept.person_id = m.keep_id
+                  AND kept.role = pfw.role
+            )
+            ORDER BY m.keep_id, pfw.filmwork_id, pfw.role, pfw.id
+        ) moved
+        WHERE pfw.id = moved.id
+        RETURNING pfw.filmwork_id
+        """,
+    ),
+    (
+        "credits dropped",
+        """
+        DELETE FROM content.person_filmwork pfw
+        USING person_merge m
+        WHERE pfw.person_id = m.duplicate_id
+        RETURNING pfw.filmwork_id
+        """,
+    ),
+    (
+        None,
+        """
+        UPDATE content.person p
+        SET birth_date = merged.birth_date, updated_at = now()
+        FROM (
+            SELECT m.keep_id, min(dp.birth_date) AS birth_date
+            FROM person_merge m
+            JOIN content.person dp ON dp.id = m.duplicate_id
+            GROUP BY m.keep_id
+        ) merged
+        WHERE p.id = merged.keep_id
+          AND p.birth_date IS NULL
+          AND merged.birth_date IS NOT NULL
+        """,
+    ),
+    (
+        "persons merged",
+        """
+        DELETE FROM content.person p
+        USING person_merge m
+        WHERE p.id = m.duplicate_id
+        """,
+    ),
+)
+
+
+@dataclass(frozen=True)
+class PersonRecord:
+    id: UUID
+    full_name: str
+    birth_date: Optional[date]
+    created_at: datetime
+    credits: int
+
+
+@dataclass
+class DuplicateGroup:
+    """Оставляемая персона и её дубликаты с оценкой сходства."""
+
+    name_key: str
+    keep: PersonRecord
+    duplicates: List[Tuple[PersonRecord, float]]
+
+
+def score_pair(keep: PersonRecord, other: PersonRecord) -> float:
+    """
+    Оценка от 0 до 1 для персон одного блока: разные даты рождения - 0,
+    иначе сходство написания имён с поправкой на неизвестную дату.
+    """
+    if keep.birth_date and other.birth_date and keep.birth_date != other.birth_date:
+        return 0.0
+    names = SequenceMatcher(
+        None, keep.full_name.casefold(), other.full_name.casefold()
+    ).ratio()
+    both_dated = keep.birth_date is not None and other.birth_date is not None
+    factor = 1.0 if both_dated else MISSING_BIRTH_DATE_FACTOR
+    return round(factor * (0.5 + 0.5 * names), 3)
+
+
+def _keep_order(record: PersonRecord) -> tuple:
+    return -record.credits, record.created_at, str(record.id)
+
+
+def split_block(
+    name_key: str, records: List[PersonRecord], min_score: float = MIN_SCORE
+) -> Iterator[DuplicateGroup]:
+    """
+    Группы дубликатов внутри блока. Персоны с разными датами рождения -
+    разные люди; персона без даты присоединяется, только если дата в
+    блоке одна, иначе она неоднозначна и остаётся как есть.
+    """
+    dated = defaultdict(list)
+    undated = []
+    for record in records:
+        if record.birth_date is None:
+            undated.append(record)
+        else:
+            dated[record.birth_date].append(record)
+    clusters = list(dated.values())
+    if len(clusters) == 1:
+        clusters[0].extend(undated)
+    elif not clusters:
+        clusters = [undated]
+    for cluster in clusters:
+        if len(cluster) < 2:
+            continue
+        keep, *others = sorted(cluster, key=_keep_order)
+        duplicates = [(other, score_pair(keep, other)) for other in others]
+        duplicates = [pair for pair in duplicates if pair[1] >= min_score]
+        if duplicates:
+            yield DuplicateGroup(name_key, keep, duplicates)
+
+
+def catalog_candidates(max_block_size: int = MAX_BLOCK_SIZE) -> Iterator[tuple]:
+    """
+    Персоны из блоков с двумя и более участниками в порядке ключа. Весь
+    справочник читается одним последовательным проходом с сортировкой по
+    ключу: для полного прохода это дешевле, чем чтение по индексу.
+    """
+    with transaction.atomic(), connection.chunked_cursor() as cursor:
+        cursor.itersize = ITERATOR_CHUNK_SIZE
+        cursor.execute(CANDIDATES_SQL, (max_block_size,))
+        yield from cursor
+
+
+def block_candidates(name_keys: List[str]) -> List[tuple]:
+    """Все персоны справочника с ключами name_keys в порядке ключа."""
+    with connection.cursor() as cursor:
+        cursor.execute(BLOCKS_SQL, (name_keys,))
+        return cursor.fetchall()
+
+
+def group_duplicates(
+    rows: Iterable[tuple], min_score: float = MIN_SCORE
+) -> Iterator[DuplicateGroup]:
+    for name_key, block in groupby(rows, key=lambda row: row[0]):
+        records = [PersonRecord(*row[1:]) for row in block]
+        yield from split_block(name_key, records, min_score)
+
+
+def selection_duplicates(
+    queryset: QuerySet, min_score: float = MIN_SCORE
+) -> Iterator[DuplicateGroup]:
+    """
+    Группы дубликатов с персонами выборки: персоны выборки сравниваются со
+    всем справочником, а не только между собой. Группы без персон выборки
+    из тех же блоков пропускаются.
+    """
+    selected = dict(
+        queryset.annotate(name_key=PersonNameKey("full_name"))
+        .order_by()
+        .values_list("id", "name_key")
+    )
+    rows = block_candidates(sorted(set(selected.values())))
+    for group in group_duplicates(rows, min_score):
+        members = [group.keep, *(record for record, _ in group.duplicates)]
+        if any(record.id in selected for record in members):
+            yield group
+
+
+def find_duplicates(
+    min_score: float = MIN_SCORE, max_block_size: int = MAX_BLOCK_SIZE
+) -> Iterator[DuplicateGroup]:
+    return group_duplicates(catalog_candidates(max_block_size), min_score)
+
+
+def merge_persons(groups: Iterable[DuplicateGroup]) -> Dict[str, int]:
+    """
+    Объединяет группы одной транзакцией. Сигналы моделей не вызываются,
+    поэтому кеш затронутых фильмов сбрасывается после фиксации; сводку
+    фильмов и журнал изменений ведут триггеры.
+    """
+    duplicate_ids, keep_ids = [], []
+    for group in groups:
+        for duplicate, _ in group.duplicates:
+            duplicate_ids.append(duplicate.id)
+            keep_ids.append(group.keep.id)
+    if set(duplicate_ids) & set(keep_ids):
+        raise ValueError("A person is both kept and merged away")
+    counts = {name: 0 for name, _ in MERGE_SQL if name}
+    if not duplicate_ids:
+        return counts
+    filmwork_ids = set()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(STAGING_SQL, (duplicate_ids, keep_ids))
+        for name, sql in MERGE_SQL:
+            cursor.execute(sql)
+            if name is None:
+                continue
+            counts[name] = cursor.rowcount
+            if cursor.description:
+                filmwork_ids.update(row[0] for row in cursor.fetchall())
+        filmwork_ids = list(filmwork_ids)
+        transaction.on_commit(lambda: filmwork_cache.invalidate(filmwork_ids))
+    return counts
@@ -0,0 +1,321 @@
+"""
+Выгрузка и загрузка каталога кинопроизведений в CSV и JSON Lines.
+
+Строка выгрузки - кинопроизведение с жанрами и участниками из сводки
+content.film_summary; в CSV списки записываются в ячейки как JSON.
+Выгрузка читает строки серверным курсором, загрузка передаёт их пакетами
+через COPY во временные таблицы и сливает в content несколькими запросами.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F, QuerySet
+
+from movies.cache import filmwork_cache
+
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+FILMWORK_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "creation_date",
+    "certificate",
+    "file_path",
+    "rating",
+    "type",
+)
+EXPORT_COLUMNS = (*FILMWORK_COLUMNS, "genres", "persons")
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 5000
+
+STAGING_SQL = """
+CREATE TEMP TABLE import_filmwork (
+    id uuid NOT NULL,
+    title text,
+    description text,
+    creation_date date,
+    certificate text,
+    file_path text,
+    rating double precision,
+    type text
+) ON COMMIT DROP;
+CREATE TEMP TABLE import_genre_filmwork (
+    filmwork_id uuid NOT NULL,
+    name text NOT NULL
+) ON COMMIT DROP;
+CREATE TEMP TABLE import_person_filmwork (
+    filmwork_id uuid NOT NULL,
+    person_id uuid NOT NULL,
+    full_name text NOT NULL,
+    role text NOT NULL
+) ON COMMIT DROP;
+"""
+
+STAGING_INDEXES_SQL = """
+CREATE INDEX ON import_filmwork (id);
+CREATE INDEX ON import_genre_filmwork (filmwork_id);
+CREATE INDEX ON import_person_filmwork (filmwork_id, person_id, role);
+ANALYZE import_filmwork;
+ANALYZE import_genre_filmwork;
+ANALYZE import_person_filmwork;
+"""
+
+# Запросы слияния выполняются по порядку, каждый возвращает число строк.
+MERGE_SQL = (
+    (
+        "filmworks",
+        """
+        INSERT INTO content.filmwork AS fw (
+            id, title, description, creation_date, certificate, file_path,
+            rating, type, created_at, updated_at
+        )
+        SELECT DISTINCT ON (id)
+            id, title, description, creation_date, certificate, file_path,
+            rating, type, now(), now()
+        FROM import_filmwork
+        ORDER BY id
+        ON CONFLICT (id) DO UPDATE SET
+            title = excluded.title,
+            description = excluded.description,
+            creation_date = excluded.creation_date,
+            certificate = excluded.certificate,
+            file_path = excluded.file_path,
+            rating = excluded.rating,
+            type = excluded.type,
+            updated_at = excluded.updated_at
+        WHERE (fw.title, fw.description, fw.creation_date, fw.certificate,
+               fw.file_path, fw.rating, fw.type)
+            IS DISTINCT FROM (excluded.title, excluded.description,
+               excluded.creation_date, excluded.certificate, excluded.file_path,
+               excluded.rating, excluded.type)
+        """,
+    ),
+    (
+        "genres",
+        """
+        INSERT INTO content.genre (id, name, created_at, updated_at)
+        SELECT gen_random_uuid(), new.name, now(), now()
+        FROM (SELECT DISTINCT name FROM import_genre_filmwork) new
+        WHERE NOT EXISTS (SELECT 1 FROM content.genre g WHERE g.name = new.name)
+        """,
+    ),
+    (
+        "persons",
+        """
+        INSERT INTO content.person AS p (id, full_name, created_at, updated_at)
+        SELECT DISTINCT ON (person_id) person_id, full_name, now(), now()
+        FROM import_person_filmwork
+        ORDER BY person_id
+        ON CONFLICT (id) DO UPDATE SET
+            full_name = excluded.full_name,
+            updated_at = excluded.updated_at
+        WHERE p.full_name IS DISTINCT FROM excluded.full_name
+        """,
+    ),
+    (
+        "genre links removed",
+        """
+        DELETE FROM content.genre_filmwork gfw
+        USING content.genre g
+        WHERE g.id = gfw.genre_id
+          AND gfw.filmwork_id IN (SELECT id FROM import_filmwork)
+          AND NOT EXISTS (
+              SELECT 1 FROM import_genre_filmwork new
+              WHERE new.filmwork_id = gfw.filmwork_id AND new.name = g.name
+          )
+        """,
+    ),
+    (
+        "genre links",
+        """
+        INSERT INTO content.genre_filmwork (filmwork_id, genre_id, created_at)
+        SELECT DISTINCT ON (new.filmwork_id, new.name) new.filmwork_id, g.id, now()
+        FROM import_genre_filmwork new
+        JOIN content.genre g ON g.name = new.name
+        ORDER BY new.filmwork_id, new.name, g.created_at, g.id
+        ON CONFLICT (filmwork_id, genre_id) DO NOTHING
+        """,
+    ),
+    (
+        "person links removed",
+        """
+        DELETE FROM content.person_filmwork pfw
+        WHERE pfw.filmwork_id IN (SELECT id FROM import_filmwork)
+          AND NOT EXISTS (
+              SELECT 1 FROM import_person_filmwork new
+              WHERE new.filmwork_id = pfw.filmwork_id
+                AND new.person_id = pfw.person_id
+                AND new.role = pfw.role
+          )
+        """,
+    ),
+    (
+        "person links",
+        """
+        INSERT INTO content.person_filmwork (filmwork_id, person_id, role, created_at)
+        SELECT DISTINCT filmwork_id, person_id, role, now()
+        FROM import_person_filmwork
+        ON CONFLICT (filmwork_id, person_id, role) DO NOTHING
+        """,
+    ),
+)
+
+
+def export_rows(
+    queryset: QuerySet, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[dict]:
+    """
+    Строки выгрузки. iterator() в Postgres читает именованным курсором по
+    chunk_size строк, поэтому память не зависит от размера выборки.
+    """
+    rows = (
+        queryset.order_by()
+        .values(*FILMWORK_COLUMNS)
+        .annotate(genres=F("summary__genres"), persons=F("summary__persons"))
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row["genres"] = row["genres"] or []
+        row["persons"] = row["persons"] or []
+        yield row
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def csv_lines(rows: Iterable[dict]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[column]) for column in EXPORT_COLUMNS])
+
+
+def jsonl_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def export_lines(
+    queryset: QuerySet, export_format: str, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    rows = export_rows(queryset, chunk_size)
+    return csv_lines(rows) if export_format == "csv" else jsonl_lines(rows)
+
+
+def read_records(stream: IO[str], import_format: str) -> Iterator[dict]:
+    if import_format == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(stream):
+        for column in FILMWORK_COLUMNS:
+            row[column] = row[column] or None
+        row["genres"] = json.loads(row["genres"] or "[]")
+        row["persons"] = json.loads(row["persons"] or "[]")
+        yield row
+
+
+def _copy_row(values: Iterable) -> str:
+    """
+    Строка CSV для COPY. NULL - пустое поле без кавычек, остальные значения
+    в кавычках: COPY сравнивает с NULL только поля без кавычек, поэтому
+    пустая строка и текст "\\N" загружаются как есть.
+    """
+    return (
+        ",".join(
+            "" if value is None else '"' + str(value).replace('"', '""') + '"'
+            for value in values
+        )
+        + "\n"
+    )
+
+
+class CatalogImporter:
+    """Загрузка записей каталога через временные таблицы и COPY."""
+
+    def __init__(self, cursor, batch_size: int = IMPORT_BATCH_SIZE):
+        self.cursor = cursor
+        self.batch_size = batch_size
+
+    def stage(self, records: Iterable[dict]) -> int:
+        self.cursor.execute(STAGING_SQL)
+        records = iter(records)
+        staged = 0
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            self._copy_batch(batch)
+            staged += len(batch)
+        self.cursor.execute(STAGING_INDEXES_SQL)
+        return staged
+
+    def merge(self) -> dict:
+        counts = {}
+        for name, sql in MERGE_SQL:
+            self.cursor.execute(sql)
+            counts[name] = self.cursor.rowcount
+        return counts
+
+    def _copy_batch(self, batch: list):
+        filmworks, genres, persons = io.StringIO(), io.StringIO(), io.StringIO()
+        for record in batch:
+            filmwork_id = record["id"]
+            filmworks.write(
+                _copy_row(record.get(column) for column in FILMWORK_COLUMNS)
+            )
+            for name in record.get("genres") or ():
+                genres.write(_copy_row((filmwork_id, name)))
+            for person in record.get("persons") or ():
+                persons.write(
+                    _copy_row(
+                        (filmwork_id, person["id"], person["full_name"], person["role"])
+                    )
+                )
+        self._copy("import_filmwork", FILMWORK_COLUMNS, filmworks)
+        self._copy("import_genre_filmwork", ("filmwork_id", "name"), genres)
+        self._copy(
+            "import_person_filmwork",
+            ("filmwork_id", "person_id", "full_name", "role"),
+            persons,
+        )
+
+    def _copy(self, table: str, columns: tuple, buffer: io.StringIO):
+        buffer.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN (FORMAT csv)", buffer
+        )
+
+
+def import_catalog(
+    stream: IO[str], import_format: str, batch_size: int = IMPORT_BATCH_SIZE
+) -> dict:
+    """
+    Загружает каталог одной транзакцией. Сигналы моделей при этом не
+    вызываются, поэтому после фиксации кеш кинопроизведений очищается
+    целиком.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        importer = CatalogImporter(cursor, batch_size)
+        counts = {"records": importer.stage(read_records(stream, import_format))}
+        counts.update(importer.merge())
+        transaction.on_commit(filmwork_cache.clear)
+    return counts
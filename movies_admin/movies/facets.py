@@ -0,0 +1,206 @@
+"""
+Фильтры списка кинопроизведений с числом фильмов у каждого значения.
+
+Числа по всем фильтрам считаются одним запросом: GROUPING SETS по типу,
+рейтингу и году плюс UNION ALL по жанрам над выборкой списка. Результат
+кешируется по тексту запроса; ключи сбрасываются сменой версии при
+изменении фильмов и связей с жанрами (movies.signals).
+"""
+import hashlib
+from collections import defaultdict
+from datetime import date
+from uuid import UUID, uuid4
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils.translation import gettext_lazy as _
+
+from movies.cache import FILMWORK_CACHE_ALIAS
+from movies.models import Filmwork, GenreFilmwork
+
+FACETS_TIMEOUT = 300
+FACETS_VERSION_KEY = "facets:version"
+RATING_BUCKET = 2
+MAX_RATING_BUCKET = 8
+
+FACETS_SQL = """
+WITH films AS MATERIALIZED ({films})
+SELECT facet, value, label, count FROM (
+    SELECT
+        CASE
+            WHEN GROUPING(type) = 0 THEN 'type'
+            WHEN GROUPING(rating_bucket) = 0 THEN 'rating'
+            ELSE 'year'
+        END AS facet,
+        coalesce(type, rating_bucket::text, creation_year::text) AS value,
+        coalesce(type, rating_bucket::text, creation_year::text) AS label,
+        count(*) AS count
+    FROM (
+        SELECT
+            type,
+            least(
+                floor(rating / {bucket}) * {bucket}, {max_bucket}
+            )::int AS rating_bucket,
+            extract(year FROM creation_date)::int AS creation_year
+        FROM films
+    ) film
+    GROUP BY GROUPING SETS ((type), (rating_bucket), (creation_year))
+    UNION ALL
+    SELECT 'genre', g.id::text, g.name, count(*)
+    FROM films
+    JOIN content.genre_filmwork gfw ON gfw.filmwork_id = films.id
+    JOIN content.genre g ON g.id = gfw.genre_id
+    GROUP BY g.id, g.name
+) facets
+WHERE value IS NOT NULL
+"""
+
+
+def _cache():
+    return caches[FILMWORK_CACHE_ALIAS]
+
+
+def invalidate_facets() -> None:
+    _cache().set(FACETS_VERSION_KEY, uuid4().hex, None)
+
+
+def facet_counts(queryset: QuerySet) -> dict:
+    """Словарь фасет -> {значение: (подпись, число фильмов)} для выборки."""
+    films = queryset.order_by().values("id", "type", "rating", "creation_date")
+    films_sql, params = films.query.sql_with_params()
+    sql = FACETS_SQL.format(
+        films=films_sql, bucket=RATING_BUCKET, max_bucket=MAX_RATING_BUCKET
+    )
+    cache = _cache()
+    version = cache.get(FACETS_VERSION_KEY)
+    if version is None:
+        version = uuid4().hex
+        cache.add(FACETS_VERSION_KEY, version, None)
+    digest = hashlib.md5(f"{sql}{params!r}".encode()).hexdigest()
+    key = f"facets:{version}:{digest}"
+    counts = cache.get(key)
+    if counts is None:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        counts = defaultdict(dict)
+        for facet, value, label, count in rows:
+            counts[facet][value] = (label, count)
+        counts = dict(counts)
+        cache.set(key, counts, FACETS_TIMEOUT)
+    return counts
+
+
+class FacetListFilter(admin.SimpleListFilter):
+    """
+    Фильтр, варианты которого - значения из всего каталога, а число рядом
+    с вариантом - число фильмов в текущей выборке списка.
+    """
+
+    facet = None
+
+    def lookups(self, request, model_admin):
+        if not hasattr(request, "_catalog_facets"):
+            request._catalog_facets = facet_counts(Filmwork.objects.all())
+        options = request._catalog_facets.get(self.facet, {})
+        return [
+            (value, self.option_label(value, label))
+            for value, (label, count) in sorted(options.items(), key=self.sort_key)
+        ]
+
+    def choices(self, changelist):
+        if not hasattr(changelist, "_facets"):
+            changelist._facets = facet_counts(changelist.queryset)
+        counts = changelist._facets.get(self.facet, {})
+        choices = super().choices(changelist)
+        yield next(choices)
+        for (value, title), choice in zip(self.lookup_choices, choices):
+            count = counts[value][1] if value in counts else 0
+            choice["display"] = f"{title} ({count})"
+            yield choice
+
+    def option_label(self, value: str, label: str) -> str:
+        return label
+
+    @staticmethod
+    def sort_key(item):
+        value, (label, count) = item
+        return label
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        try:
+            return self.filter(queryset, value)
+        except ValueError as error:
+            raise IncorrectLookupParameters(error)
+
+    def filter(self, queryset, value: str):
+        raise NotImplementedError
+
+
+class TypeFacetFilter(FacetListFilter):
+    title = _("Тип")
+    parameter_name = "type"
+    facet = "type"
+
+    def filter(self, queryset, value):
+        return queryset.filter(type=value)
+
+
+class RatingFacetFilter(FacetListFilter):
+    title = _("Рейтинг")
+    parameter_name = "rating_bucket"
+    facet = "rating"
+
+    @staticmethod
+    def sort_key(item):
+        return int(item[0])
+
+    def option_label(self, value, label):
+        low = int(value)
+        if low >= MAX_RATING_BUCKET:
+            return f"{low} и выше"
+        return f"{low}–{low + RATING_BUCKET}"
+
+    def filter(self, queryset, value):
+        low = int(value)
+        if low >= MAX_RATING_BUCKET:
+            return queryset.filter(rating__gte=MAX_RATING_BUCKET)
+        return queryset.filter(rating__gte=low, rating__lt=low + RATING_BUCKET)
+
+
+class YearFacetFilter(FacetListFilter):
+    title = _("Год создания")
+    parameter_name = "year"
+    facet = "year"
+
+    @staticmethod
+    def sort_key(item):
+        return -int(item[0])
+
+    def filter(self, queryset, value):
+        # Диапазон дат, а не creation_date__year, чтобы работал индекс.
+        year = int(value)
+        return queryset.filter(
+            creation_date__gte=date(year, 1, 1), creation_date__lt=date(year + 1, 1, 1)
+        )
+
+
+class GenreFacetFilter(FacetListFilter):
+    title = _("Жанр")
+    parameter_name = "genre"
+    facet = "genre"
+
+    def filter(self, queryset, value):
+        return queryset.filter(
+            Exists(
+                GenreFilmwork.objects.filter(
+                    filmwork=OuterRef("pk"), genre_id=UUID(value)
+                )
+            )
+        )
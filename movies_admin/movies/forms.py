@@ -0,0 +1,11 @@
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+from movies.exchange import FORMATS
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(label=_("Файл"))
+    format = forms.ChoiceField(
+        label=_("Формат"), choices=[(name, name.upper()) for name in FORMATS]
+    )
@@ -0,0 +1,219 @@
+"""
+Inline, которые проверяют и сохраняют строки пакетом.
+
+Стандартный формсет делает по запросу на каждую строку: поиск выбранного
+объекта, проверку его существования, проверку unique_together и
+сохранение. Здесь связанные объекты загружаются одним запросом на поле,
+уникальность проверяется одним запросом на ограничение, а изменения
+применяются одним DELETE, одним UPDATE и одним INSERT.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from movies.autocomplete import PreloadedAutocompleteInlineMixin, PreloadedInlineFormSet
+
+
+class PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """Выбор объекта, который сначала ищется среди загруженных формсетом."""
+
+    prefetched: dict = {}
+
+    def to_python(self, value):
+        if isinstance(value, str) and value in self.prefetched:
+            return self.prefetched[value]
+        return super().to_python(value)
+
+
+class BatchedInlineForm(forms.ModelForm):
+    """Строка inline, уникальность которой проверяет BatchedInlineFormSet."""
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        # Выбранный объект уже найден полем формы, повторно искать его в
+        # базе при проверке модели не нужно.
+        return [
+            *exclude,
+            *(
+                name
+                for name, field in self.fields.items()
+                if isinstance(field, PrefetchedModelChoiceField) and name not in exclude
+            ),
+        ]
+
+    def validate_unique(self):
+        pass
+
+
+class BatchedInlineFormSet(PreloadedInlineFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        pk_name = self.model._meta.pk.name
+        field = form.fields.get(pk_name)
+        if type(field) is forms.ModelChoiceField:
+            form.fields[pk_name] = PrefetchedModelChoiceField(
+                field.queryset,
+                initial=field.initial,
+                required=field.required,
+                widget=field.widget,
+            )
+
+    def full_clean(self):
+        if self.is_bound:
+            self._prefetch_choices()
+        super().full_clean()
+
+    def _prefetch_choices(self):
+        inline_forms = self.forms
+        if not inline_forms:
+            return
+        pk_name = self.model._meta.pk.name
+        for name, field in inline_forms[0].fields.items():
+            if not isinstance(field, PrefetchedModelChoiceField):
+                continue
+            if name == pk_name:
+                # Строки формсета уже загружены для начальных форм.
+                objects = {str(obj.pk): obj for obj in self.get_queryset()}
+            else:
+                objects = self._fetch_choices(name, field)
+            for form in inline_forms:
+                form.fields[name].prefetched = objects
+
+    def _fetch_choices(self, name: str, field: PrefetchedModelChoiceField) -> dict:
+        key = field.to_field_name or "pk"
+        model = field.queryset.model
+        target = model._meta.pk if key == "pk" else model._meta.get_field(key)
+        values = set()
+        for form in self.forms:
+            value = form.fields[name].widget.value_from_datadict(
+                form.data, form.files, form.add_prefix(name)
+            )
+            if value in field.empty_values:
+                continue
+            try:
+                values.add(target.to_python(value))
+            except ValidationError:
+                # Ошибку покажет поле формы при проверке строки.
+                continue
+        if not values:
+            return {}
+        return {
+            str(getattr(obj, key)): obj
+            for obj in field.queryset.filter(**{f"{key}__in": values})
+        }
+
+    def validate_unique(self):
+        """
+        Проверяет unique_together для всех строк сразу: повторы внутри
+        формы - в памяти, совпадения с другими строками таблицы - одним
+        запросом на ограничение.
+        """
+        deleted = set(self.deleted_forms)
+        valid_forms = [
+            form for form in self.forms if form.is_valid() and form not in deleted
+        ]
+        # Строки формы в базе будут перезаписаны или удалены.
+        own_pks = [
+            form.instance.pk
+            for form in self.initial_forms
+            if form.instance.pk is not None
+        ]
+        errors = []
+        for unique_check in self.model._meta.unique_together:
+            attnames = [
+                self.model._meta.get_field(name).attname for name in unique_check
+            ]
+            rows = {}
+            for form in valid_forms:
+                row = tuple(getattr(form.instance, attname) for attname in attnames)
+                if None in row:
+                    continue
+                if row in rows:
+                    form.add_error(None, self.get_form_error())
+                    errors.append(self.get_unique_error_message(unique_check))
+                    continue
+                rows[row] = form if form.has_changed() else None
+            changed = {row: form for row, form in rows.items() if form is not None}
+            if not changed:
+                continue
+            condition = Q()
+            for row in changed:
+                condition |= Q(**dict(zip(attnames, row)))
+            taken = (
+                self.model._default_manager.filter(condition)
+                .exclude(pk__in=own_pks)
+                .values_list(*attnames)
+            )
+            for row in taken:
+                changed[row].add_error(None, self.get_form_error())
+                errors.append(self.get_unique_error_message(unique_check))
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, commit=True):
+        """
+        Сохраняет изменения строк тремя запросами. Сигналы save не
+        отправляются, а кеш фильма и счётчики фильтров сбрасывает
+        сохранение самого фильма, которое идёт перед inline.
+
+        Уникальный индекс Postgres проверяется по каждой строке UPDATE,
+        поэтому обмен значениями между строками одним bulk_update его
+        нарушит. Строки, у которых изменились поля unique_together,
+        удаляются и вставляются заново с теми же pk (created_at при этом
+        обновляется), остальные изменённые строки обновляются на месте.
+        """
+        if not commit:
+            return super().save(commit=False)
+        deleted = set(self.deleted_forms)
+        model_fields = {field.name for field in self.model._meta.concrete_fields}
+        unique_fields = {
+            name for fields in self.model._meta.unique_together for name in fields
+        }
+        self.changed_objects, self.deleted_objects, self.new_objects = [], [], []
+        updated, reinserted = [], []
+        changed_fields = set()
+        saved_forms = []
+        for form in self.initial_forms:
+            obj = form.instance
+            if obj.pk is None:
+                continue
+            if form in deleted:
+                self.deleted_objects.append(obj)
+            elif form.has_changed():
+                self.changed_objects.append((obj, form.changed_data))
+                if unique_fields.intersection(form.changed_data):
+                    reinserted.append(obj)
+                else:
+                    updated.append(obj)
+                    changed_fields.update(model_fields.intersection(form.changed_data))
+                self.save_existing(form, obj, commit=False)
+                saved_forms.append(form)
+        for form in self.extra_forms:
+            if not form.has_changed() or form in deleted:
+                continue
+            self.new_objects.append(self.save_new(form, commit=False))
+            saved_forms.append(form)
+
+        manager = self.model._default_manager
+        removed = [obj.pk for obj in self.deleted_objects + reinserted]
+        if removed:
+            manager.filter(pk__in=removed).delete()
+        if updated and changed_fields:
+            manager.bulk_update(updated, sorted(changed_fields))
+        if reinserted or self.new_objects:
+            manager.bulk_create(reinserted + self.new_objects)
+        changed = [obj for obj, _ in self.changed_objects]
+        for form in saved_forms:
+            form.save_m2m()
+        return changed + self.new_objects
+
+
+class BatchedAutocompleteInlineMixin(PreloadedAutocompleteInlineMixin):
+    """Inline с автодополнением, строки которого сохраняются пакетом."""
+
+    form = BatchedInlineForm
+    formset = BatchedInlineFormSet
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        kwargs.setdefault("form_class", PrefetchedModelChoiceField)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
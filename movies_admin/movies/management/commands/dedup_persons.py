@@ -0,0 +1,79 @@
+"""
+Поиск дубликатов персон и их объединение.
+
+Без --merge команда только печатает найденные группы. С --merge группы
+объединяются пакетами по --batch-size дубликатов, каждый пакет - своей
+транзакцией, поэтому прерванный запуск можно повторить.
+"""
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from movies.dedup import (
+    MAX_BLOCK_SIZE,
+    MERGE_BATCH_SIZE,
+    MIN_SCORE,
+    find_duplicates,
+    merge_persons,
+)
+
+
+class Command(BaseCommand):
+    help = "Находит и объединяет дубликаты персон"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+        parser.add_argument("--max-block-size", type=int, default=MAX_BLOCK_SIZE)
+        parser.add_argument(
+            "--merge", action="store_true", help="объединить найденные дубликаты"
+        )
+        parser.add_argument("--batch-size", type=int, default=MERGE_BATCH_SIZE)
+        parser.add_argument(
+            "--show", type=int, default=10, help="сколько групп напечатать"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        groups = list(
+            find_duplicates(
+                min_score=options["min_score"],
+                max_block_size=options["max_block_size"],
+            )
+        )
+        duplicates = sum(len(group.duplicates) for group in groups)
+        self.stdout.write(
+            f"{len(groups)} groups, {duplicates} duplicates found "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        for group in islice(groups, options["show"]):
+            self.stdout.write(
+                f"  {group.keep.full_name} ({group.keep.id}, "
+                f"{group.keep.credits} credits) <- "
+                + ", ".join(
+                    f"{duplicate.full_name} ({score})"
+                    for duplicate, score in group.duplicates
+                )
+            )
+        if not options["merge"]:
+            return
+
+        started = time.perf_counter()
+        totals = {}
+        batch, batch_size = [], 0
+        for group in groups:
+            batch.append(group)
+            batch_size += len(group.duplicates)
+            if batch_size >= options["batch_size"]:
+                self.add_counts(totals, merge_persons(batch))
+                batch, batch_size = [], 0
+        self.add_counts(totals, merge_persons(batch))
+        self.stdout.write(
+            ", ".join(f"{name}: {count}" for name, count in totals.items())
+            + f" in {time.perf_counter() - started:.2f}s"
+        )
+
+    @staticmethod
+    def add_counts(totals: dict, counts: dict):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from movies.exchange import EXPORT_CHUNK_SIZE, FORMATS, export_lines
+from movies.models import Filmwork
+
+
+class Command(BaseCommand):
+    help = "Выгружает кинопроизведения с жанрами и участниками в CSV или JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="файл выгрузки, - для stdout")
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            Filmwork.objects.all(), options["format"], options["chunk_size"]
+        )
+        if options["output"] == "-":
+            sys.stdout.writelines(lines)
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as output:
+            output.writelines(lines)
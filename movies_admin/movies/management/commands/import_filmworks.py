@@ -0,0 +1,28 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.exchange import FORMATS, IMPORT_BATCH_SIZE, import_catalog
+
+
+class Command(BaseCommand):
+    help = "Загружает кинопроизведения из CSV или JSON Lines через COPY"
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="файл для загрузки, - для stdin")
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options["input"] == "-":
+            counts = import_catalog(sys.stdin, options["format"], options["batch_size"])
+        else:
+            with open(options["input"], encoding="utf-8", newline="") as stream:
+                counts = import_catalog(
+                    stream, options["format"], options["batch_size"]
+                )
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(f"Imported in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,177 @@
+"""
+Нагрузочный тест страниц админки по HTTP: задержки p50/p99 и запросы в
+секунду для списка и страницы редактирования кинопроизведения.
+
+Сервер запускается отдельно, например для сравнения до и после:
+
+    python manage.py runserver 127.0.0.1:8000
+    gunicorn --config config/gunicorn.py  # DJANGO_SETTINGS_MODULE=config.settings.prod
+
+    python manage.py load_test --url http://127.0.0.1:8000 --username admin \\
+        --password admin --concurrency 8 --duration 30 --output before.json
+
+С --compare к таблице добавляется изменение относительно прошлого отчёта.
+"""
+import http.cookiejar
+import json
+import math
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from urllib.error import URLError
+
+from django.core.management.base import BaseCommand, CommandError
+
+CHANGELIST_PATH = "/admin/movies/filmwork/"
+CHANGE_LINK = re.compile(r'href="(/admin/movies/filmwork/[0-9a-f-]{36}/change/)')
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+class AdminSession:
+    """Вход в админку и запросы страниц с cookie сессии."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies)
+        )
+
+    def login(self, username: str, password: str):
+        self.get("/admin/login/")
+        csrf_token = next(
+            (cookie.value for cookie in self.cookies if cookie.name == "csrftoken"),
+            "",
+        )
+        data = urllib.parse.urlencode(
+            {
+                "username": username,
+                "password": password,
+                "csrfmiddlewaretoken": csrf_token,
+                "next": "/admin/",
+            }
+        ).encode()
+        request = urllib.request.Request(
+            self.base_url + "/admin/login/",
+            data=data,
+            headers={"Referer": self.base_url + "/admin/login/"},
+        )
+        with self.opener.open(request) as response:
+            response.read()
+        if not any(cookie.name == "sessionid" for cookie in self.cookies):
+            raise CommandError("Login failed")
+
+    def get(self, path: str) -> str:
+        with self.opener.open(self.base_url + path) as response:
+            return response.read().decode()
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест страниц кинопроизведений в админке"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="секунд на страницу"
+        )
+        parser.add_argument("--output", help="записать отчёт в JSON")
+        parser.add_argument("--compare", help="отчёт JSON прошлого запуска")
+
+    def handle(self, *args, **options):
+        session = AdminSession(options["url"])
+        try:
+            session.login(options["username"], options["password"])
+            detail_paths = sorted(
+                set(CHANGE_LINK.findall(session.get(CHANGELIST_PATH)))
+            )
+        except URLError as error:
+            raise CommandError(f"Server is not available: {error}")
+        if not detail_paths:
+            raise CommandError("No filmworks on the changelist page")
+
+        report = {
+            "changelist": self.run(
+                session, [CHANGELIST_PATH], options["concurrency"], options["duration"]
+            ),
+            "detail": self.run(
+                session, detail_paths, options["concurrency"], options["duration"]
+            ),
+        }
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"]) as report_file:
+                previous = json.load(report_file)
+        self.print_report(report, previous)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                json.dump(report, report_file, indent=2)
+
+    def run(
+        self, session: AdminSession, paths: list, concurrency: int, duration: float
+    ):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker(offset: int):
+            number = offset
+            while time.perf_counter() < deadline:
+                path = paths[number % len(paths)]
+                number += concurrency
+                started = time.perf_counter()
+                try:
+                    session.get(path)
+                except (URLError, OSError) as error:
+                    with lock:
+                        errors.append(str(error))
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(offset,))
+            for offset in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.5) * 1000 if latencies else None,
+            "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        }
+
+    def print_report(self, report: dict, previous: dict):
+        self.stdout.write(
+            f"{'page':<11} {'requests':>9} {'errors':>7} {'rps':>8} "
+            f"{'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for page, stats in report.items():
+            self.stdout.write(
+                f"{page:<11} {stats['requests']:>9} {stats['errors']:>7} "
+                f"{stats['rps']:>8.1f} {stats['p50_ms'] or 0:>8.1f} "
+                f"{stats['p99_ms'] or 0:>8.1f}"
+            )
+            before = previous.get(page)
+            if before and before["rps"] and before["p50_ms"] and before["p99_ms"]:
+                self.stdout.write(
+                    f"{'  vs before':<11} {'':>9} {'':>7} "
+                    f"{stats['rps'] / before['rps']:>7.2f}x "
+                    f"{(stats['p50_ms'] or 0) / before['p50_ms']:>7.2f}x "
+                    f"{(stats['p99_ms'] or 0) / before['p99_ms']:>7.2f}x"
+                )
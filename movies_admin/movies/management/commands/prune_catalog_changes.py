@@ -0,0 +1,22 @@
+"""
+Удаление старых записей журнала изменений каталога. Потребитель, который
+отстал больше чем на срок хранения, должен перечитать каталог целиком.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from movies.changes import prune_changes
+
+KEEP_DAYS = 7
+
+
+class Command(BaseCommand):
+    help = "Удаляет записи журнала изменений каталога старше срока хранения"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=KEEP_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(timedelta(days=options["keep_days"]))
+        self.stdout.write(f"{deleted} change entries deleted")
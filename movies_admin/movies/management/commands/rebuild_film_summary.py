@@ -0,0 +1,53 @@
+"""
+Полный пересчёт сводки content.film_summary.
+
+Обычно сводку поддерживают триггеры, пересчёт нужен для восстановления:
+после правки данных с отключёнными триггерами или при подозрении на
+расхождение. С --check сводка только сравнивается с источником.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+DIFF_SQL = """
+SELECT count(*) FROM (
+    (SELECT * FROM content.film_summary_source
+     EXCEPT
+     SELECT filmwork_id, genres, directors, actors, writers, actors_count, persons
+     FROM content.film_summary)
+    UNION ALL
+    (SELECT filmwork_id, genres, directors, actors, writers, actors_count, persons
+     FROM content.film_summary
+     EXCEPT
+     SELECT * FROM content.film_summary_source)
+) diff
+"""
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводку кинопроизведений"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="только проверить, совпадает ли сводка с источником",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            if options["check"]:
+                cursor.execute(DIFF_SQL)
+                mismatched = cursor.fetchone()[0]
+                if mismatched:
+                    raise CommandError(f"Film summary has {mismatched} stale rows")
+                self.stdout.write("Film summary is up to date")
+                return
+            with transaction.atomic():
+                cursor.execute("SELECT content.rebuild_film_summary()")
+                rows = cursor.fetchone()[0]
+        self.stdout.write(
+            f"Film summary rebuilt: {rows} rows in {time.perf_counter() - started:.2f}s"
+        )
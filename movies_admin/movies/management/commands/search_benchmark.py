@@ -0,0 +1,84 @@
+"""
+Бенчмарк поиска в админке: планы и время запросов страницы результатов.
+
+Для проверки на больших данных базу сначала заполняют синтетикой
+(sqlite_to_postgres/benchmarks/synthetic_data.py и load_data.py), затем:
+
+    python manage.py search_benchmark --terms star "dark night" lucas
+
+Для каждой модели и поискового запроса выполняется EXPLAIN ANALYZE того же
+запроса, который строит страница списка в админке, и печатаются время,
+использованные индексы и наличие последовательного сканирования таблицы.
+"""
+import json
+import time
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from movies.models import Filmwork, Genre, Person
+
+DEFAULT_TERMS = ("star", "dark night", "lucas")
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+class Command(BaseCommand):
+    help = "Планы и время поисковых запросов админки"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", nargs="+", default=DEFAULT_TERMS)
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="завершиться с ошибкой, если запрос читает таблицу целиком",
+        )
+
+    def handle(self, *args, **options):
+        seq_scans = []
+        self.stdout.write(
+            f"{'model':<10} {'term':<16} {'rows':>8} {'ms':>9}  indexes / seq scan"
+        )
+        for model in (Filmwork, Genre, Person):
+            model_admin = admin.site._registry[model]
+            for term in options["terms"]:
+                queryset, _ = model_admin.get_search_results(
+                    None, model.objects.all(), term
+                )
+                queryset = queryset.order_by("-rank", *model_admin.ordering)
+                queryset = queryset[: model_admin.list_per_page]
+                rows, milliseconds, indexes, seq_scan = self.explain(queryset)
+                if seq_scan:
+                    seq_scans.append((model.__name__, term))
+                self.stdout.write(
+                    f"{model.__name__:<10} {term:<16} {rows:>8} {milliseconds:>9.2f}  "
+                    f"{', '.join(sorted(indexes)) or '-'}"
+                    f"{' / SEQ SCAN' if seq_scan else ''}"
+                )
+        if seq_scans and options["strict"]:
+            raise CommandError(f"Sequential scans in search queries: {seq_scans}")
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+            result = cursor.fetchone()[0]
+        elapsed = (time.perf_counter() - started) * 1000
+        if isinstance(result, str):
+            result = json.loads(result)
+        plan = result[0]["Plan"]
+        nodes = list(plan_nodes(plan))
+        indexes = {node["Index Name"] for node in nodes if "Index Name" in node}
+        seq_scan = any(node["Node Type"] == "Seq Scan" for node in nodes)
+        return (
+            plan["Actual Rows"],
+            result[0].get("Execution Time", elapsed),
+            indexes,
+            seq_scan,
+        )
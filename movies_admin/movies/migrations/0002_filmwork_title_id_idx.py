@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0001_initial"),
+    ]
+
+    # Индекс может быть уже создан schema_design/db_schema.sql.
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS filmwork_title_id_idx "
+            "ON content.filmwork (title, id)",
+            reverse_sql="DROP INDEX IF EXISTS content.filmwork_title_id_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="filmwork",
+                    index=models.Index(
+                        fields=["title", "id"], name="filmwork_title_id_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,98 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Объекты могут быть уже созданы schema_design/db_schema.sql, DDL pg_trgm и
+# индексов совпадает с ним: расширение в схеме public, класс операторов
+# указан со схемой и не зависит от search_path.
+FILMWORK_SEARCH_SQL = """
+ALTER TABLE content.filmwork ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION content.filmwork_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS filmwork_search_vector_update ON content.filmwork;
+CREATE TRIGGER filmwork_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON content.filmwork
+    FOR EACH ROW EXECUTE FUNCTION content.filmwork_search_vector_update();
+
+UPDATE content.filmwork SET title = title WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS filmwork_search_vector_idx
+    ON content.filmwork USING gin (search_vector);
+"""
+
+FILMWORK_SEARCH_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS filmwork_search_vector_update ON content.filmwork;
+DROP FUNCTION IF EXISTS content.filmwork_search_vector_update();
+ALTER TABLE content.filmwork DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0002_filmwork_title_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public",
+            reverse_sql="DROP EXTENSION IF EXISTS pg_trgm",
+        ),
+        migrations.RunSQL(
+            sql=FILMWORK_SEARCH_SQL,
+            reverse_sql=FILMWORK_SEARCH_REVERSE_SQL,
+            state_operations=[
+                migrations.AddField(
+                    model_name="filmwork",
+                    name="search_vector",
+                    field=django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="filmwork",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="filmwork_search_vector_idx"
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS genre_name_trgm_idx "
+            "ON content.genre USING gin (name public.gin_trgm_ops)",
+            reverse_sql="DROP INDEX IF EXISTS content.genre_name_trgm_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="genre",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["name"],
+                        name="genre_name_trgm_idx",
+                        opclasses=["gin_trgm_ops"],
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS person_full_name_trgm_idx "
+            "ON content.person USING gin (full_name public.gin_trgm_ops)",
+            reverse_sql="DROP INDEX IF EXISTS content.person_full_name_trgm_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="person",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["full_name"],
+                        name="person_full_name_trgm_idx",
+                        opclasses=["gin_trgm_ops"],
+                    ),
+                ),
+            ],
+        ),
+    ]
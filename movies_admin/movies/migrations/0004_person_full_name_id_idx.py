@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_search"),
+    ]
+
+    # Индекс может быть уже создан schema_design/db_schema.sql.
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS person_full_name_id_idx "
+            "ON content.person (full_name, id)",
+            reverse_sql="DROP INDEX IF EXISTS content.person_full_name_id_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="person",
+                    index=models.Index(
+                        fields=["full_name", "id"], name="person_full_name_id_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
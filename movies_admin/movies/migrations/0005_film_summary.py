@@ -0,0 +1,313 @@
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Объекты могут быть уже созданы schema_design/db_schema.sql.
+FILM_SUMMARY_SQL = """
+-- Сводка по кинопроизведению: жанры и участники одной строкой на фильм.
+-- Поддерживается триггерами на таблицах-источниках, полностью
+-- пересчитывается функцией content.rebuild_film_summary().
+CREATE TABLE IF NOT EXISTS content.film_summary (
+    filmwork_id uuid NOT NULL PRIMARY KEY,
+    genres text[] NOT NULL DEFAULT '{}',
+    directors text[] NOT NULL DEFAULT '{}',
+    actors text[] NOT NULL DEFAULT '{}',
+    writers text[] NOT NULL DEFAULT '{}',
+    actors_count integer NOT NULL DEFAULT 0,
+    persons jsonb NOT NULL DEFAULT '[]',
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE VIEW content.film_summary_source AS
+SELECT
+    fw.id AS filmwork_id,
+    coalesce(g.genres, '{}') AS genres,
+    coalesce(p.directors, '{}') AS directors,
+    coalesce(p.actors, '{}') AS actors,
+    coalesce(p.writers, '{}') AS writers,
+    coalesce(p.actors_count, 0) AS actors_count,
+    coalesce(p.persons, '[]') AS persons
+FROM content.filmwork fw
+LEFT JOIN LATERAL (
+    SELECT array_agg(g.name::text ORDER BY g.name) AS genres
+    FROM content.genre_filmwork gfw
+    JOIN content.genre g ON g.id = gfw.genre_id
+    WHERE gfw.filmwork_id = fw.id
+) g ON true
+LEFT JOIN LATERAL (
+    SELECT
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'director') AS directors,
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'actor') AS actors,
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'writer') AS writers,
+        count(*) FILTER (WHERE pfw.role = 'actor') AS actors_count,
+        jsonb_agg(
+            jsonb_build_object('id', p.id, 'full_name', p.full_name, 'role', pfw.role)
+            ORDER BY pfw.role, p.full_name
+        ) AS persons
+    FROM content.person_filmwork pfw
+    JOIN content.person p ON p.id = pfw.person_id
+    WHERE pfw.filmwork_id = fw.id
+) p ON true;
+
+-- Строки обновляются в порядке id, чтобы параллельные загрузки не
+-- взаимоблокировались на одних и тех же фильмах.
+CREATE OR REPLACE FUNCTION content.refresh_film_summary(filmwork_ids uuid[]) RETURNS void AS $$
+    DELETE FROM content.film_summary fs
+    WHERE fs.filmwork_id = ANY(filmwork_ids)
+      AND NOT EXISTS (SELECT 1 FROM content.filmwork fw WHERE fw.id = fs.filmwork_id);
+    INSERT INTO content.film_summary AS fs
+        (filmwork_id, genres, directors, actors, writers, actors_count, persons, updated_at)
+    SELECT src.*, now()
+    FROM content.film_summary_source src
+    WHERE src.filmwork_id = ANY(filmwork_ids)
+    ORDER BY src.filmwork_id
+    ON CONFLICT (filmwork_id) DO UPDATE SET
+        genres = excluded.genres,
+        directors = excluded.directors,
+        actors = excluded.actors,
+        writers = excluded.writers,
+        actors_count = excluded.actors_count,
+        persons = excluded.persons,
+        updated_at = excluded.updated_at;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION content.rebuild_film_summary() RETURNS bigint AS $$
+    TRUNCATE content.film_summary;
+    INSERT INTO content.film_summary
+        (filmwork_id, genres, directors, actors, writers, actors_count, persons, updated_at)
+    SELECT src.*, now() FROM content.film_summary_source src;
+    SELECT count(*) FROM content.film_summary;
+$$ LANGUAGE sql;
+
+-- Триггеры копируются вместе с таблицами в теневую схему загрузчика, но
+-- срабатывают только на таблицах content: после подмены таблиц загрузчик
+-- пересчитывает сводку целиком.
+CREATE OR REPLACE FUNCTION content.film_summary_filmwork_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM content.film_summary WHERE filmwork_id IN (SELECT id FROM old_rows);
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_summary_links_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT DISTINCT filmwork_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT DISTINCT filmwork_id FROM old_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT filmwork_id FROM new_rows UNION SELECT filmwork_id FROM old_rows
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Переименование жанра или персоны пересчитывает только фильмы с ними.
+CREATE OR REPLACE FUNCTION content.film_summary_genre_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT DISTINCT gfw.filmwork_id
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN content.genre_filmwork gfw ON gfw.genre_id = n.id
+            WHERE n.name IS DISTINCT FROM o.name
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_summary_person_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT DISTINCT pfw.filmwork_id
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN content.person_filmwork pfw ON pfw.person_id = n.id
+            WHERE n.full_name IS DISTINCT FROM o.full_name
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора с таблицами переходов: пакет COPY или
+-- INSERT ... ON CONFLICT пересчитывает затронутые фильмы один раз.
+DROP TRIGGER IF EXISTS film_summary_insert ON content.filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+
+DROP TRIGGER IF EXISTS film_summary_insert ON content.genre_filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.genre_filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre_filmwork;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.genre_filmwork
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.genre_filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.genre_filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre_filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.genre_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+
+DROP TRIGGER IF EXISTS film_summary_insert ON content.person_filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.person_filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_update ON content.person_filmwork;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.person_filmwork
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.person_filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.person_filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person_filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.person_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.genre
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_genre_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.genre
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_genre_changed();
+
+DROP TRIGGER IF EXISTS film_summary_update ON content.person;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.person
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_person_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.person
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_person_changed();
+
+SELECT content.rebuild_film_summary();
+"""
+
+FILM_SUMMARY_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS film_summary_insert ON content.filmwork;
+DROP TRIGGER IF EXISTS film_summary_delete ON content.filmwork;
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.filmwork;
+DROP TRIGGER IF EXISTS film_summary_insert ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS film_summary_delete ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS film_summary_insert ON content.person_filmwork;
+DROP TRIGGER IF EXISTS film_summary_update ON content.person_filmwork;
+DROP TRIGGER IF EXISTS film_summary_delete ON content.person_filmwork;
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person_filmwork;
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre;
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre;
+DROP TRIGGER IF EXISTS film_summary_update ON content.person;
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person;
+DROP FUNCTION IF EXISTS content.film_summary_filmwork_changed();
+DROP FUNCTION IF EXISTS content.film_summary_links_changed();
+DROP FUNCTION IF EXISTS content.film_summary_genre_changed();
+DROP FUNCTION IF EXISTS content.film_summary_person_changed();
+DROP FUNCTION IF EXISTS content.rebuild_film_summary();
+DROP FUNCTION IF EXISTS content.refresh_film_summary(uuid[]);
+DROP VIEW IF EXISTS content.film_summary_source;
+DROP TABLE IF EXISTS content.film_summary;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_person_full_name_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=FILM_SUMMARY_SQL,
+            reverse_sql=FILM_SUMMARY_REVERSE_SQL,
+            state_operations=[
+                migrations.CreateModel(
+                    name="FilmSummary",
+                    fields=[
+                        (
+                            "filmwork",
+                            models.OneToOneField(
+                                db_constraint=False,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                primary_key=True,
+                                related_name="summary",
+                                serialize=False,
+                                to="movies.filmwork",
+                            ),
+                        ),
+                        (
+                            "genres",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.TextField(), default=list, size=None
+                            ),
+                        ),
+                        (
+                            "directors",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.TextField(), default=list, size=None
+                            ),
+                        ),
+                        (
+                            "actors",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.TextField(), default=list, size=None
+                            ),
+                        ),
+                        (
+                            "writers",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.TextField(), default=list, size=None
+                            ),
+                        ),
+                        ("actors_count", models.IntegerField(default=0)),
+                        ("persons", models.JSONField(default=list)),
+                        ("updated_at", models.DateTimeField()),
+                    ],
+                    options={
+                        "db_table": 'content"."film_summary',
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,349 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+# Объекты могут быть уже созданы schema_design/db_schema.sql.
+CHANGE_OUTBOX_SQL = """
+-- Журнал изменений каталога для внешних потребителей (поисковых индексов):
+-- запись на каждый оператор, изменивший таблицу каталога, с id фильмов,
+-- которые он затронул. filmwork_ids IS NULL - изменены все фильмы
+-- (TRUNCATE). Номер seq выдаётся при фиксации транзакции под блокировкой,
+-- поэтому номера растут в порядке фиксации, и потребитель, прочитавший
+-- записи до seq, не пропустит запись транзакции, зафиксированной позже.
+CREATE SEQUENCE IF NOT EXISTS content.change_outbox_seq;
+
+CREATE TABLE IF NOT EXISTS content.change_outbox (
+    id bigserial NOT NULL PRIMARY KEY,
+    seq bigint UNIQUE,
+    txid bigint NOT NULL DEFAULT txid_current(),
+    source text NOT NULL,
+    operation text NOT NULL,
+    filmwork_ids uuid[],
+    object_ids uuid[] NOT NULL DEFAULT '{}',
+    created_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS change_outbox_pending_idx
+    ON content.change_outbox (txid) WHERE seq IS NULL;
+
+CREATE OR REPLACE FUNCTION content.change_outbox_number() RETURNS trigger AS $$
+BEGIN
+    -- Блокировка держится до конца фиксации: транзакция, получившая
+    -- следующие номера, станет видна только после этой.
+    PERFORM pg_advisory_xact_lock('content.change_outbox'::regclass::oid::bigint);
+    UPDATE content.change_outbox outbox SET seq = pending.seq
+    FROM (
+        SELECT id, nextval('content.change_outbox_seq') AS seq
+        FROM (
+            SELECT id FROM content.change_outbox
+            WHERE txid = txid_current() AND seq IS NULL
+            ORDER BY id
+        ) own
+    ) pending
+    WHERE outbox.id = pending.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS change_outbox_number ON content.change_outbox;
+CREATE CONSTRAINT TRIGGER change_outbox_number AFTER INSERT ON content.change_outbox
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION content.change_outbox_number();
+
+-- Аргументы триггера: колонка с id фильма и колонка с id объекта строки.
+-- Как и триггеры сводки, срабатывает только на таблицах content.
+CREATE OR REPLACE FUNCTION content.change_outbox_rows_changed() RETURNS trigger AS $$
+DECLARE
+    changed_rows text := 'SELECT * FROM changed_rows';
+    filmwork_ids uuid[];
+    object_ids uuid[];
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, NULL);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        changed_rows := changed_rows || ' UNION ALL SELECT * FROM old_rows';
+    END IF;
+    EXECUTE format(
+        'SELECT array_agg(DISTINCT %I), array_agg(DISTINCT %I) FROM (%s) r',
+        TG_ARGV[0], TG_ARGV[1], changed_rows
+    ) INTO filmwork_ids, object_ids;
+    IF object_ids IS NOT NULL THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, filmwork_ids, object_ids);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Для жанров и персон затронутые фильмы ищутся по таблице связей,
+-- аргументы триггера: таблица связей и её колонка с id объекта.
+CREATE OR REPLACE FUNCTION content.change_outbox_linked_changed() RETURNS trigger AS $$
+DECLARE
+    changed_rows text := 'SELECT id FROM changed_rows';
+    filmwork_ids uuid[];
+    object_ids uuid[];
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, NULL);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        changed_rows := changed_rows || ' UNION SELECT id FROM old_rows';
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT id) FROM (%s) r', changed_rows)
+        INTO object_ids;
+    IF object_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'SELECT coalesce(array_agg(DISTINCT filmwork_id), ''{}'') '
+        'FROM content.%I WHERE %I = ANY($1)',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO filmwork_ids USING object_ids;
+    INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+    VALUES (TG_TABLE_NAME, TG_OP, filmwork_ids, object_ids);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Полная загрузка идёт в теневую схему, где триггеры не срабатывают:
+-- перед подменой таблиц изменения находятся сравнением теневых таблиц
+-- с content и записываются в журнал с operation = 'LOAD'.
+CREATE OR REPLACE FUNCTION content.record_load_changes(shadow text) RETURNS void AS $$
+DECLARE
+    entity text;
+    links text;
+    link_column text;
+BEGIN
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'filmwork', 'LOAD', ids, ids FROM (
+            SELECT array_agg(DISTINCT id) AS ids FROM (
+                (SELECT * FROM %1$I.filmwork EXCEPT SELECT * FROM content.filmwork)
+                UNION ALL
+                (SELECT * FROM content.filmwork EXCEPT SELECT * FROM %1$I.filmwork)
+            ) changed
+        ) changed
+        WHERE ids IS NOT NULL
+    $sql$, shadow);
+
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'genre_filmwork', 'LOAD', filmwork_ids, object_ids FROM (
+            SELECT array_agg(DISTINCT filmwork_id) AS filmwork_ids,
+                   array_agg(DISTINCT genre_id) AS object_ids
+            FROM (
+                (SELECT filmwork_id, genre_id FROM %1$I.genre_filmwork
+                 EXCEPT SELECT filmwork_id, genre_id FROM content.genre_filmwork)
+                UNION ALL
+                (SELECT filmwork_id, genre_id FROM content.genre_filmwork
+                 EXCEPT SELECT filmwork_id, genre_id FROM %1$I.genre_filmwork)
+            ) changed
+        ) changed
+        WHERE object_ids IS NOT NULL
+    $sql$, shadow);
+
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'person_filmwork', 'LOAD', filmwork_ids, object_ids FROM (
+            SELECT array_agg(DISTINCT filmwork_id) AS filmwork_ids,
+                   array_agg(DISTINCT person_id) AS object_ids
+            FROM (
+                (SELECT filmwork_id, person_id, role FROM %1$I.person_filmwork
+                 EXCEPT SELECT filmwork_id, person_id, role FROM content.person_filmwork)
+                UNION ALL
+                (SELECT filmwork_id, person_id, role FROM content.person_filmwork
+                 EXCEPT SELECT filmwork_id, person_id, role FROM %1$I.person_filmwork)
+            ) changed
+        ) changed
+        WHERE object_ids IS NOT NULL
+    $sql$, shadow);
+
+    FOR entity, links, link_column IN
+        VALUES ('genre', 'genre_filmwork', 'genre_id'),
+               ('person', 'person_filmwork', 'person_id')
+    LOOP
+        EXECUTE format($sql$
+            WITH changed AS (
+                SELECT DISTINCT id FROM (
+                    (SELECT * FROM %1$I.%2$I EXCEPT SELECT * FROM content.%2$I)
+                    UNION ALL
+                    (SELECT * FROM content.%2$I EXCEPT SELECT * FROM %1$I.%2$I)
+                ) changed
+            )
+            INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+            SELECT %2$L, 'LOAD',
+                ARRAY(
+                    SELECT filmwork_id FROM %1$I.%3$I WHERE %4$I IN (SELECT id FROM changed)
+                    UNION
+                    SELECT filmwork_id FROM content.%3$I WHERE %4$I IN (SELECT id FROM changed)
+                ),
+                ARRAY(SELECT id FROM changed)
+            WHERE EXISTS (SELECT 1 FROM changed)
+        $sql$, shadow, entity, links, link_column);
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора: пакет COPY или INSERT ... ON CONFLICT даёт
+-- одну запись журнала.
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.genre_filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.genre_filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.genre_filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.genre_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person_filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.person_filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person_filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.person_filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person_filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.person_filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person_filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.person_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.genre
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.genre
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.genre
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.genre
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.person
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.person
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.person
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.person
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+"""
+
+CHANGE_OUTBOX_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.filmwork;
+DROP TRIGGER IF EXISTS change_outbox_update ON content.filmwork;
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.filmwork;
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.filmwork;
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person_filmwork;
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre;
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre;
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre;
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre;
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person;
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person;
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person;
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person;
+DROP FUNCTION IF EXISTS content.record_load_changes(text);
+DROP FUNCTION IF EXISTS content.change_outbox_linked_changed();
+DROP FUNCTION IF EXISTS content.change_outbox_rows_changed();
+DROP TABLE IF EXISTS content.change_outbox;
+DROP FUNCTION IF EXISTS content.change_outbox_number();
+DROP SEQUENCE IF EXISTS content.change_outbox_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0005_film_summary"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=CHANGE_OUTBOX_SQL,
+            reverse_sql=CHANGE_OUTBOX_REVERSE_SQL,
+            state_operations=[
+                migrations.CreateModel(
+                    name="CatalogChange",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        ("seq", models.BigIntegerField(null=True, unique=True)),
+                        ("txid", models.BigIntegerField()),
+                        ("source", models.TextField()),
+                        ("operation", models.TextField()),
+                        (
+                            "filmwork_ids",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.UUIDField(), null=True, size=None
+                            ),
+                        ),
+                        (
+                            "object_ids",
+                            django.contrib.postgres.fields.ArrayField(
+                                base_field=models.UUIDField(), default=list, size=None
+                            ),
+                        ),
+                        ("created_at", models.DateTimeField()),
+                    ],
+                    options={
+                        "db_table": 'content"."change_outbox',
+                    },
+                ),
+            ],
+        ),
+    ]
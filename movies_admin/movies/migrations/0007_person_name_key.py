@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+import movies.models
+
+# Функция и индекс могут быть уже созданы schema_design/db_schema.sql.
+PERSON_NAME_KEY_SQL = """
+-- Ключ блокировки для поиска дубликатов персон: имя в нижнем регистре без
+-- диакритики, слова через один пробел. Дубликаты ищутся только среди
+-- персон с одинаковым ключом, индекс по ключу и дате рождения.
+CREATE OR REPLACE FUNCTION content.person_name_key(full_name text) RETURNS text AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            lower(full_name),
+            'àáâãäåçèéêëìíîïñòóôõöùúûüýÿāăąćĉċčďēĕėęěĝğġģĥĩīĭįĵķĺļľŀńņňōŏőŕŗřśŝşšţťũūŭůűųŵŷźżžſøłđħıёй',
+            'aaaaaaceeeeiiiinooooouuuuyyaaaccccdeeeeegggghiiiijkllllnnnooorrrssssttuuuuuuwyzzzsoldhiеи'
+        ),
+        '[^[:alnum:]]+', ' ', 'g'
+    ));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX IF NOT EXISTS person_name_key_idx
+    ON content.person (content.person_name_key(full_name), birth_date);
+
+-- Связи персоны: проверка внешнего ключа при удалении персоны и перенос
+-- связей при объединении дубликатов.
+CREATE INDEX IF NOT EXISTS person_filmwork_person_idx ON content.person_filmwork (person_id);
+"""
+
+PERSON_NAME_KEY_REVERSE_SQL = """
+DROP INDEX IF EXISTS content.person_filmwork_person_idx;
+DROP INDEX IF EXISTS content.person_name_key_idx;
+DROP FUNCTION IF EXISTS content.person_name_key(text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0006_change_outbox"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=PERSON_NAME_KEY_SQL,
+            reverse_sql=PERSON_NAME_KEY_REVERSE_SQL,
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="person",
+                    index=models.Index(
+                        movies.models.PersonNameKey("full_name"),
+                        models.F("birth_date"),
+                        name="person_name_key_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="personfilmwork",
+                    index=models.Index(
+                        fields=["person"], name="person_filmwork_person_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
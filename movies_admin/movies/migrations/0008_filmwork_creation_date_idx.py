@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0007_person_name_key"),
+    ]
+
+    # Индекс может быть уже создан schema_design/db_schema.sql.
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS filmwork_creation_date_idx "
+            "ON content.filmwork (creation_date)",
+            reverse_sql="DROP INDEX IF EXISTS content.filmwork_creation_date_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="filmwork",
+                    index=models.Index(
+                        fields=["creation_date"], name="filmwork_creation_date_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,5 +1,8 @@
 from uuid import uuid4
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -24,6 +27,8 @@ class Filmwork(TimeStampedIdMixin):
         _("Рейтинг"), validators=[MinValueValidator(0)], blank=True, null=True
     )
     type = models.CharField(_("Тип"), max_length=20)
+    # Заполняется триггером в базе по title и description.
+    search_vector = SearchVectorField(null=True, editable=False)
     genres = models.ManyToManyField(to="movies.Genre", through="movies.GenreFilmwork")
     persons = models.ManyToManyField(
         to="movies.Person", through="movies.PersonFilmwork"
@@ -36,6 +41,11 @@ class Filmwork(TimeStampedIdMixin):
         verbose_name = _("Кинопроизведение")
         verbose_name_plural = _("Кинопроизведения")
         db_table = 'content"."filmwork'
+        indexes = [
+            models.Index(fields=("title", "id"), name="filmwork_title_id_idx"),
+            models.Index(fields=("creation_date",), name="filmwork_creation_date_idx"),
+            GinIndex(fields=("search_vector",), name="filmwork_search_vector_idx"),
+        ]
 
 
 class Genre(TimeStampedIdMixin):
@@ -49,6 +59,20 @@ class Genre(TimeStampedIdMixin):
         verbose_name = _("Жанр")
         verbose_name_plural = _("Жанры")
         db_table = 'content"."genre'
+        indexes = [
+            GinIndex(
+                fields=("name",),
+                name="genre_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
+
+class PersonNameKey(models.Func):
+    """Ключ блокировки для поиска дубликатов персон, функция в базе."""
+
+    function = "content.person_name_key"
+    output_field = models.TextField()
 
 
 class Person(TimeStampedIdMixin):
@@ -62,6 +86,19 @@ class Person(TimeStampedIdMixin):
         verbose_name = _("Актер")
         verbose_name_plural = _("Актеры")
         db_table = 'content"."person'
+        indexes = [
+            models.Index(fields=("full_name", "id"), name="person_full_name_id_idx"),
+            models.Index(
+                PersonNameKey("full_name"),
+                models.F("birth_date"),
+                name="person_name_key_idx",
+            ),
+            GinIndex(
+                fields=("full_name",),
+                name="person_full_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
 
 class GenreFilmwork(models.Model):
@@ -87,3 +124,51 @@ class PersonFilmwork(models.Model):
         verbose_name_plural = _("Актеры")
         db_table = 'content"."person_filmwork'
         unique_together = (("filmwork", "person", "role"),)
+        indexes = [
+            models.Index(fields=["person"], name="person_filmwork_person_idx"),
+        ]
+
+
+class FilmSummary(models.Model):
+    """
+    Жанры и участники кинопроизведения одной строкой. Таблицу поддерживают
+    триггеры в базе, приложение её только читает.
+    """
+
+    filmwork = models.OneToOneField(
+        to="movies.Filmwork",
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_constraint=False,
+        related_name="summary",
+    )
+    genres = ArrayField(models.TextField(), default=list)
+    directors = ArrayField(models.TextField(), default=list)
+    actors = ArrayField(models.TextField(), default=list)
+    writers = ArrayField(models.TextField(), default=list)
+    actors_count = models.IntegerField(default=0)
+    persons = models.JSONField(default=list)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'content"."film_summary'
+
+
+class CatalogChange(models.Model):
+    """
+    Запись журнала изменений каталога content.change_outbox. Записи
+    добавляют триггеры в базе, номер seq назначается при фиксации.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    seq = models.BigIntegerField(unique=True, null=True)
+    txid = models.BigIntegerField()
+    source = models.TextField()
+    operation = models.TextField()
+    # NULL - изменены все фильмы (TRUNCATE).
+    filmwork_ids = ArrayField(models.UUIDField(), null=True)
+    object_ids = ArrayField(models.UUIDField(), default=list)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'content"."change_outbox'
@@ -0,0 +1,187 @@
+import base64
+import json
+from typing import Optional
+
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+from movies.search import RankedSearchChangeList
+
+# Начиная с этого числа строк вместо COUNT(*) показывается оценка планировщика.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+LAST_VAR = "last"
+KEYSET_VARS = (AFTER_VAR, BEFORE_VAR, LAST_VAR)
+
+
+def estimate_count(queryset: QuerySet) -> Optional[int]:
+    """
+    Оценка числа строк по статистике Postgres: для запроса без условий -
+    reltuples таблицы, иначе - число строк из плана EXPLAIN.
+    Возвращает None, если статистика ещё не собрана.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                (connection.ops.quote_name(queryset.model._meta.db_table),),
+            )
+            estimate = cursor.fetchone()[0]
+            return estimate if estimate >= 0 else None
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который на больших таблицах не выполняет COUNT(*)."""
+
+    threshold = ESTIMATED_COUNT_THRESHOLD
+    is_estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.threshold:
+            return super().count
+        self.is_estimated = True
+        return estimate
+
+
+def encode_cursor(values: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(token: str) -> Optional[tuple]:
+    """Значения курсора или None, если токен испорчен или подделан."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(values, list) or not all(
+        isinstance(value, (str, int, float)) or value is None for value in values
+    ):
+        return None
+    return tuple(values)
+
+
+class KeysetChangeList(RankedSearchChangeList):
+    """
+    Список объектов с постраничной навигацией по ключу (title, id).
+
+    При сортировке по умолчанию страницы выбираются условием
+    "(title, id) больше/меньше последней строки" по индексу, а не через
+    OFFSET, поэтому любая страница строится одинаково быстро. Вместо номеров
+    страниц выводятся ссылки на первую, предыдущую, следующую и последнюю.
+    При сортировке по колонкам списка и при поиске используется обычная
+    пагинация.
+    """
+
+    keyset_fields = ("title", "id")
+    keyset_links = None
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for name in KEYSET_VARS:
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    @property
+    def keyset_enabled(self) -> bool:
+        return ORDER_VAR not in self.params and not self.show_all and not self.query
+
+    def get_results(self, request):
+        if not self.keyset_enabled:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        self.paginator = paginator
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.can_show_all = False
+        self.multi_page = self.result_count > self.list_per_page
+
+        rows, has_previous, has_next = self._keyset_page()
+        self.result_list = rows
+        has_previous, has_next = rows and has_previous, rows and has_next
+        self.keyset_links = {
+            "first": has_previous and self._keyset_url(),
+            "previous": has_previous
+            and self._keyset_url(BEFORE_VAR, self._cursor(rows[0])),
+            "next": has_next and self._keyset_url(AFTER_VAR, self._cursor(rows[-1])),
+            "last": has_next and self._keyset_url(LAST_VAR, "1"),
+        }
+
+    def _keyset_page(self):
+        ascending = self.queryset.order_by(*self.keyset_fields)
+        descending = self.queryset.order_by(
+            *(f"-{field}" for field in self.keyset_fields)
+        )
+        size = self.list_per_page
+        after = self._cursor_param(AFTER_VAR)
+        before = self._cursor_param(BEFORE_VAR)
+        if after:
+            rows = list(ascending.filter(self._after(after))[: size + 1])
+            return rows[:size], True, len(rows) > size
+        if before:
+            rows = list(descending.filter(self._before(before))[: size + 1])
+            return rows[:size][::-1], len(rows) > size, True
+        if LAST_VAR in self.params:
+            rows = list(descending[: size + 1])
+            return rows[:size][::-1], len(rows) > size, False
+        rows = list(ascending[: size + 1])
+        return rows[:size], False, len(rows) > size
+
+    def _cursor_param(self, name: str) -> Optional[tuple]:
+        """Курсор из параметра; с испорченным курсором открывается первая страница."""
+        cursor = decode_cursor(self.params.get(name, ""))
+        if cursor is None or len(cursor) != len(self.keyset_fields):
+            return None
+        try:
+            return tuple(
+                self.lookup_opts.get_field(field).to_python(value)
+                for field, value in zip(self.keyset_fields, cursor)
+            )
+        except ValidationError:
+            return None
+
+    def _after(self, cursor: tuple) -> Q:
+        # Условие title >= значения позволяет Postgres начать поиск по
+        # индексу с нужного места, остальное отсекает строки с равным title.
+        title_field, id_field = self.keyset_fields
+        title, pk = cursor
+        return Q(**{f"{title_field}__gte": title}) & (
+            Q(**{f"{title_field}__gt": title})
+            | Q(**{title_field: title, f"{id_field}__gt": pk})
+        )
+
+    def _before(self, cursor: tuple) -> Q:
+        title_field, id_field = self.keyset_fields
+        title, pk = cursor
+        return Q(**{f"{title_field}__lte": title}) & (
+            Q(**{f"{title_field}__lt": title})
+            | Q(**{title_field: title, f"{id_field}__lt": pk})
+        )
+
+    def _cursor(self, obj) -> str:
+        return encode_cursor(
+            tuple(str(getattr(obj, field)) for field in self.keyset_fields)
+        )
+
+    def _keyset_url(self, name: str = None, value: str = None) -> str:
+        new_params = {name: value} if name else {}
+        remove = [PAGE_VAR, *(var for var in KEYSET_VARS if var != name)]
+        return self.get_query_string(new_params, remove)
@@ -0,0 +1,84 @@
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import CharField, F, Q, TextField
+from django.db.models.lookups import PatternLookup
+
+SEARCH_CONFIG = "english"
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILikeContains(PatternLookup):
+    """
+    Подстрока без учёта регистра: "колонка ILIKE '%...%'". Встроенный
+    icontains строит UPPER(колонка::text) LIKE, и индекс gin_trgm_ops по
+    самой колонке для него не используется.
+    """
+
+    lookup_name = "ilike_contains"
+
+    def get_rhs_op(self, connection, rhs):
+        return f"ILIKE {rhs}"
+
+
+class RankedSearchChangeList(ChangeList):
+    """При поиске без явной сортировки список упорядочен по релевантности."""
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if (
+            self.query
+            and ORDER_VAR not in self.params
+            and "rank" in queryset.query.annotations
+        ):
+            return ["-rank", *ordering]
+        return ordering
+
+
+class FullTextSearchMixin:
+    """
+    Поиск в админке по полю tsvector, которое поддерживает триггер в базе.
+    Запрос разбирается как в поисковиках (websearch_to_tsquery), условие
+    @@ обслуживает GIN-индекс, релевантность считается ts_rank.
+    """
+
+    search_vector_field = "search_vector"
+    search_config = SEARCH_CONFIG
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        query = SearchQuery(
+            search_term, config=self.search_config, search_type="websearch"
+        )
+        queryset = queryset.filter(**{self.search_vector_field: query}).annotate(
+            rank=SearchRank(F(self.search_vector_field), query)
+        )
+        return queryset.order_by("-rank", *self.get_ordering(request)), False
+
+    def get_changelist(self, request, **kwargs):
+        return RankedSearchChangeList
+
+
+class TrigramSearchMixin:
+    """
+    Поиск в админке по триграммам: подстрока (ILIKE) или похожее написание
+    (оператор %). Оба условия обслуживает GIN-индекс gin_trgm_ops,
+    релевантность - similarity().
+    """
+
+    trigram_field = "name"
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        field = self.trigram_field
+        queryset = queryset.filter(
+            Q(**{f"{field}__ilike_contains": search_term})
+            | Q(**{f"{field}__trigram_similar": search_term})
+        ).annotate(rank=TrigramSimilarity(field, search_term))
+        # Порядок важен для автодополнения, в списке его задаёт ChangeList.
+        return queryset.order_by("-rank", *self.get_ordering(request)), False
+
+    def get_changelist(self, request, **kwargs):
+        return RankedSearchChangeList
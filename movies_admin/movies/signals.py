@@ -0,0 +1,68 @@
+"""
+Сброс кеша кинопроизведений при изменениях через ORM.
+
+Сбрасываются только затронутые фильмы: при переименовании персоны или
+жанра - фильмы, в которых они указаны. Удаление жанра или персоны удаляет
+каскадом строки связей, и их post_delete сбрасывает фильмы. Сброс
+выполняется после фиксации транзакции, чтобы параллельный запрос не
+положил в кеш ещё не изменённые данные. Массовые update() и загрузка
+данных мимо ORM сигналов не вызывают, такие записи устаревают по TIMEOUT.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from movies.cache import filmwork_cache
+from movies.facets import invalidate_facets
+from movies.models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
+
+
+def invalidate_on_commit(filmwork_ids) -> None:
+    filmwork_ids = list(filmwork_ids)
+    if filmwork_ids:
+        transaction.on_commit(lambda: filmwork_cache.invalidate(filmwork_ids))
+
+
+@receiver(post_save, sender=Filmwork)
+@receiver(post_delete, sender=Filmwork)
+def invalidate_filmwork(sender, instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=GenreFilmwork)
+@receiver(post_delete, sender=GenreFilmwork)
+@receiver(post_save, sender=PersonFilmwork)
+@receiver(post_delete, sender=PersonFilmwork)
+def invalidate_link(sender, instance, **kwargs):
+    invalidate_on_commit([instance.filmwork_id])
+
+
+@receiver(post_save, sender=Genre)
+def invalidate_genre(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_on_commit(
+            GenreFilmwork.objects.filter(genre_id=instance.pk).values_list(
+                "filmwork_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Person)
+def invalidate_person(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_on_commit(
+            PersonFilmwork.objects.filter(person_id=instance.pk).values_list(
+                "filmwork_id", flat=True
+            )
+        )
+
+
+# Числа в фильтрах списка зависят от фильмов, их жанров и названий жанров.
+@receiver(post_save, sender=Filmwork)
+@receiver(post_delete, sender=Filmwork)
+@receiver(post_save, sender=GenreFilmwork)
+@receiver(post_delete, sender=GenreFilmwork)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_facet_counts(sender, **kwargs):
+    transaction.on_commit(invalidate_facets)
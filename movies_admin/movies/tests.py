@@ -0,0 +1,459 @@
+"""
+Тесты JSON API кинопроизведений (число запросов к базе не зависит от
+размера страницы и числа участников фильма), сброса кеша и счётчиков
+кеша кинопроизведений, бюджетов SQL страниц админки, сохранения формы кинопроизведения в админке, поиска в админке
+и загрузки каталога.
+
+Нужен Postgres из переменных окружения DB_*, тестовую базу создаёт Django:
+
+    python manage.py test movies
+"""
+import io
+import json
+import uuid
+from collections import Counter
+from datetime import date
+
+from django.contrib import admin
+from django.db import transaction
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from config.sql_budget import assert_sql_budget
+from movies.cache import FilmworkCache, filmwork_cache
+from movies.exchange import import_catalog
+from movies.models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
+from movies.pagination import encode_cursor
+
+FILMS = 30
+ROLES = ("director", "actor", "actor", "writer")
+SAVE_CREDITS = 500
+SAVE_CHANGED_ROWS = 10
+SAVE_BUDGET = 20
+CREDITS_PREFIX = "personfilmwork_set"
+# Больше одной страницы списка админки (list_per_page = 100).
+ADMIN_FILMS = 120
+ADMIN_GENRES = 5
+ADMIN_PERSONS = 50
+# Модель: (запросов на список, запросов на форму редактирования).
+ADMIN_SQL_BUDGETS = {
+    Filmwork: (8, 8),
+    Genre: (8, 6),
+    Person: (8, 6),
+}
+
+
+class MoviesApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        genres = Genre.objects.bulk_create(
+            Genre(name=f"Genre {number}") for number in range(3)
+        )
+        persons = Person.objects.bulk_create(
+            Person(full_name=f"Person {number}") for number in range(len(ROLES))
+        )
+        cls.films = Filmwork.objects.bulk_create(
+            Filmwork(title=f"Film {number:03}", type="movie", rating=number % 10)
+            for number in range(FILMS)
+        )
+        GenreFilmwork.objects.bulk_create(
+            GenreFilmwork(filmwork=film, genre=genre)
+            for film in cls.films
+            for genre in genres[:2]
+        )
+        PersonFilmwork.objects.bulk_create(
+            PersonFilmwork(filmwork=film, person=person, role=role)
+            for film in cls.films
+            for person, role in zip(persons, ROLES)
+        )
+
+    def setUp(self):
+        filmwork_cache.clear()
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for page_size in (1, 10, FILMS, 100):
+            with self.subTest(page_size=page_size), self.assertNumQueries(1):
+                response = self.client.get("/api/v1/movies/", {"page_size": page_size})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(len(data["results"]), min(page_size, FILMS))
+            self.assertEqual(data["next"] is None, page_size >= FILMS)
+            film = data["results"][0]
+            self.assertEqual(film["title"], "Film 000")
+            self.assertEqual(len(film["genres"]), 2)
+            self.assertEqual(len(film["persons"]["actor"]), 2)
+
+    def test_list_cursor_walks_all_pages(self):
+        titles = []
+        cursor = ""
+        while cursor is not None:
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    "/api/v1/movies/", {"page_size": 7, "cursor": cursor}
+                )
+            data = response.json()
+            titles.extend(film["title"] for film in data["results"])
+            cursor = data["next"]
+        self.assertEqual(titles, sorted(film.title for film in self.films))
+
+    def test_list_rejects_malformed_cursor(self):
+        tokens = [
+            "!!!",
+            encode_cursor(123),
+            encode_cursor(["Film 000"]),
+            encode_cursor(["Film 000", "not-a-uuid"]),
+            encode_cursor([None, str(self.films[0].pk)]),
+        ]
+        for token in tokens:
+            with self.subTest(token=token), self.assertNumQueries(0):
+                response = self.client.get("/api/v1/movies/", {"cursor": token})
+            self.assertEqual(response.status_code, 400)
+
+    def test_detail_is_one_query_then_cached(self):
+        url = f"/api/v1/movies/{self.films[0].pk}/"
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["title"], "Film 000")
+        self.assertEqual(len(response.json()["persons"]["actor"]), 2)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_detail_not_found(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/v1/movies/00000000-0000-0000-0000-000000000000/"
+            )
+        self.assertEqual(response.status_code, 404)
+
+
+class FilmworkCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.renamed, cls.other = Person.objects.bulk_create(
+            Person(full_name=name) for name in ("Renamed", "Other")
+        )
+        cls.films = Filmwork.objects.bulk_create(
+            Filmwork(title=f"Film {number}", type="movie") for number in range(3)
+        )
+        PersonFilmwork.objects.bulk_create(
+            [
+                PersonFilmwork(filmwork=cls.films[0], person=cls.renamed, role="actor"),
+                PersonFilmwork(
+                    filmwork=cls.films[1], person=cls.renamed, role="writer"
+                ),
+                PersonFilmwork(filmwork=cls.films[1], person=cls.other, role="actor"),
+                PersonFilmwork(filmwork=cls.films[2], person=cls.other, role="actor"),
+            ]
+        )
+
+    def setUp(self):
+        filmwork_cache.clear()
+        for film in self.films:
+            filmwork_cache.cache.set(filmwork_cache.key(film.pk), {"id": str(film.pk)})
+
+    def cached_films(self) -> set:
+        return {
+            film
+            for film in self.films
+            if filmwork_cache.cache.get(filmwork_cache.key(film.pk)) is not None
+        }
+
+    def test_person_rename_invalidates_only_their_films(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.renamed.full_name = "Renamed again"
+            self.renamed.save()
+        self.assertEqual(self.cached_films(), {self.films[2]})
+
+    def test_rolled_back_changes_invalidate_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.renamed.full_name = "Renamed again"
+                self.renamed.save()
+                self.films[2].title = "Retitled"
+                self.films[2].save()
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.cached_films(), set(self.films))
+
+    def test_stats_are_logged_and_reset_per_interval(self):
+        cache = FilmworkCache(stats_interval=1e-9)
+        pk = uuid.uuid4()
+        with self.assertLogs("movies.cache", "INFO") as logs:
+            cache.get_or_build(pk, lambda: {"id": str(pk)})
+            cache.get_or_build(pk, lambda: {"id": str(pk)})
+        stats = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(
+            [(line["hits"], line["misses"]) for line in stats], [(0, 1), (1, 0)]
+        )
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "hit_ratio": None})
+
+
+class AdminPageBudgetTest(TestCase):
+    """
+    Список и форма редактирования кинопроизведений, жанров и персон
+    укладываются в бюджеты ADMIN_SQL_BUDGETS. Форма открывается для
+    объекта с наибольшим числом связей, чтобы N+1 в inline проявился
+    сразу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "admin"
+        )
+        genres = Genre.objects.bulk_create(
+            Genre(name=f"Genre {number}") for number in range(ADMIN_GENRES)
+        )
+        persons = Person.objects.bulk_create(
+            Person(full_name=f"Person {number:02}") for number in range(ADMIN_PERSONS)
+        )
+        films = Filmwork.objects.bulk_create(
+            Filmwork(title=f"Film {number:03}", type="movie", rating=number % 10)
+            for number in range(ADMIN_FILMS)
+        )
+        GenreFilmwork.objects.bulk_create(
+            GenreFilmwork(filmwork=film, genre=genre)
+            for number, film in enumerate(films)
+            for genre in {genres[0], genres[number % ADMIN_GENRES]}
+        )
+        PersonFilmwork.objects.bulk_create(
+            [
+                PersonFilmwork(filmwork=films[0], person=person, role="actor")
+                for person in persons
+            ]
+            + [
+                PersonFilmwork(
+                    filmwork=film,
+                    person=persons[number % ADMIN_PERSONS],
+                    role="director",
+                )
+                for number, film in enumerate(films[1:], start=1)
+            ]
+        )
+        cls.busiest = {Filmwork: films[0], Genre: genres[0], Person: persons[0]}
+
+    def test_admin_pages_fit_budgets(self):
+        self.client.force_login(self.user)
+        for model, (changelist_budget, change_budget) in ADMIN_SQL_BUDGETS.items():
+            info = model._meta.app_label, model._meta.model_name
+            pages = (
+                (
+                    "changelist",
+                    reverse("admin:%s_%s_changelist" % info),
+                    changelist_budget,
+                ),
+                (
+                    "change",
+                    reverse(
+                        "admin:%s_%s_change" % info, args=(self.busiest[model].pk,)
+                    ),
+                    change_budget,
+                ),
+            )
+            for page, url, budget in pages:
+                with self.subTest(model=model.__name__, page=page):
+                    with assert_sql_budget(budget):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+
+class FilmworkAdminSaveTest(TestCase):
+    """
+    Сохранение формы фильма с SAVE_CREDITS участниками: часть строк inline
+    меняется, удаляется и добавляется, число запросов не зависит от числа
+    строк; строки могут обмениваться значениями ключа.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "admin"
+        )
+        cls.persons = Person.objects.bulk_create(
+            Person(full_name=f"Person {number:03}")
+            for number in range(SAVE_CREDITS + SAVE_CHANGED_ROWS)
+        )
+        cls.filmwork = Filmwork.objects.create(title="Crowded film", type="movie")
+        PersonFilmwork.objects.bulk_create(
+            PersonFilmwork(filmwork=cls.filmwork, person=person, role="actor")
+            for person in cls.persons[:SAVE_CREDITS]
+        )
+
+    def test_save_with_many_credits_fits_budget(self):
+        self.client.force_login(self.user)
+        url = reverse("admin:movies_filmwork_change", args=(self.filmwork.pk,))
+        data = self.change_form_data(self.client.get(url))
+        data.update(self.credits_changes(data, self.persons[SAVE_CREDITS:]))
+
+        with assert_sql_budget(SAVE_BUDGET):
+            response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        roles = Counter(
+            PersonFilmwork.objects.filter(filmwork=self.filmwork).values_list(
+                "role", flat=True
+            )
+        )
+        self.assertEqual(
+            roles,
+            {
+                "actor": SAVE_CREDITS - 2 * SAVE_CHANGED_ROWS,
+                "director": SAVE_CHANGED_ROWS,
+                "writer": SAVE_CHANGED_ROWS,
+            },
+        )
+
+    def test_swapping_credit_values_between_rows(self):
+        # Обмен значениями временно повторяет ключ person_filmwork_role.
+        first, second = self.persons[:2]
+        PersonFilmwork.objects.create(
+            filmwork=self.filmwork, person=first, role="director"
+        )
+        self.client.force_login(self.user)
+        url = reverse("admin:movies_filmwork_change", args=(self.filmwork.pk,))
+        data = self.change_form_data(self.client.get(url))
+        rows = {
+            (data[f"{prefix}-person"], data[f"{prefix}-role"]): prefix
+            for prefix in (
+                f"{CREDITS_PREFIX}-{index}"
+                for index in range(int(data[f"{CREDITS_PREFIX}-TOTAL_FORMS"]))
+            )
+        }
+        first_actor = rows[(str(first.pk), "actor")]
+        first_director = rows[(str(first.pk), "director")]
+        second_actor = rows[(str(second.pk), "actor")]
+        data[f"{first_actor}-role"] = "director"
+        data[f"{first_director}-role"] = "actor"
+        data[f"{first_director}-person"] = str(second.pk)
+        data[f"{second_actor}-person"] = str(first.pk)
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        credits = {
+            str(pk): (str(person), role)
+            for pk, person, role in PersonFilmwork.objects.filter(
+                filmwork=self.filmwork, person__in=(first, second)
+            ).values_list("pk", "person", "role")
+        }
+        self.assertEqual(
+            credits,
+            {
+                data[f"{first_actor}-id"]: (str(first.pk), "director"),
+                data[f"{first_director}-id"]: (str(second.pk), "actor"),
+                data[f"{second_actor}-id"]: (str(first.pk), "actor"),
+            },
+        )
+
+    @staticmethod
+    def change_form_data(response) -> dict:
+        """Данные POST, которые отправила бы открытая форма без изменений."""
+        forms = [response.context["adminform"].form]
+        for inline in response.context["inline_admin_formsets"]:
+            forms.extend((inline.formset.management_form, *inline.formset.forms))
+        data = {}
+        for form in forms:
+            for bound in form:
+                value = bound.value()
+                if value is None or value is False:
+                    continue
+                data[bound.html_name] = "on" if value is True else str(value)
+        return data
+
+    def credits_changes(self, data: dict, new_persons: list) -> dict:
+        """Меняет роль у одних строк, удаляет другие и добавляет новые."""
+        changes = {}
+        for index in range(SAVE_CHANGED_ROWS):
+            changes[f"{CREDITS_PREFIX}-{index}-role"] = "director"
+            changes[f"{CREDITS_PREFIX}-{SAVE_CHANGED_ROWS + index}-DELETE"] = "on"
+        total = int(data[f"{CREDITS_PREFIX}-TOTAL_FORMS"])
+        for index, person in enumerate(new_persons, start=total):
+            changes[f"{CREDITS_PREFIX}-{index}-filmwork"] = str(self.filmwork.pk)
+            changes[f"{CREDITS_PREFIX}-{index}-person"] = str(person.pk)
+            changes[f"{CREDITS_PREFIX}-{index}-role"] = "writer"
+        changes[f"{CREDITS_PREFIX}-TOTAL_FORMS"] = str(total + len(new_persons))
+        return changes
+
+
+class TrigramSearchTest(SimpleTestCase):
+    def test_substring_search_compares_raw_column(self):
+        # Индекс gin_trgm_ops по колонке не обслуживает UPPER(колонка) LIKE.
+        for model, field in ((Genre, "name"), (Person, "full_name")):
+            with self.subTest(model=model.__name__):
+                queryset, _ = admin.site._registry[model].get_search_results(
+                    None, model.objects.all(), "Star_Wars"
+                )
+                sql, params = queryset.query.sql_with_params()
+                self.assertIn(f'"{field}" ILIKE %s', sql)
+                self.assertNotIn("UPPER(", sql)
+                self.assertIn(r"%Star\_Wars%", params)
+
+
+class MergeDuplicatesActionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "admin"
+        )
+        cls.selected, cls.duplicate, *cls.namesakes = Person.objects.bulk_create(
+            [
+                Person(full_name="José Díaz", birth_date=date(1970, 1, 1)),
+                Person(full_name="Jose Diaz", birth_date=date(1970, 1, 1)),
+                Person(full_name="JOSE DIAZ", birth_date=date(1980, 1, 1)),
+                Person(full_name="Jose  Diaz", birth_date=date(1980, 1, 1)),
+            ]
+        )
+        films = Filmwork.objects.bulk_create(
+            Filmwork(title=f"Film {number}", type="movie") for number in range(3)
+        )
+        PersonFilmwork.objects.bulk_create(
+            PersonFilmwork(filmwork=film, person=person, role="actor")
+            for film, person in zip(films, (cls.selected, cls.duplicate, cls.duplicate))
+        )
+
+    def test_selected_person_is_merged_with_catalog_duplicates(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("admin:movies_person_changelist"),
+            {"action": "merge_duplicates", "_selected_action": [self.selected.pk]},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        # Однофамильцы 1980 года - тоже дубликаты, но без персон выборки.
+        self.assertEqual(
+            set(Person.objects.values_list("pk", flat=True)),
+            {self.duplicate.pk, *(person.pk for person in self.namesakes)},
+        )
+        self.assertEqual(
+            PersonFilmwork.objects.filter(person=self.duplicate).count(), 3
+        )
+
+
+class CatalogImportTest(TestCase):
+    def test_null_like_text_is_imported_as_text(self):
+        record = {
+            "id": str(uuid.uuid4()),
+            "title": "\\N",
+            "description": "",
+            "creation_date": None,
+            "certificate": 'Say "\\N"',
+            "file_path": None,
+            "rating": 7.5,
+            "type": "movie",
+            "genres": ["\\N"],
+            "persons": [{"id": str(uuid.uuid4()), "full_name": "\\N", "role": "actor"}],
+        }
+        import_catalog(io.StringIO(json.dumps(record) + "\n"), "jsonl")
+
+        film = Filmwork.objects.get(pk=record["id"])
+        self.assertEqual(film.title, "\\N")
+        self.assertEqual(film.description, "")
+        self.assertEqual(film.certificate, 'Say "\\N"')
+        self.assertIsNone(film.file_path)
+        self.assertIsNone(film.creation_date)
+        self.assertEqual(film.rating, 7.5)
+        self.assertEqual([genre.name for genre in film.genres.all()], ["\\N"])
+        self.assertEqual([person.full_name for person in film.persons.all()], ["\\N"])
@@ -62,4 +62,551 @@ CREATE TABLE IF NOT EXISTS content.person_filmwork (
 CREATE UNIQUE INDEX IF NOT EXISTS filmwork_genre ON content.genre_filmwork (filmwork_id, genre_id);
 
 -- Уникальный композитный индекс для кинопроизведения, актера и жанра:
-CREATE UNIQUE INDEX IF NOT EXISTS person_filmwork_role ON content.person_filmwork (filmwork_id, person_id, role);
\ No newline at end of file
+CREATE UNIQUE INDEX IF NOT EXISTS person_filmwork_role ON content.person_filmwork (filmwork_id, person_id, role);
+
+-- Индекс для сортировки и постраничной навигации по названию в админке:
+CREATE INDEX IF NOT EXISTS filmwork_title_id_idx ON content.filmwork (title, id);
+
+-- Индекс для фильтра по году создания в админке:
+CREATE INDEX IF NOT EXISTS filmwork_creation_date_idx ON content.filmwork (creation_date);
+
+
+-- Полнотекстовый поиск по кинопроизведениям: вектор поддерживается триггером.
+ALTER TABLE content.filmwork ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION content.filmwork_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS filmwork_search_vector_update ON content.filmwork;
+CREATE TRIGGER filmwork_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON content.filmwork
+    FOR EACH ROW EXECUTE FUNCTION content.filmwork_search_vector_update();
+
+CREATE INDEX IF NOT EXISTS filmwork_search_vector_idx ON content.filmwork USING gin (search_vector);
+
+-- Триграммный поиск по жанрам и персонам:
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+CREATE INDEX IF NOT EXISTS genre_name_trgm_idx ON content.genre USING gin (name public.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS person_full_name_trgm_idx ON content.person USING gin (full_name public.gin_trgm_ops);
+
+-- Индекс для сортировки персон по имени в списке и автодополнении:
+CREATE INDEX IF NOT EXISTS person_full_name_id_idx ON content.person (full_name, id);
+
+-- Ключ блокировки для поиска дубликатов персон: имя в нижнем регистре без
+-- диакритики, слова через один пробел. Дубликаты ищутся только среди
+-- персон с одинаковым ключом, индекс по ключу и дате рождения.
+CREATE OR REPLACE FUNCTION content.person_name_key(full_name text) RETURNS text AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            lower(full_name),
+            'àáâãäåçèéêëìíîïñòóôõöùúûüýÿāăąćĉċčďēĕėęěĝğġģĥĩīĭįĵķĺļľŀńņňōŏőŕŗřśŝşšţťũūŭůűųŵŷźżžſøłđħıёй',
+            'aaaaaaceeeeiiiinooooouuuuyyaaaccccdeeeeegggghiiiijkllllnnnooorrrssssttuuuuuuwyzzzsoldhiеи'
+        ),
+        '[^[:alnum:]]+', ' ', 'g'
+    ));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX IF NOT EXISTS person_name_key_idx
+    ON content.person (content.person_name_key(full_name), birth_date);
+
+-- Связи персоны: проверка внешнего ключа при удалении персоны и перенос
+-- связей при объединении дубликатов.
+CREATE INDEX IF NOT EXISTS person_filmwork_person_idx ON content.person_filmwork (person_id);
+
+-- Сводка по кинопроизведению: жанры и участники одной строкой на фильм.
+-- Поддерживается триггерами на таблицах-источниках, полностью
+-- пересчитывается функцией content.rebuild_film_summary().
+CREATE TABLE IF NOT EXISTS content.film_summary (
+    filmwork_id uuid NOT NULL PRIMARY KEY,
+    genres text[] NOT NULL DEFAULT '{}',
+    directors text[] NOT NULL DEFAULT '{}',
+    actors text[] NOT NULL DEFAULT '{}',
+    writers text[] NOT NULL DEFAULT '{}',
+    actors_count integer NOT NULL DEFAULT 0,
+    persons jsonb NOT NULL DEFAULT '[]',
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE VIEW content.film_summary_source AS
+SELECT
+    fw.id AS filmwork_id,
+    coalesce(g.genres, '{}') AS genres,
+    coalesce(p.directors, '{}') AS directors,
+    coalesce(p.actors, '{}') AS actors,
+    coalesce(p.writers, '{}') AS writers,
+    coalesce(p.actors_count, 0) AS actors_count,
+    coalesce(p.persons, '[]') AS persons
+FROM content.filmwork fw
+LEFT JOIN LATERAL (
+    SELECT array_agg(g.name::text ORDER BY g.name) AS genres
+    FROM content.genre_filmwork gfw
+    JOIN content.genre g ON g.id = gfw.genre_id
+    WHERE gfw.filmwork_id = fw.id
+) g ON true
+LEFT JOIN LATERAL (
+    SELECT
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'director') AS directors,
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'actor') AS actors,
+        array_agg(p.full_name::text ORDER BY p.full_name) FILTER (WHERE pfw.role = 'writer') AS writers,
+        count(*) FILTER (WHERE pfw.role = 'actor') AS actors_count,
+        jsonb_agg(
+            jsonb_build_object('id', p.id, 'full_name', p.full_name, 'role', pfw.role)
+            ORDER BY pfw.role, p.full_name
+        ) AS persons
+    FROM content.person_filmwork pfw
+    JOIN content.person p ON p.id = pfw.person_id
+    WHERE pfw.filmwork_id = fw.id
+) p ON true;
+
+-- Строки обновляются в порядке id, чтобы параллельные загрузки не
+-- взаимоблокировались на одних и тех же фильмах.
+CREATE OR REPLACE FUNCTION content.refresh_film_summary(filmwork_ids uuid[]) RETURNS void AS $$
+    DELETE FROM content.film_summary fs
+    WHERE fs.filmwork_id = ANY(filmwork_ids)
+      AND NOT EXISTS (SELECT 1 FROM content.filmwork fw WHERE fw.id = fs.filmwork_id);
+    INSERT INTO content.film_summary AS fs
+        (filmwork_id, genres, directors, actors, writers, actors_count, persons, updated_at)
+    SELECT src.*, now()
+    FROM content.film_summary_source src
+    WHERE src.filmwork_id = ANY(filmwork_ids)
+    ORDER BY src.filmwork_id
+    ON CONFLICT (filmwork_id) DO UPDATE SET
+        genres = excluded.genres,
+        directors = excluded.directors,
+        actors = excluded.actors,
+        writers = excluded.writers,
+        actors_count = excluded.actors_count,
+        persons = excluded.persons,
+        updated_at = excluded.updated_at;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION content.rebuild_film_summary() RETURNS bigint AS $$
+    TRUNCATE content.film_summary;
+    INSERT INTO content.film_summary
+        (filmwork_id, genres, directors, actors, writers, actors_count, persons, updated_at)
+    SELECT src.*, now() FROM content.film_summary_source src;
+    SELECT count(*) FROM content.film_summary;
+$$ LANGUAGE sql;
+
+-- Триггеры копируются вместе с таблицами в теневую схему загрузчика, но
+-- срабатывают только на таблицах content: после подмены таблиц загрузчик
+-- пересчитывает сводку целиком.
+CREATE OR REPLACE FUNCTION content.film_summary_filmwork_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM content.film_summary WHERE filmwork_id IN (SELECT id FROM old_rows);
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_summary_links_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT DISTINCT filmwork_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(SELECT DISTINCT filmwork_id FROM old_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT filmwork_id FROM new_rows UNION SELECT filmwork_id FROM old_rows
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Переименование жанра или персоны пересчитывает только фильмы с ними.
+CREATE OR REPLACE FUNCTION content.film_summary_genre_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT DISTINCT gfw.filmwork_id
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN content.genre_filmwork gfw ON gfw.genre_id = n.id
+            WHERE n.name IS DISTINCT FROM o.name
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_summary_person_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_summary(ARRAY(
+            SELECT DISTINCT pfw.filmwork_id
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN content.person_filmwork pfw ON pfw.person_id = n.id
+            WHERE n.full_name IS DISTINCT FROM o.full_name
+        ));
+    ELSE
+        PERFORM content.rebuild_film_summary();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора с таблицами переходов: пакет COPY или
+-- INSERT ... ON CONFLICT пересчитывает затронутые фильмы один раз.
+DROP TRIGGER IF EXISTS film_summary_insert ON content.filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_filmwork_changed();
+
+DROP TRIGGER IF EXISTS film_summary_insert ON content.genre_filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.genre_filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre_filmwork;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.genre_filmwork
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.genre_filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.genre_filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre_filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.genre_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+
+DROP TRIGGER IF EXISTS film_summary_insert ON content.person_filmwork;
+CREATE TRIGGER film_summary_insert AFTER INSERT ON content.person_filmwork
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_update ON content.person_filmwork;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.person_filmwork
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_delete ON content.person_filmwork;
+CREATE TRIGGER film_summary_delete AFTER DELETE ON content.person_filmwork
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person_filmwork;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.person_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_links_changed();
+
+DROP TRIGGER IF EXISTS film_summary_update ON content.genre;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.genre
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_genre_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.genre;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.genre
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_genre_changed();
+
+DROP TRIGGER IF EXISTS film_summary_update ON content.person;
+CREATE TRIGGER film_summary_update AFTER UPDATE ON content.person
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_person_changed();
+DROP TRIGGER IF EXISTS film_summary_truncate ON content.person;
+CREATE TRIGGER film_summary_truncate AFTER TRUNCATE ON content.person
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_summary_person_changed();
+
+-- Журнал изменений каталога для внешних потребителей (поисковых индексов):
+-- запись на каждый оператор, изменивший таблицу каталога, с id фильмов,
+-- которые он затронул. filmwork_ids IS NULL - изменены все фильмы
+-- (TRUNCATE). Номер seq выдаётся при фиксации транзакции под блокировкой,
+-- поэтому номера растут в порядке фиксации, и потребитель, прочитавший
+-- записи до seq, не пропустит запись транзакции, зафиксированной позже.
+CREATE SEQUENCE IF NOT EXISTS content.change_outbox_seq;
+
+CREATE TABLE IF NOT EXISTS content.change_outbox (
+    id bigserial NOT NULL PRIMARY KEY,
+    seq bigint UNIQUE,
+    txid bigint NOT NULL DEFAULT txid_current(),
+    source text NOT NULL,
+    operation text NOT NULL,
+    filmwork_ids uuid[],
+    object_ids uuid[] NOT NULL DEFAULT '{}',
+    created_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS change_outbox_pending_idx
+    ON content.change_outbox (txid) WHERE seq IS NULL;
+
+CREATE OR REPLACE FUNCTION content.change_outbox_number() RETURNS trigger AS $$
+BEGIN
+    -- Блокировка держится до конца фиксации: транзакция, получившая
+    -- следующие номера, станет видна только после этой.
+    PERFORM pg_advisory_xact_lock('content.change_outbox'::regclass::oid::bigint);
+    UPDATE content.change_outbox outbox SET seq = pending.seq
+    FROM (
+        SELECT id, nextval('content.change_outbox_seq') AS seq
+        FROM (
+            SELECT id FROM content.change_outbox
+            WHERE txid = txid_current() AND seq IS NULL
+            ORDER BY id
+        ) own
+    ) pending
+    WHERE outbox.id = pending.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS change_outbox_number ON content.change_outbox;
+CREATE CONSTRAINT TRIGGER change_outbox_number AFTER INSERT ON content.change_outbox
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION content.change_outbox_number();
+
+-- Аргументы триггера: колонка с id фильма и колонка с id объекта строки.
+-- Как и триггеры сводки, срабатывает только на таблицах content.
+CREATE OR REPLACE FUNCTION content.change_outbox_rows_changed() RETURNS trigger AS $$
+DECLARE
+    changed_rows text := 'SELECT * FROM changed_rows';
+    filmwork_ids uuid[];
+    object_ids uuid[];
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, NULL);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        changed_rows := changed_rows || ' UNION ALL SELECT * FROM old_rows';
+    END IF;
+    EXECUTE format(
+        'SELECT array_agg(DISTINCT %I), array_agg(DISTINCT %I) FROM (%s) r',
+        TG_ARGV[0], TG_ARGV[1], changed_rows
+    ) INTO filmwork_ids, object_ids;
+    IF object_ids IS NOT NULL THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, filmwork_ids, object_ids);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Для жанров и персон затронутые фильмы ищутся по таблице связей,
+-- аргументы триггера: таблица связей и её колонка с id объекта.
+CREATE OR REPLACE FUNCTION content.change_outbox_linked_changed() RETURNS trigger AS $$
+DECLARE
+    changed_rows text := 'SELECT id FROM changed_rows';
+    filmwork_ids uuid[];
+    object_ids uuid[];
+BEGIN
+    IF TG_TABLE_SCHEMA <> 'content' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids)
+        VALUES (TG_TABLE_NAME, TG_OP, NULL);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        changed_rows := changed_rows || ' UNION SELECT id FROM old_rows';
+    END IF;
+    EXECUTE format('SELECT array_agg(DISTINCT id) FROM (%s) r', changed_rows)
+        INTO object_ids;
+    IF object_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'SELECT coalesce(array_agg(DISTINCT filmwork_id), ''{}'') '
+        'FROM content.%I WHERE %I = ANY($1)',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO filmwork_ids USING object_ids;
+    INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+    VALUES (TG_TABLE_NAME, TG_OP, filmwork_ids, object_ids);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Полная загрузка идёт в теневую схему, где триггеры не срабатывают:
+-- перед подменой таблиц изменения находятся сравнением теневых таблиц
+-- с content и записываются в журнал с operation = 'LOAD'.
+CREATE OR REPLACE FUNCTION content.record_load_changes(shadow text) RETURNS void AS $$
+DECLARE
+    entity text;
+    links text;
+    link_column text;
+BEGIN
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'filmwork', 'LOAD', ids, ids FROM (
+            SELECT array_agg(DISTINCT id) AS ids FROM (
+                (SELECT * FROM %1$I.filmwork EXCEPT SELECT * FROM content.filmwork)
+                UNION ALL
+                (SELECT * FROM content.filmwork EXCEPT SELECT * FROM %1$I.filmwork)
+            ) changed
+        ) changed
+        WHERE ids IS NOT NULL
+    $sql$, shadow);
+
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'genre_filmwork', 'LOAD', filmwork_ids, object_ids FROM (
+            SELECT array_agg(DISTINCT filmwork_id) AS filmwork_ids,
+                   array_agg(DISTINCT genre_id) AS object_ids
+            FROM (
+                (SELECT filmwork_id, genre_id FROM %1$I.genre_filmwork
+                 EXCEPT SELECT filmwork_id, genre_id FROM content.genre_filmwork)
+                UNION ALL
+                (SELECT filmwork_id, genre_id FROM content.genre_filmwork
+                 EXCEPT SELECT filmwork_id, genre_id FROM %1$I.genre_filmwork)
+            ) changed
+        ) changed
+        WHERE object_ids IS NOT NULL
+    $sql$, shadow);
+
+    EXECUTE format($sql$
+        INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+        SELECT 'person_filmwork', 'LOAD', filmwork_ids, object_ids FROM (
+            SELECT array_agg(DISTINCT filmwork_id) AS filmwork_ids,
+                   array_agg(DISTINCT person_id) AS object_ids
+            FROM (
+                (SELECT filmwork_id, person_id, role FROM %1$I.person_filmwork
+                 EXCEPT SELECT filmwork_id, person_id, role FROM content.person_filmwork)
+                UNION ALL
+                (SELECT filmwork_id, person_id, role FROM content.person_filmwork
+                 EXCEPT SELECT filmwork_id, person_id, role FROM %1$I.person_filmwork)
+            ) changed
+        ) changed
+        WHERE object_ids IS NOT NULL
+    $sql$, shadow);
+
+    FOR entity, links, link_column IN
+        VALUES ('genre', 'genre_filmwork', 'genre_id'),
+               ('person', 'person_filmwork', 'person_id')
+    LOOP
+        EXECUTE format($sql$
+            WITH changed AS (
+                SELECT DISTINCT id FROM (
+                    (SELECT * FROM %1$I.%2$I EXCEPT SELECT * FROM content.%2$I)
+                    UNION ALL
+                    (SELECT * FROM content.%2$I EXCEPT SELECT * FROM %1$I.%2$I)
+                ) changed
+            )
+            INSERT INTO content.change_outbox (source, operation, filmwork_ids, object_ids)
+            SELECT %2$L, 'LOAD',
+                ARRAY(
+                    SELECT filmwork_id FROM %1$I.%3$I WHERE %4$I IN (SELECT id FROM changed)
+                    UNION
+                    SELECT filmwork_id FROM content.%3$I WHERE %4$I IN (SELECT id FROM changed)
+                ),
+                ARRAY(SELECT id FROM changed)
+            WHERE EXISTS (SELECT 1 FROM changed)
+        $sql$, shadow, entity, links, link_column);
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора: пакет COPY или INSERT ... ON CONFLICT даёт
+-- одну запись журнала.
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('id', 'id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.genre_filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.genre_filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.genre_filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre_filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.genre_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'genre_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person_filmwork;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.person_filmwork
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person_filmwork;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.person_filmwork
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person_filmwork;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.person_filmwork
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person_filmwork;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.person_filmwork
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_rows_changed('filmwork_id', 'person_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.genre;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.genre
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.genre;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.genre
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.genre;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.genre
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.genre;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.genre
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('genre_filmwork', 'genre_id');
+
+DROP TRIGGER IF EXISTS change_outbox_insert ON content.person;
+CREATE TRIGGER change_outbox_insert AFTER INSERT ON content.person
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_update ON content.person;
+CREATE TRIGGER change_outbox_update AFTER UPDATE ON content.person
+    REFERENCING NEW TABLE AS changed_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_delete ON content.person;
+CREATE TRIGGER change_outbox_delete AFTER DELETE ON content.person
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
+DROP TRIGGER IF EXISTS change_outbox_truncate ON content.person;
+CREATE TRIGGER change_outbox_truncate AFTER TRUNCATE ON content.person
+    FOR EACH STATEMENT EXECUTE FUNCTION content.change_outbox_linked_changed('person_filmwork', 'person_id');
@@ -0,0 +1,90 @@
+"""
+Регрессионный бенчмарк чтения из SQLite.
+
+Запуск из каталога sqlite_to_postgres:
+
+    python -m benchmarks.keyset_pagination
+
+Для таблиц разного размера измеряется среднее время чтения пачки в начале
+и в конце таблицы. При постраничном чтении по rowid время пачки не должно
+зависеть от её позиции, у LIMIT/OFFSET оно растёт линейно.
+"""
+import sqlite3
+import time
+import uuid
+
+from load_data import BATCH_SIZE, SQLiteLoader
+
+TABLE_SIZES = (10_000, 100_000, 1_000_000)
+SAMPLE_BATCHES = 20
+
+
+def create_person_film_work(rows_count: int) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        """
+        CREATE TABLE person_film_work (
+            id TEXT PRIMARY KEY,
+            film_work_id TEXT NOT NULL,
+            person_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            created_at timestamp with time zone
+        )
+        """
+    )
+    connection.executemany(
+        "INSERT INTO person_film_work VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                str(uuid.uuid4()),
+                str(uuid.uuid4()),
+                str(uuid.uuid4()),
+                "actor",
+                "2021-06-16 20:14:09.221838+00",
+            )
+            for _ in range(rows_count)
+        ),
+    )
+    return connection
+
+
+def offset_batch_time(connection: sqlite3.Connection, offset: int) -> float:
+    started = time.perf_counter()
+    for batch in range(SAMPLE_BATCHES):
+        connection.execute(
+            f"SELECT * FROM person_film_work LIMIT {BATCH_SIZE} "
+            f"OFFSET {offset + batch * BATCH_SIZE}"
+        ).fetchall()
+    return (time.perf_counter() - started) / SAMPLE_BATCHES
+
+
+def keyset_batch_time(loader: SQLiteLoader, after_rowid: int) -> float:
+    batches = loader.read_table("person_film_work", after_rowid=after_rowid)
+    started = time.perf_counter()
+    for _ in range(SAMPLE_BATCHES):
+        next(batches)
+    return (time.perf_counter() - started) / SAMPLE_BATCHES
+
+
+def main():
+    print(f"{'rows':>10} {'mode':>8} {'head, ms':>10} {'tail, ms':>10}")
+    for rows_count in TABLE_SIZES:
+        connection = create_person_film_work(rows_count)
+        loader = SQLiteLoader(connection)
+        tail = rows_count - SAMPLE_BATCHES * BATCH_SIZE
+        results = {
+            "offset": (
+                offset_batch_time(connection, 0),
+                offset_batch_time(connection, tail),
+            ),
+            "keyset": (keyset_batch_time(loader, 0), keyset_batch_time(loader, tail)),
+        }
+        for mode, (head, tail_time) in results.items():
+            print(
+                f"{rows_count:>10} {mode:>8} {head * 1000:>10.2f} {tail_time * 1000:>10.2f}"
+            )
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
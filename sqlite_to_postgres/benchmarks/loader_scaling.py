@@ -0,0 +1,203 @@
+"""
+Бенчмарк масштабирования загрузчика на синтетических данных.
+
+Запуск из каталога sqlite_to_postgres, параметры Postgres берутся из тех же
+переменных окружения DB_*, что и у load_data.py:
+
+    python -m benchmarks.loader_scaling --sizes 10000 100000
+
+Для каждого размера генерируется (или берётся из --data-dir) база SQLite,
+и в отдельном процессе выполняется load_from_sqlite (с --pipeline -
+конвейером потоков). Измеряются скорость загрузки, пиковый RSS процесса
+и время этапов: чтение из SQLite, кодирование в формат COPY, COPY без
+учёта кодирования и сверка данных.
+Результаты сохраняются в JSON для сравнения запусков.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import Dict, Iterator
+
+import psycopg2
+
+import load_data
+from benchmarks.synthetic_data import generate
+from copy_stream import COPY_FORMATS, RowCodec
+from load_data import BATCH_SIZE, PostgresSaver, SQLiteLoader, dsl_from_env
+
+TABLE_SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+DATA_DIR = "/tmp/loader_scaling"
+
+
+def _timed(stages: Dict[str, float], stage: str, iterator: Iterator) -> Iterator:
+    iterator = iter(iterator)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stages[stage] += time.perf_counter() - started
+            return
+        stages[stage] += time.perf_counter() - started
+        yield item
+
+
+@contextmanager
+def stage_timers(stages: Dict[str, float]):
+    """Подменяет методы загрузчика обёртками, считающими время этапов."""
+    read_batches = SQLiteLoader.read_batches
+    encode = RowCodec.encode
+    copy = PostgresSaver._copy
+    check_loaded_data = load_data.check_loaded_data
+
+    def timed_read_batches(self, *args, **kwargs):
+        return _timed(stages, "read", read_batches(self, *args, **kwargs))
+
+    def timed_encode(self, rows):
+        return _timed(stages, "encode", encode(self, rows))
+
+    def timed_copy(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return copy(self, *args, **kwargs)
+        finally:
+            stages["copy_with_encode"] += time.perf_counter() - started
+
+    def timed_check_loaded_data(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return check_loaded_data(*args, **kwargs)
+        finally:
+            stages["verify"] += time.perf_counter() - started
+
+    SQLiteLoader.read_batches = timed_read_batches
+    RowCodec.encode = timed_encode
+    PostgresSaver._copy = timed_copy
+    load_data.check_loaded_data = timed_check_loaded_data
+    try:
+        yield stages
+    finally:
+        SQLiteLoader.read_batches = read_batches
+        RowCodec.encode = encode
+        PostgresSaver._copy = copy
+        load_data.check_loaded_data = check_loaded_data
+
+
+def run_load(
+    sqlite_path: str,
+    dsl: dict,
+    batch_size: int,
+    copy_format: str,
+    pipeline: bool = False,
+) -> dict:
+    """Выполняет одну загрузку, вызывается в отдельном процессе."""
+    stages: Dict[str, float] = defaultdict(float)
+    with sqlite3.connect(sqlite_path) as connection, psycopg2.connect(
+        **dsl
+    ) as pg_conn, stage_timers(stages):
+        rows_count = sum(
+            connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            for table in SQLiteLoader(connection).tables_for_export
+        )
+        started = time.perf_counter()
+        load_data.load_from_sqlite(
+            connection, pg_conn, batch_size, copy_format, pipeline=pipeline
+        )
+        seconds = time.perf_counter() - started
+    stages["copy"] = stages.pop("copy_with_encode")
+    if not pipeline:
+        stages["copy"] -= stages["encode"]
+    # В конвейере этапы идут одновременно, и other может быть отрицательным.
+    stages["other"] = seconds - sum(stages.values())
+    return {
+        "rows": rows_count,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows_count / seconds),
+        # ru_maxrss в Linux измеряется в килобайтах.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "stages": {stage: round(value, 3) for stage, value in stages.items()},
+    }
+
+
+def server_version(dsl: dict) -> str:
+    with psycopg2.connect(**dsl) as pg_conn, pg_conn.cursor() as cursor:
+        cursor.execute("SHOW server_version")
+        return cursor.fetchone()[0]
+
+
+def git_commit() -> str:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузчика")
+    parser.add_argument("--sizes", type=int, nargs="+", default=TABLE_SIZES)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--copy-format", choices=COPY_FORMATS, default="binary")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default="loader_scaling.json")
+    parser.add_argument(
+        "--pipeline", action="store_true", help="загружать конвейером потоков"
+    )
+    args = parser.parse_args()
+
+    dsl = dsl_from_env()
+    report = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "postgres": server_version(dsl),
+        "batch_size": args.batch_size,
+        "copy_format": args.copy_format,
+        "pipeline": args.pipeline,
+        "results": [],
+    }
+    os.makedirs(args.data_dir, exist_ok=True)
+    print(
+        f"{'rows':>10} {'rows/s':>8} {'RSS, MB':>8} {'read':>7} "
+        f"{'encode':>7} {'copy':>7} {'verify':>7}"
+    )
+    for size in args.sizes:
+        sqlite_path = os.path.join(args.data_dir, f"synthetic_{size}.sqlite")
+        if not os.path.exists(sqlite_path):
+            generate(sqlite_path, size)
+        # Свежий процесс на каждый размер, чтобы пиковый RSS не накапливался.
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(
+                run_load,
+                sqlite_path,
+                dsl,
+                args.batch_size,
+                args.copy_format,
+                args.pipeline,
+            ).result()
+        report["results"].append(result)
+        stages = result["stages"]
+        print(
+            f"{result['rows']:>10} {result['rows_per_second']:>8} "
+            f"{result['peak_rss_mb']:>8} {stages['read']:>7.2f} "
+            f"{stages['encode']:>7.2f} {stages['copy']:>7.2f} {stages['verify']:>7.2f}"
+        )
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Бенчмарк представления строк: замороженные dataclass против кортежей
+с кодировщиками, построенными по схеме таблицы.
+
+Запуск из каталога sqlite_to_postgres:
+
+    python -m benchmarks.row_codecs
+
+Для пачки film_work измеряются пиковая память на строку при
+преобразовании пачки в данные для COPY, память, которую занимают сами
+данные для COPY, и скорость преобразования. Оба способа возвращают
+данные для COPY целиком, как их держит загрузчик до отправки, поэтому
+результат тоже попадает в замер.
+"""
+import datetime
+import io
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+
+from load_data import BATCH_SIZE
+from schema import FILMWORK
+
+ROUNDS = 200
+
+
+@dataclass(frozen=True)
+class LegacyFilmwork:
+    """Строка film_work в том виде, в каком её хранил загрузчик раньше."""
+
+    id: uuid
+    title: str
+    description: str
+    creation_date: datetime
+    certificate: str
+    file_path: str
+    rating: float
+    type: str
+    created_at: datetime
+    updated_at: datetime
+    table_name: str = "filmwork"
+
+    def fields(self) -> tuple:
+        return (
+            str(self.id),
+            str(self.title),
+            str(self.description) if self.description else "null",
+            str(self.creation_date) if self.creation_date else "null",
+            str(self.certificate) if self.certificate else "null",
+            str(self.file_path) if self.file_path else "null",
+            str(self.rating) if self.rating else "null",
+            str(self.type),
+            str(self.created_at) if self.created_at else "null",
+            str(self.updated_at) if self.updated_at else "null",
+        )
+
+    def field_names(self) -> list:
+        return [
+            "id",
+            "title",
+            "description",
+            "creation_date",
+            "certificate",
+            "file_path",
+            "rating",
+            "type",
+            "created_at",
+            "updated_at",
+        ]
+
+    def data_to_write(self) -> str:
+        return "|".join(self.fields()) + "\n"
+
+
+def sqlite_rows(rows_count: int) -> list:
+    """Строки в том виде, в каком их возвращает SQLite: значения и rowid."""
+    return [
+        (
+            str(uuid.uuid4()),
+            f"Film {rowid}",
+            "A long enough description of the film " * 4,
+            None,
+            None,
+            None,
+            7.5,
+            "movie",
+            "2021-06-16 20:14:09.221838+00",
+            "2021-06-16 20:14:09.221855+00",
+            rowid,
+        )
+        for rowid in range(1, rows_count + 1)
+    ]
+
+
+def legacy_batch(rows: list) -> io.StringIO:
+    table_data = [LegacyFilmwork(*row[:-1]) for row in rows]
+    data_for_import = io.StringIO()
+    for table in table_data:
+        data_for_import.write(table.data_to_write())
+    table_data[0].field_names()
+    return data_for_import
+
+
+def binary_codec_batch(rows: list) -> bytes:
+    return b"".join(FILMWORK.codec("binary").encode(rows))
+
+
+def text_codec_batch(rows: list) -> bytes:
+    return b"".join(FILMWORK.codec("text").encode(rows))
+
+
+def measure(convert, rows: list) -> tuple:
+    """Пиковая и оставшаяся после преобразования память на строку, строк/с."""
+    convert(rows)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    data = convert(rows)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        convert(rows)
+    rows_per_second = ROUNDS * len(rows) / (time.perf_counter() - started)
+    return (
+        (peak - baseline) / len(rows),
+        (retained - baseline) / len(rows),
+        rows_per_second,
+    )
+
+
+def main():
+    rows = sqlite_rows(BATCH_SIZE)
+    results = {
+        "dataclass": measure(legacy_batch, rows),
+        "binary": measure(binary_codec_batch, rows),
+        "text": measure(text_codec_batch, rows),
+    }
+    print(f"{'mode':>10} {'peak B/row':>11} {'kept B/row':>11} {'rows/s':>10}")
+    for mode, (peak, retained, rows_per_second) in results.items():
+        print(f"{mode:>10} {peak:>11.0f} {retained:>11.0f} {rows_per_second:>10.0f}")
+    legacy_peak, _, legacy_speed = results["dataclass"]
+    for mode in ("binary", "text"):
+        peak, _, rows_per_second = results[mode]
+        print(
+            f"{mode}: peak memory x{peak / legacy_peak:.2f}, "
+            f"throughput {rows_per_second / legacy_speed - 1:+.0%} vs dataclass"
+        )
+
+
+if __name__ == "__main__":
+    main()
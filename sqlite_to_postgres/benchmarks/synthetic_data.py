@@ -0,0 +1,203 @@
+"""
+Генератор синтетической базы SQLite в схеме db.sqlite.
+
+Запуск из каталога sqlite_to_postgres:
+
+    python -m benchmarks.synthetic_data 1000000 synthetic.sqlite
+
+Размер задаётся общим числом строк во всех таблицах. Распределение связей
+близко к db.sqlite: у фильма 1-4 жанра, режиссёр, 1-2 сценариста и 2-8
+актёров, персон в четыре раза больше, чем фильмов. Генерация
+детерминирована при одинаковом seed.
+"""
+import argparse
+import datetime
+import random
+import sqlite3
+import uuid
+from typing import Iterator, List, Tuple
+
+SQLITE_SCHEMA = """
+CREATE TABLE genre (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE film_work (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    creation_date DATE,
+    certificate TEXT,
+    file_path TEXT,
+    rating FLOAT,
+    type TEXT not null,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE person (
+    id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    birth_date DATE,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    genre_id TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+CREATE UNIQUE INDEX film_work_genre ON genre_film_work (film_work_id, genre_id);
+CREATE TABLE person_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+CREATE UNIQUE INDEX film_work_person_role
+    ON person_film_work (film_work_id, person_id, role);
+"""
+
+# fmt: off
+GENRES = (
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime",
+    "Documentary", "Drama", "Family", "Fantasy", "Film-Noir", "Game-Show",
+    "History", "Horror", "Music", "Musical", "Mystery", "News", "Reality-TV",
+    "Romance", "Sci-Fi", "Short", "Sport", "Talk-Show", "Thriller", "War",
+)
+WORDS = (
+    "star", "wars", "return", "empire", "night", "city", "last", "world",
+    "dark", "light", "story", "space", "planet", "galaxy", "hope", "force",
+    "lost", "journey", "secret", "quest", "legend", "rise", "fall", "time",
+)
+# fmt: on
+
+# Среднее число строк, которое добавляет в базу один фильм: сам фильм,
+# 2.5 жанра, 7.5 участника и 4 персоны.
+ROWS_PER_FILM = 15
+PERSONS_PER_FILM = 4
+INSERT_BATCH = 10_000
+STARTED_AT = datetime.datetime(2021, 6, 16, 20, 14, 9)
+
+
+class SyntheticData:
+    def __init__(self, films_count: int, seed: int = 0):
+        self.random = random.Random(seed)
+        self.films_count: int = films_count
+        self.persons_count: int = films_count * PERSONS_PER_FILM
+        self.genre_ids: List[str] = [self.uuid() for _ in GENRES]
+        self.person_ids: List[str] = [self.uuid() for _ in range(self.persons_count)]
+        self._tick = 0
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def timestamp(self) -> str:
+        self._tick += self.random.randint(1, 100)
+        moment = STARTED_AT + datetime.timedelta(microseconds=self._tick)
+        return moment.isoformat(sep=" ") + "+00"
+
+    def text(self, words_count: int) -> str:
+        return " ".join(self.random.choices(WORDS, k=words_count)).capitalize()
+
+    def genres(self) -> Iterator[tuple]:
+        for genre_id, name in zip(self.genre_ids, GENRES):
+            yield genre_id, name, None, self.timestamp(), self.timestamp()
+
+    def persons(self) -> Iterator[tuple]:
+        for person_id in self.person_ids:
+            full_name = f"{self.text(1)} {self.text(1)}"
+            yield person_id, full_name, None, self.timestamp(), self.timestamp()
+
+    def films(self) -> Iterator[Tuple[tuple, List[tuple], List[tuple]]]:
+        """Фильмы вместе с их строками genre_film_work и person_film_work."""
+        for _ in range(self.films_count):
+            film_id = self.uuid()
+            film = (
+                film_id,
+                self.text(self.random.randint(1, 5)),
+                self.text(self.random.randint(10, 60))
+                if self.random.random() < 0.75
+                else None,
+                None,
+                None,
+                None,
+                round(self.random.uniform(1, 10), 1),
+                "movie",
+                self.timestamp(),
+                self.timestamp(),
+            )
+            genres = [
+                (self.uuid(), film_id, genre_id, self.timestamp())
+                for genre_id in self.random.sample(
+                    self.genre_ids, self.random.randint(1, 4)
+                )
+            ]
+            roles = (
+                ["director"]
+                + ["writer"] * self.random.randint(1, 2)
+                + ["actor"] * self.random.randint(2, 8)
+            )
+            persons = [
+                (self.uuid(), film_id, person_id, role, self.timestamp())
+                for person_id, role in zip(
+                    self.random.sample(self.person_ids, len(roles)), roles
+                )
+            ]
+            yield film, genres, persons
+
+
+def _insert(connection: sqlite3.Connection, table: str, rows: List[tuple]):
+    if rows:
+        placeholders = ", ".join("?" * len(rows[0]))
+        connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+def generate(path: str, rows_count: int, seed: int = 0) -> int:
+    """Создаёт базу примерно на rows_count строк и возвращает точное число."""
+    data = SyntheticData(max(rows_count // ROWS_PER_FILM, 1), seed)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    with connection:
+        connection.executescript(SQLITE_SCHEMA)
+        genres = list(data.genres())
+        _insert(connection, "genre", genres)
+        total = len(genres)
+        persons = data.persons()
+        while True:
+            batch = [row for _, row in zip(range(INSERT_BATCH), persons)]
+            if not batch:
+                break
+            _insert(connection, "person", batch)
+            total += len(batch)
+        films, genre_film_works, person_film_works = [], [], []
+        for film, genres, persons in data.films():
+            films.append(film)
+            genre_film_works.extend(genres)
+            person_film_works.extend(persons)
+            if len(films) == INSERT_BATCH:
+                _insert(connection, "film_work", films)
+                _insert(connection, "genre_film_work", genre_film_works)
+                _insert(connection, "person_film_work", person_film_works)
+                total += len(films) + len(genre_film_works) + len(person_film_works)
+                films, genre_film_works, person_film_works = [], [], []
+        _insert(connection, "film_work", films)
+        _insert(connection, "genre_film_work", genre_film_works)
+        _insert(connection, "person_film_work", person_film_works)
+        total += len(films) + len(genre_film_works) + len(person_film_works)
+    connection.close()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетическая база SQLite")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"{generate(args.path, args.rows, args.seed)} rows written to {args.path}")
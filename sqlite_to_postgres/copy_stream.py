@@ -0,0 +1,243 @@
+import datetime
+import io
+import re
+import struct
+import uuid
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+COPY_FORMATS = ("binary", "text")
+
+PG_EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+PG_EPOCH_DATE = PG_EPOCH.date()
+
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+BINARY_NULL = struct.pack("!i", -1)
+TEXT_NULL = "\\N"
+
+_int16 = struct.Struct("!h")
+_int32 = struct.Struct("!i")
+_int64 = struct.Struct("!q")
+_float64 = struct.Struct("!d")
+
+_TIMESTAMP = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?"
+    r"\s*(?:Z|([+-])(\d{2})(?::?(\d{2}))?)?$"
+)
+_TEXT_SPECIAL = re.compile(r"[\\\t\n\r]")
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def parse_timestamp(value) -> datetime.datetime:
+    """Разбирает timestamp из SQLite, время без зоны считается UTC."""
+    if isinstance(value, datetime.datetime):
+        timestamp = value
+    else:
+        try:
+            timestamp = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            timestamp = _parse_timestamp_fallback(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp
+
+
+def _parse_timestamp_fallback(value: str) -> datetime.datetime:
+    # До Python 3.11 fromisoformat не понимает зону вида "+00" и дробную
+    # часть секунд произвольной длины.
+    match = _TIMESTAMP.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    year, month, day, hour, minute, second, fraction = match.groups()[:7]
+    sign, tz_hours, tz_minutes = match.groups()[7:]
+    tzinfo = datetime.timezone.utc
+    if sign:
+        offset = datetime.timedelta(hours=int(tz_hours), minutes=int(tz_minutes or 0))
+        tzinfo = datetime.timezone(-offset if sign == "-" else offset)
+    return datetime.datetime(
+        int(year),
+        int(month),
+        int(day),
+        int(hour),
+        int(minute),
+        int(second),
+        int((fraction or "0").ljust(6, "0")),
+        tzinfo=tzinfo,
+    )
+
+
+def parse_date(value) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value.strip()[:10])
+
+
+# Бинарные кодировщики возвращают поле целиком, вместе с длиной.
+_UUID_LENGTH = _int32.pack(16)
+_INT32_LENGTH = _int32.pack(4)
+_INT64_LENGTH = _int32.pack(8)
+
+
+def _binary_uuid(value) -> bytes:
+    if isinstance(value, uuid.UUID):
+        return _UUID_LENGTH + value.bytes
+    data = bytes.fromhex(value.replace("-", ""))
+    if len(data) != 16:
+        raise ValueError(f"Invalid uuid: {value!r}")
+    return _UUID_LENGTH + data
+
+
+def _binary_text(value) -> bytes:
+    data = str(value).encode()
+    return _int32.pack(len(data)) + data
+
+
+def _binary_date(value) -> bytes:
+    return _INT32_LENGTH + _int32.pack((parse_date(value) - PG_EPOCH_DATE).days)
+
+
+def _binary_float8(value) -> bytes:
+    return _INT64_LENGTH + _float64.pack(float(value))
+
+
+def _binary_timestamptz(value) -> bytes:
+    delta = parse_timestamp(value) - PG_EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return _INT64_LENGTH + _int64.pack(microseconds)
+
+
+def _text_text(value) -> str:
+    value = str(value)
+    if _TEXT_SPECIAL.search(value) is None:
+        return value
+    return value.translate(_TEXT_ESCAPES)
+
+
+def _text_float8(value) -> str:
+    return repr(float(value))
+
+
+def _text_temporal(value) -> str:
+    # Строку из SQLite Postgres разберёт сам, объекты date/datetime
+    # приводятся к ISO 8601.
+    if isinstance(value, str):
+        return _text_text(value)
+    return value.isoformat()
+
+
+BINARY_ENCODERS = {
+    "uuid": _binary_uuid,
+    "text": _binary_text,
+    "date": _binary_date,
+    "float8": _binary_float8,
+    "timestamptz": _binary_timestamptz,
+}
+
+TEXT_ENCODERS = {
+    "uuid": str,
+    "text": _text_text,
+    "date": _text_temporal,
+    "float8": _text_float8,
+    "timestamptz": _text_temporal,
+}
+
+
+def encode_binary_rows(
+    rows: Iterable[Sequence], encoders: Sequence[Callable]
+) -> Iterator[bytes]:
+    """
+    Кодирует строки в бинарный формат COPY, по одному фрагменту на строку.
+
+    Значения после последнего кодировщика (например, rowid) отбрасываются.
+    """
+    field_count = _int16.pack(len(encoders))
+    yield BINARY_HEADER
+    for row in rows:
+        yield field_count + b"".join(
+            [
+                BINARY_NULL if value is None else encoder(value)
+                for encoder, value in zip(encoders, row)
+            ]
+        )
+    yield BINARY_TRAILER
+
+
+def encode_text_rows(
+    rows: Iterable[Sequence], encoders: Sequence[Callable]
+) -> Iterator[bytes]:
+    """Кодирует строки в текстовый формат COPY с экранированием спецсимволов."""
+    for row in rows:
+        line = "\t".join(
+            [
+                TEXT_NULL if value is None else encoder(value)
+                for encoder, value in zip(encoders, row)
+            ]
+        )
+        yield (line + "\n").encode()
+
+
+ROW_ENCODERS = {
+    "binary": (encode_binary_rows, BINARY_ENCODERS),
+    "text": (encode_text_rows, TEXT_ENCODERS),
+}
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Файлоподобный объект для copy_expert.
+
+    Строки кодируются лениво, по мере того как psycopg2 вычитывает данные,
+    поэтому в памяти находится не больше одного блока чтения.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        super().__init__()
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._buffer = bytearray()
+        self.bytes_sent: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            for chunk in self._chunks:
+                self._buffer += chunk
+            size = len(self._buffer)
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_sent += len(data)
+        return data
+
+
+class RowCodec:
+    """Кодировщик строк таблицы с выбранными один раз конвертерами колонок."""
+
+    __slots__ = ("copy_format", "encoders", "_encode_rows")
+
+    def __init__(self, field_types: Sequence[str], copy_format: str = "binary"):
+        encode_rows, value_encoders = ROW_ENCODERS[copy_format]
+        self.copy_format: str = copy_format
+        self.encoders: Tuple[Callable, ...] = tuple(
+            value_encoders[field_type] for field_type in field_types
+        )
+        self._encode_rows: Callable = encode_rows
+
+    def encode(self, rows: Iterable[Sequence]) -> Iterator[bytes]:
+        return self._encode_rows(rows, self.encoders)
+
+    def stream(self, rows: Iterable[Sequence]) -> CopyStream:
+        return CopyStream(self.encode(rows))
+
+
+@lru_cache(maxsize=None)
+def row_codec(field_types: Tuple[str, ...], copy_format: str = "binary") -> RowCodec:
+    return RowCodec(field_types, copy_format)
@@ -1,178 +1,70 @@
-import datetime
+import argparse
 import io
 import os
 import sqlite3
-import uuid
-from dataclasses import dataclass
-from typing import List
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import psycopg2
 from dotenv import find_dotenv, load_dotenv
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
 
-load_dotenv(find_dotenv(raise_error_if_not_found=False))
-
-DELIMITER = "|"
-
-
-@dataclass(frozen=True)
-class AbsDataclass:
-    id: uuid
-
-    def fields(self) -> tuple:
-        raise NotImplementedError
-
-    def field_names(self) -> list:
-        raise NotImplementedError
-
-    def data_to_write(self) -> str:
-        return DELIMITER.join(self.fields()) + "\n"
-
-
-@dataclass(frozen=True)
-class Filmwork(AbsDataclass):
-    title: str
-    description: str
-    creation_date: datetime
-    certificate: str
-    file_path: str
-    rating: float
-    type: str
-    created_at: datetime
-    updated_at: datetime
-    table_name: str = "filmwork"
-
-    def fields(self) -> tuple:
-        fields = (
-            str(self.id),
-            str(self.title),
-            str(self.description) if self.description else "null",
-            str(self.creation_date) if self.creation_date else "null",
-            str(self.certificate) if self.certificate else "null",
-            str(self.file_path) if self.file_path else "null",
-            str(self.rating) if self.rating else "null",
-            str(self.type),
-            str(self.created_at) if self.created_at else "null",
-            str(self.updated_at) if self.updated_at else "null",
-        )
-        return fields
-
-    def field_names(self) -> list:
-        return [
-            "id",
-            "title",
-            "description",
-            "creation_date",
-            "certificate",
-            "file_path",
-            "rating",
-            "type",
-            "created_at",
-            "updated_at",
-        ]
-
-
-@dataclass(frozen=True)
-class Genre(AbsDataclass):
-    name: str
-    description: str
-    created_at: datetime
-    updated_at: datetime
-    table_name: str = "genre"
-
-    def fields(self) -> tuple:
-        fields = (
-            str(self.id),
-            str(self.name),
-            str(self.description) if self.description else "null",
-            str(self.created_at) if self.created_at else "null",
-            str(self.updated_at) if self.updated_at else "null",
-        )
-        return fields
-
-    def field_names(self) -> list:
-        return ["id", "name", "description", "created_at", "updated_at"]
-
-
-@dataclass(frozen=True)
-class Person(AbsDataclass):
-    full_name: str
-    birth_date: datetime
-    created_at: datetime
-    updated_at: datetime
-    table_name: str = "person"
-
-    def fields(self):
-        fields = (
-            str(self.id),
-            str(self.full_name),
-            str(self.birth_date) if self.birth_date else "null",
-            str(self.created_at) if self.created_at else "null",
-            str(self.updated_at) if self.updated_at else "null",
-        )
-        return fields
-
-    def field_names(self) -> list:
-        return ["id", "full_name", "birth_date", "created_at", "updated_at"]
+from copy_stream import COPY_FORMATS
+from metrics import PROFILE_MODES, LoadMetrics, profiling
+from pipeline import PIPELINE_QUEUE_SIZE, StageStats, run_pipeline
+from rejects import MAX_REJECTS, RejectLog
+from schema import TABLE_SCHEMAS, TABLES, TableSchema
+from shadow_schema import (
+    CONTENT_SCHEMA,
+    SHADOW_SCHEMA,
+    create_shadow_tables,
+    drop_retired_tables,
+    execute_parallel,
+    set_logged,
+    shadow_ddl,
+    swap_tables,
+)
+from verification import DataVerifier
 
+load_dotenv(find_dotenv(raise_error_if_not_found=False))
 
-@dataclass(frozen=True)
-class GenreFilmwork(AbsDataclass):
-    filmwork_id: uuid
-    genre_id: uuid
-    created_at: datetime
-    table_name: str = "genre_filmwork"
+BATCH_SIZE = 500
+# Размер блока, которым psycopg2 читает данные для COPY.
+COPY_READ_SIZE = 8192
+SQLITE_PATH = "db.sqlite"
+SQLITE_MAX_ROWID = 2**63 - 1
 
-    def fields(self):
-        fields = (
-            str(self.filmwork_id),
-            str(self.genre_id),
-            str(self.created_at) if self.created_at else "null",
-        )
-        return fields
-
-    def field_names(self) -> list:
-        return ["filmwork_id", "genre_id", "created_at"]
-
-
-@dataclass(frozen=True)
-class PersonFilmwork(AbsDataclass):
-    filmwork_id: uuid
-    person_id: uuid
-    role: str
-    created_at: datetime
-    table_name: str = "person_filmwork"
-
-    def fields(self):
-        fields = (
-            str(self.filmwork_id),
-            str(self.person_id),
-            str(self.role),
-            str(self.created_at) if self.created_at else "null",
-        )
-        return fields
+IMPORT_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS content.import_state (
+    table_name text NOT NULL PRIMARY KEY,
+    high_water_mark text NOT NULL,
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+);
 
-    def field_names(self) -> list:
-        return ["filmwork_id", "person_id", "role", "created_at"]
+CREATE TABLE IF NOT EXISTS content.import_checkpoint (
+    table_name text NOT NULL PRIMARY KEY,
+    last_rowid bigint NOT NULL,
+    rows_committed bigint NOT NULL,
+    updated_at timestamp with time zone NOT NULL DEFAULT now()
+);
+"""
 
 
 class PostgresSaver:
-    def __init__(self, pg_conn: _connection, table_data: list = None):
+    def __init__(
+        self,
+        pg_conn: _connection,
+        copy_format: str = "binary",
+        metrics: LoadMetrics = None,
+    ):
         self.connect: _connection = pg_conn
         self.cursor: DictCursor = self.connect.cursor()
-        self.table_data: list = table_data
-        self.tables_for_import = [
-            "filmwork",
-            "genre",
-            "person",
-            "genre_filmwork",
-            "person_filmwork",
-        ]
-
-    @property
-    def table_instance(self) -> dataclass:
-        return self.table_data[0]
+        self.copy_format: str = copy_format
+        self.metrics: LoadMetrics = metrics or LoadMetrics()
+        self.tables_for_import = [table.table_name for table in TABLES]
 
     def create_db_schema(self):
         with open("../schema_design/db_schema.sql", "r") as db_schema:
@@ -180,110 +72,791 @@ class PostgresSaver:
 
     def clear_tables_for_import(self):
         for table in self.tables_for_import:
-            self.cursor.execute(f"TRUNCATE content.{table} CASCADE")
+            with self.metrics.stage(table, "clear"):
+                self.cursor.execute(f"TRUNCATE content.{table} CASCADE")
+
+    def save_data(
+        self, table: TableSchema, table_data: List[tuple], target_table: str = None
+    ) -> None:
+        stream = table.codec(self.copy_format).stream(table_data)
+        started = time.perf_counter()
+        self._copy(table, stream, target_table or f"content.{table.table_name}")
+        self.metrics.record_batch(
+            table.table_name,
+            len(table_data),
+            stream.bytes_sent,
+            time.perf_counter() - started,
+        )
 
-    def save_data(self) -> None:
-        data_for_import = io.StringIO()
-        for table in self.table_data:
-            data_for_import.write(table.data_to_write())
-        self._copy(data_for_import)
+    def save_encoded(
+        self,
+        table: TableSchema,
+        rows_count: int,
+        data: bytes,
+        target_table: str = None,
+    ) -> None:
+        """
+        Записывает пачку, уже закодированную в формат COPY. Пачка
+        передаётся psycopg2 одним блоком: при чтении по 8 КБ поток записи
+        на каждом блоке ждёт GIL у потока кодирования.
+        """
+        started = time.perf_counter()
+        self._copy(
+            table,
+            io.BytesIO(data),
+            target_table or f"content.{table.table_name}",
+            size=max(len(data), COPY_READ_SIZE),
+        )
+        self.metrics.record_batch(
+            table.table_name, rows_count, len(data), time.perf_counter() - started
+        )
 
-    def _copy(self, data_for_import: io.StringIO) -> io.StringIO:
+    def save_data_tolerant(
+        self,
+        table: TableSchema,
+        table_data: List[tuple],
+        rejects: RejectLog,
+        data: bytes = None,
+        target_table: str = None,
+    ) -> int:
+        """
+        Записывает пачку, пропуская строки, которые Postgres не принимает,
+        и возвращает их число.
+        Пачка без ошибок записывается одним COPY (если передан data - уже
+        закодированной). Иначе она делится пополам до отдельных строк,
+        каждая попытка - под своей точкой сохранения; отклонённые строки
+        с ошибкой пишутся в rejects.
+        """
+        error = self._try_save(table, table_data, target_table, data)
+        if error is None:
+            return 0
+        rejected = rejects.count
+        self._bisect(table, table_data, rejects, error, target_table)
+        return rejects.count - rejected
+
+    def _bisect(
+        self,
+        table: TableSchema,
+        table_data: List[tuple],
+        rejects: RejectLog,
+        error: ValueError,
+        target_table: str = None,
+    ) -> None:
+        """Записывает годные строки пачки, которая целиком не записалась с error."""
+        if len(table_data) == 1:
+            rejects.add(table, table_data[0], str(error))
+            return
+        middle = len(table_data) // 2
+        first, second = table_data[:middle], table_data[middle:]
+        first_error = self._try_save(table, first, target_table)
+        if first_error is None:
+            # COPY разбирает строки по порядку: раз первая половина
+            # записалась, ошибка пачки была во второй.
+            second_error = error
+        else:
+            self._bisect(table, first, rejects, first_error, target_table)
+            second_error = self._try_save(table, second, target_table)
+            if second_error is None:
+                return
+        self._bisect(table, second, rejects, second_error, target_table)
+
+    def _try_save(
+        self,
+        table: TableSchema,
+        table_data: List[tuple],
+        target_table: str = None,
+        data: bytes = None,
+    ) -> Optional[ValueError]:
+        self.cursor.execute("SAVEPOINT tolerant_copy")
+        try:
+            if data is None:
+                self.save_data(table, table_data, target_table)
+            else:
+                self.save_encoded(table, len(table_data), data, target_table)
+        except ValueError as error:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT tolerant_copy")
+            self.cursor.execute("RELEASE SAVEPOINT tolerant_copy")
+            return error
+        self.cursor.execute("RELEASE SAVEPOINT tolerant_copy")
+        return None
+
+    def _copy(
+        self,
+        table: TableSchema,
+        data_for_import: IO[bytes],
+        target_table: str,
+        size: int = COPY_READ_SIZE,
+    ) -> None:
+        columns = ", ".join(table.field_names)
         try:
-            data_for_import.seek(0)
-            self.cursor.copy_from(
-                file=data_for_import,
-                table=self.table_instance.table_name,
-                sep=DELIMITER,
-                null="null",
-                columns=self.table_instance.field_names(),
+            self.cursor.copy_expert(
+                f"COPY {target_table} ({columns}) "
+                f"FROM STDIN WITH (FORMAT {self.copy_format})",
+                data_for_import,
+                size,
             )
         except psycopg2.Error as err:
             raise ValueError(f"Writing error: {err.pgerror}")
-        else:
-            return io.StringIO()
+
+    def create_import_state(self):
+        self.cursor.execute(IMPORT_STATE_SQL)
+
+    def get_high_water_mark(self, table: str) -> Optional[str]:
+        self.cursor.execute(
+            "SELECT high_water_mark FROM content.import_state WHERE table_name = %s",
+            (table,),
+        )
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, table: str, high_water_mark: str):
+        self.cursor.execute(
+            """
+            INSERT INTO content.import_state (table_name, high_water_mark)
+            VALUES (%s, %s)
+            ON CONFLICT (table_name) DO UPDATE
+            SET high_water_mark = EXCLUDED.high_water_mark, updated_at = now()
+            """,
+            (table, high_water_mark),
+        )
+
+    def get_checkpoints(self) -> Dict[str, Tuple[int, int]]:
+        self.cursor.execute(
+            "SELECT table_name, last_rowid, rows_committed "
+            "FROM content.import_checkpoint"
+        )
+        return {table: (last_rowid, rows) for table, last_rowid, rows in self.cursor}
+
+    def save_checkpoint(self, table: str, last_rowid: int, rows_committed: int):
+        self.cursor.execute(
+            """
+            INSERT INTO content.import_checkpoint
+                (table_name, last_rowid, rows_committed)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE
+            SET last_rowid = EXCLUDED.last_rowid,
+                rows_committed = EXCLUDED.rows_committed,
+                updated_at = now()
+            """,
+            (table, last_rowid, rows_committed),
+        )
+
+    def clear_checkpoints(self):
+        self.cursor.execute("DELETE FROM content.import_checkpoint")
+
+    def create_staging_table(self, table: TableSchema) -> str:
+        staging_table = f"staging_{table.table_name}"
+        self.cursor.execute(
+            f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS "
+            f"SELECT {', '.join(table.field_names)} "
+            f"FROM content.{table.table_name} WITH NO DATA"
+        )
+        return staging_table
+
+    def merge_staging_table(self, table: TableSchema, staging_table: str) -> int:
+        """Переносит строки из staging-таблицы в content, обновляя существующие."""
+        conflict_keys = table.conflict_keys
+        columns = ", ".join(table.field_names)
+        updates = ", ".join(
+            f"{field_name} = EXCLUDED.{field_name}"
+            for field_name in table.field_names
+            if field_name not in conflict_keys
+        )
+        try:
+            self.cursor.execute(
+                f"INSERT INTO content.{table.table_name} ({columns}) "
+                f"SELECT {columns} FROM {staging_table} "
+                f"ON CONFLICT ({', '.join(conflict_keys)}) DO UPDATE SET {updates}"
+            )
+        except psycopg2.Error as err:
+            raise ValueError(f"Writing error: {err.pgerror}")
+        return self.cursor.rowcount
 
 
 class SQLiteLoader:
-    def __init__(self, connection: sqlite3.Connection):
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        batch_size: int = BATCH_SIZE,
+        metrics: LoadMetrics = None,
+    ):
         self.connection: sqlite3.Connection = connection
-        self.tables_for_export = [
-            "film_work",
-            "genre",
-            "person",
-            "genre_film_work",
-            "person_film_work",
-        ]
+        self.batch_size: int = batch_size
+        self.metrics: LoadMetrics = metrics or LoadMetrics()
+        self.tables_for_export = [table.sqlite_table for table in TABLES]
 
-    @property
-    def _table_dataclass_handler(self) -> dict:
-        return {
-            "film_work": Filmwork,
-            "genre": Genre,
-            "person": Person,
-            "genre_film_work": GenreFilmwork,
-            "person_film_work": PersonFilmwork,
-        }
-
-    def table_data_generator(self) -> List[dataclass]:
+    def table_data_generator(self) -> Iterator[List[tuple]]:
         for table_name in self.tables_for_export:
-            table_dataclass = self._table_dataclass_handler[table_name]
-            limit = 500
-            offset = 0
-            try:
-                count_rows_for_export = self.connection.execute(
-                    f"SELECT count(*) FROM {table_name}"
-                ).fetchone()[0]
-                while count_rows_for_export > 0:
-                    count_rows_for_export -= limit
-                    rows = self.connection.cursor().execute(
-                        f"SELECT * FROM {table_name} LIMIT {limit} OFFSET {offset}"
-                    )
-                    offset += limit
-                    yield [table_dataclass(*row) for row in rows]
-            except sqlite3.OperationalError as err:
-                raise ValueError(f"Read error: {err}")
+            yield from self.read_table(table_name)
+
+    def read_table(
+        self,
+        table_name: str,
+        after_rowid: int = 0,
+        until_rowid: int = None,
+        changed_between: Tuple[Optional[str], str] = None,
+    ) -> Iterator[List[tuple]]:
+        for _, table_data in self.read_batches(
+            table_name, after_rowid, until_rowid, changed_between
+        ):
+            yield table_data
+
+    def read_batches(
+        self,
+        table_name: str,
+        after_rowid: int = 0,
+        until_rowid: int = None,
+        changed_between: Tuple[Optional[str], str] = None,
+    ) -> Iterator[Tuple[int, List[tuple]]]:
+        """
+        Читает таблицу пачками по batch_size строк вместе с rowid последней
+        строки пачки. Строки — кортежи значений в порядке колонок Postgres,
+        последним элементом идёт rowid (кодировщики его пропускают).
+
+        Вместо LIMIT/OFFSET используется курсор по rowid: каждая пачка
+        начинается с индексного поиска, а не с пропуска уже прочитанных строк.
+        changed_between ограничивает выборку строками, изменёнными в интервале
+        (после, до].
+        """
+        table = TABLE_SCHEMAS[table_name]
+        conditions = ["rowid > ?", "rowid <= ?"]
+        params = [SQLITE_MAX_ROWID if until_rowid is None else until_rowid]
+        if changed_between is not None:
+            changed_after, changed_until = changed_between
+            changed_at = table.changed_at_column
+            conditions.append(f"{changed_at} <= ?")
+            params.append(changed_until)
+            if changed_after is not None:
+                conditions.append(f"{changed_at} > ?")
+                params.append(changed_after)
+        query = (
+            f"SELECT {', '.join(table.sqlite_columns)}, rowid FROM {table_name} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY rowid LIMIT ?"
+        )
+        try:
+            while True:
+                started = time.perf_counter()
+                rows = self.connection.execute(
+                    query, (after_rowid, *params, self.batch_size)
+                ).fetchall()
+                self.metrics.record_read(
+                    table.table_name, time.perf_counter() - started
+                )
+                if not rows:
+                    break
+                after_rowid = rows[-1][-1]
+                yield after_rowid, rows
+        except sqlite3.OperationalError as err:
+            raise ValueError(f"Read error: {err}")
+
+    def last_change(self, table_name: str) -> Optional[str]:
+        try:
+            return self.connection.execute(
+                f"SELECT max({TABLE_SCHEMAS[table_name].changed_at_column}) "
+                f"FROM {table_name}"
+            ).fetchone()[0]
+        except sqlite3.OperationalError as err:
+            raise ValueError(f"Read error: {err}")
+
+    def split_table(self, table_name: str, parts: int) -> List[Tuple[int, int]]:
+        """Делит таблицу на диапазоны rowid вида (after_rowid, until_rowid]."""
+        try:
+            min_rowid, max_rowid = self.connection.execute(
+                f"SELECT min(rowid), max(rowid) FROM {table_name}"
+            ).fetchone()
+        except sqlite3.OperationalError as err:
+            raise ValueError(f"Read error: {err}")
+        if min_rowid is None:
+            return []
+        step = max((max_rowid - min_rowid + 1) // parts, 1)
+        bounds = list(range(min_rowid - 1, max_rowid, step))[:parts] + [max_rowid]
+        return list(zip(bounds, bounds[1:]))
+
+
+def get_high_water_marks(sqlite_loader: SQLiteLoader) -> Dict[str, Optional[str]]:
+    return {
+        table.table_name: sqlite_loader.last_change(table.sqlite_table)
+        for table in TABLES
+    }
+
+
+def set_high_water_marks(
+    postgres_saver: PostgresSaver, high_water_marks: Dict[str, Optional[str]]
+):
+    for table, high_water_mark in high_water_marks.items():
+        if high_water_mark is not None:
+            postgres_saver.set_high_water_mark(table, high_water_mark)
 
 
 def check_loaded_data(
     sqlite_connection: sqlite3.Connection,
     pg_connection: _connection,
-    tables_for_checking: zip,
+    tables_for_checking: Iterable[TableSchema] = TABLES,
+    metrics: LoadMetrics = None,
+    excluded_rowids: Dict[str, Set[int]] = None,
+):
+    """
+    Сверяет содержимое таблиц по хэшам и выводит отличающиеся строки.
+    Строки SQLite из excluded_rowids (таблица -> rowid) не сверяются.
+    """
+    metrics = metrics or LoadMetrics()
+    verifier = DataVerifier(sqlite_connection, pg_connection, excluded_rowids)
+    differences = []
+    for table in tables_for_checking:
+        with metrics.stage(table.table_name, "verify"):
+            differences.extend(verifier.verify(table))
+    for difference in differences:
+        print(
+            f"{difference.table} {difference.key}: "
+            f"sqlite={difference.sqlite_row} postgres={difference.pg_row}"
+        )
+    if differences:
+        raise ValueError(f"Verification error: {len(differences)} rows differ")
+
+
+def load_table_pipelined(
+    sqlite_loader: SQLiteLoader,
+    postgres_saver: PostgresSaver,
+    table: TableSchema,
+    after_rowid: int = 0,
+    rows_committed: int = 0,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    rejects: RejectLog = None,
+) -> List[StageStats]:
+    """
+    Загружает таблицу конвейером: чтение из SQLite, кодирование в формат
+    COPY и COPY с фиксацией контрольной точки идут одновременно в разных
+    потоках. Пачки записываются и фиксируются в порядке чтения.
+    """
+    codec = table.codec(postgres_saver.copy_format)
+
+    def encode(batch: Tuple[int, List[tuple]]) -> Tuple[int, List[tuple], bytes]:
+        last_rowid, table_data = batch
+        try:
+            data = b"".join(codec.encode(table_data))
+        except ValueError:
+            if rejects is None:
+                raise
+            # Строку, которую нельзя закодировать, найдёт деление пачки.
+            data = None
+        return last_rowid, table_data, data
+
+    def write(batch: Tuple[int, List[tuple], bytes]):
+        nonlocal rows_committed
+        last_rowid, table_data, data = batch
+        rows_count = len(table_data)
+        if rejects is None:
+            postgres_saver.save_encoded(table, rows_count, data)
+        else:
+            rows_count -= postgres_saver.save_data_tolerant(
+                table, table_data, rejects, data
+            )
+        rows_committed += rows_count
+        postgres_saver.save_checkpoint(table.table_name, last_rowid, rows_committed)
+        postgres_saver.connect.commit()
+
+    return run_pipeline(
+        sqlite_loader.read_batches(table.sqlite_table, after_rowid),
+        [("encode", encode), ("copy", write)],
+        queue_size,
+        source_name="read",
+    )
+
+
+def record_pipeline_stats(
+    metrics: LoadMetrics, table_name: str, stats: List[StageStats]
 ):
-    pg_cursor: DictCursor = pg_connection.cursor()
-    for sqlite_table, pg_table in tables_for_checking:
-        rows_count_in_sqlite_db = sqlite_connection.execute(
-            f"SELECT count(*) FROM {sqlite_table}"
-        ).fetchone()[0]
-        pg_cursor.execute(f"SELECT count(*) FROM content.{pg_table}")
-        rows_count_in_pg_db = pg_cursor.fetchone()[0]
-        assert rows_count_in_sqlite_db == rows_count_in_pg_db
-
-
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
-    """Основной метод загрузки данных из SQLite в Postgres."""
-    sqlite_loader = SQLiteLoader(connection)
-    data_for_import = sqlite_loader.table_data_generator()
-
-    postgres_saver = PostgresSaver(pg_conn)
+    """
+    Добавляет в метрики время кодирования и ожидания стадий и печатает их.
+    Узкое место - стадия, которая дольше всех работала: остальные ждут её.
+    """
+    seconds = metrics.table(table_name).seconds
+    parts = []
+    for number, stage in enumerate(stats):
+        # Чтение и COPY учитываются загрузчиком сами, источнику нечего
+        # ждать на входе, последней стадии - на выходе.
+        if stage.name == "encode":
+            seconds["encode"] += stage.busy_seconds
+        waits = []
+        if number > 0:
+            seconds[f"{stage.name}_starved"] += stage.starved_seconds
+            waits.append(f"starved {stage.starved_seconds:.2f}s")
+        if number < len(stats) - 1:
+            seconds[f"{stage.name}_blocked"] += stage.blocked_seconds
+            waits.append(f"blocked {stage.blocked_seconds:.2f}s")
+        parts.append(f"{stage.name} {stage.busy_seconds:.2f}s ({', '.join(waits)})")
+    bottleneck = max(stats, key=lambda stage: stage.busy_seconds)
+    print(f"{table_name}: {', '.join(parts)}, bottleneck: {bottleneck.name}")
+
+
+def load_from_sqlite(
+    connection: sqlite3.Connection,
+    pg_conn: _connection,
+    batch_size: int = BATCH_SIZE,
+    copy_format: str = "binary",
+    resume: bool = False,
+    metrics: LoadMetrics = None,
+    pipeline: bool = False,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    rejects: RejectLog = None,
+) -> LoadMetrics:
+    """
+    Основной метод загрузки данных из SQLite в Postgres.
+
+    Каждая пачка фиксируется вместе с контрольной точкой (таблица, rowid
+    последней строки, число загруженных строк). При resume=True таблицы не
+    очищаются, и загрузка продолжается с последней зафиксированной пачки.
+    При pipeline=True таблицы загружаются конвейером (load_table_pipelined)
+    с очередями на queue_size пачек. С rejects строки, которые Postgres не
+    принимает, пропускаются и записываются в файл отклонённых строк (см.
+    PostgresSaver.save_data_tolerant), сверка их не учитывает. Возвращает
+    метрики загрузки по таблицам.
+    """
+    metrics = metrics or LoadMetrics()
+    sqlite_loader = SQLiteLoader(connection, batch_size, metrics)
+
+    postgres_saver = PostgresSaver(pg_conn, copy_format, metrics)
     postgres_saver.create_db_schema()
-    postgres_saver.clear_tables_for_import()
+    postgres_saver.create_import_state()
+    if resume:
+        checkpoints = postgres_saver.get_checkpoints()
+    else:
+        checkpoints = {}
+        postgres_saver.clear_tables_for_import()
+        postgres_saver.clear_checkpoints()
+    pg_conn.commit()
+    metrics.start_server_copy(postgres_saver.cursor)
+    high_water_marks = get_high_water_marks(sqlite_loader)
+
+    for table in TABLES:
+        after_rowid, rows_committed = checkpoints.get(table.table_name, (0, 0))
+        if pipeline:
+            stats = load_table_pipelined(
+                sqlite_loader,
+                postgres_saver,
+                table,
+                after_rowid,
+                rows_committed,
+                queue_size,
+                rejects,
+            )
+            record_pipeline_stats(metrics, table.table_name, stats)
+            continue
+        for last_rowid, table_data in sqlite_loader.read_batches(
+            table.sqlite_table, after_rowid
+        ):
+            rows_count = len(table_data)
+            if rejects is None:
+                postgres_saver.save_data(table, table_data)
+            else:
+                rows_count -= postgres_saver.save_data_tolerant(
+                    table, table_data, rejects
+                )
+            rows_committed += rows_count
+            postgres_saver.save_checkpoint(table.table_name, last_rowid, rows_committed)
+            pg_conn.commit()
+
+    set_high_water_marks(postgres_saver, high_water_marks)
+
+    check_loaded_data(
+        connection,
+        pg_conn,
+        metrics=metrics,
+        excluded_rowids=rejects.rowids if rejects else None,
+    )
+    pg_conn.commit()
+    metrics.finish_server_copy(postgres_saver.cursor)
+
+    print("Import completed!")
+    return metrics
+
+
+def sync_from_sqlite(
+    connection: sqlite3.Connection,
+    pg_conn: _connection,
+    batch_size: int = BATCH_SIZE,
+    copy_format: str = "binary",
+    metrics: LoadMetrics = None,
+) -> LoadMetrics:
+    """
+    Инкрементальная синхронизация SQLite и Postgres.
+
+    Для каждой таблицы хранится отметка последнего перенесённого изменения
+    (updated_at, для связующих таблиц created_at). Переносятся только строки
+    новее отметки: они копируются во временную таблицу и сливаются в content
+    через INSERT ... ON CONFLICT DO UPDATE. Таблицы не очищаются, удаления
+    строк в SQLite не отслеживаются.
+    """
+    metrics = metrics or LoadMetrics()
+    sqlite_loader = SQLiteLoader(connection, batch_size, metrics)
+    postgres_saver = PostgresSaver(pg_conn, copy_format, metrics)
+    postgres_saver.create_db_schema()
+    postgres_saver.create_import_state()
+
+    for table in TABLES:
+        high_water_mark = postgres_saver.get_high_water_mark(table.table_name)
+        last_change = sqlite_loader.last_change(table.sqlite_table)
+        if last_change is None or last_change == high_water_mark:
+            continue
+
+        staging_table = postgres_saver.create_staging_table(table)
+        for table_data in sqlite_loader.read_table(
+            table.sqlite_table, changed_between=(high_water_mark, last_change)
+        ):
+            postgres_saver.save_data(table, table_data, staging_table)
+        merged_rows = postgres_saver.merge_staging_table(table, staging_table)
+        postgres_saver.set_high_water_mark(table.table_name, last_change)
+        print(f"{table.table_name}: {merged_rows} rows merged")
+
+    print("Sync completed!")
+    return metrics
+
+
+def load_order(tables: List[str]) -> List[List[str]]:
+    """Разбивает таблицы на волны: таблица попадает в волну после всех родителей."""
+    waves, loaded = [], set()
+    while len(loaded) < len(tables):
+        wave = [
+            table
+            for table in tables
+            if table not in loaded
+            and all(parent in loaded for parent in TABLE_SCHEMAS[table].dependencies)
+        ]
+        if not wave:
+            raise ValueError(f"Cyclic dependencies: {set(tables) - loaded}")
+        waves.append(wave)
+        loaded.update(wave)
+    return waves
 
-    for table_data in data_for_import:
-        postgres_saver.table_data = table_data
-        postgres_saver.save_data()
 
-    tables_for_checking = zip(
-        sqlite_loader.tables_for_export, postgres_saver.tables_for_import
+_worker_state: dict = {}
+
+
+def _init_worker(
+    sqlite_path: str,
+    dsl: dict,
+    batch_size: int,
+    copy_format: str,
+    target_schema: str = CONTENT_SCHEMA,
+):
+    pg_conn = psycopg2.connect(**dsl, cursor_factory=DictCursor)
+    _worker_state["sqlite_loader"] = SQLiteLoader(
+        sqlite3.connect(sqlite_path), batch_size
     )
+    _worker_state["postgres_saver"] = PostgresSaver(pg_conn, copy_format=copy_format)
+    _worker_state["target_schema"] = target_schema
+
+
+def _load_range(table_name: str, after_rowid: int, until_rowid: int) -> tuple:
+    """
+    Загружает диапазон строк таблицы воркером, фиксируя каждую пачку.
+
+    Триггеры сводки film_summary блокируют строки фильмов пачки в порядке
+    id, но транзакция на весь диапазон держала бы блокировки прошлых пачек,
+    и воркеры со связями одних фильмов взаимоблокировались бы. При сбое
+    загрузка всё равно очищает таблицы целиком.
+    """
+    sqlite_loader: SQLiteLoader = _worker_state["sqlite_loader"]
+    postgres_saver: PostgresSaver = _worker_state["postgres_saver"]
+    table = TABLE_SCHEMAS[table_name]
+    target_table = f"{_worker_state['target_schema']}.{table.table_name}"
+    started = time.perf_counter()
+    rows_count = 0
+    try:
+        for table_data in sqlite_loader.read_table(
+            table_name, after_rowid, until_rowid
+        ):
+            postgres_saver.save_data(table, table_data, target_table)
+            postgres_saver.connect.commit()
+            rows_count += len(table_data)
+    except Exception:
+        postgres_saver.connect.rollback()
+        raise
+    return os.getpid(), table_name, rows_count, time.perf_counter() - started
+
+
+def print_workers_throughput(results: List[tuple]):
+    workers: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+    for pid, _, rows_count, seconds in results:
+        workers[pid][0] += rows_count
+        workers[pid][1] += seconds
+    for number, (rows_count, seconds) in enumerate(workers.values(), start=1):
+        rows_per_second = rows_count / seconds if seconds else 0
+        print(
+            f"Worker {number}: {rows_count} rows in {seconds:.2f}s "
+            f"({rows_per_second:.0f} rows/s)"
+        )
+
+
+def _load_waves(
+    sqlite_loader: SQLiteLoader,
+    waves: Iterable[List[str]],
+    workers: int,
+    initargs: tuple,
+) -> List[tuple]:
+    """
+    Загружает таблицы волнами в пуле процессов: следующая волна начинается
+    после фиксации всех диапазонов предыдущей.
+    """
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=initargs
+    ) as executor:
+        for wave in waves:
+            futures = [
+                executor.submit(_load_range, table_name, *rowid_range)
+                for table_name in wave
+                for rowid_range in sqlite_loader.split_table(table_name, workers)
+            ]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            errors = [future.exception() for future in done]
+            errors = [error for error in errors if error is not None]
+            if errors:
+                for future in not_done:
+                    future.cancel()
+                wait(not_done)
+                raise errors[0]
+            results.extend(future.result() for future in futures)
+    return results
+
+
+def load_from_sqlite_parallel(
+    sqlite_path: str,
+    dsl: dict,
+    workers: int,
+    batch_size: int = BATCH_SIZE,
+    copy_format: str = "binary",
+):
+    """
+    Параллельная загрузка данных из SQLite в Postgres.
+
+    Каждая таблица делится на диапазоны rowid, которые загружают воркеры,
+    у каждого своё соединение и своя транзакция на пачку. Связующие
+    таблицы начинают загружаться только после фиксации родительских.
+    Если хоть один диапазон не загрузился, импортируемые таблицы очищаются,
+    так что в базе остаются либо все данные, либо ничего. Контрольные точки
+    прежней последовательной загрузки удаляются вместе с таблицами, иначе
+    resume продолжил бы с них поверх новых данных.
+    """
+    with sqlite3.connect(sqlite_path) as connection, psycopg2.connect(
+        **dsl, cursor_factory=DictCursor
+    ) as pg_conn:
+        sqlite_loader = SQLiteLoader(connection, batch_size)
+        postgres_saver = PostgresSaver(pg_conn, copy_format=copy_format)
+        postgres_saver.create_db_schema()
+        postgres_saver.create_import_state()
+        postgres_saver.clear_tables_for_import()
+        postgres_saver.clear_checkpoints()
+        pg_conn.commit()
+        high_water_marks = get_high_water_marks(sqlite_loader)
 
-    check_loaded_data(connection, pg_conn, tables_for_checking)
+        try:
+            results = _load_waves(
+                sqlite_loader,
+                load_order(sqlite_loader.tables_for_export),
+                workers,
+                initargs=(sqlite_path, dsl, batch_size, copy_format),
+            )
+        except BaseException:
+            pg_conn.rollback()
+            postgres_saver.clear_tables_for_import()
+            pg_conn.commit()
+            raise
+
+        check_loaded_data(connection, pg_conn)
+        set_high_water_marks(postgres_saver, high_water_marks)
 
+    print_workers_throughput(results)
     print("Import completed!")
 
 
-if __name__ == "__main__":
-    dsl = {
+def load_from_sqlite_bulk(
+    sqlite_path: str,
+    dsl: dict,
+    workers: int,
+    batch_size: int = BATCH_SIZE,
+    copy_format: str = "binary",
+    unlogged: bool = False,
+):
+    """
+    Полная загрузка через теневую схему.
+
+    Данные загружаются в копии таблиц без индексов и ограничений (при
+    unlogged - без записи в WAL), все таблицы сразу. Затем параллельно
+    строятся ключи и индексы, проверяются внешние ключи, и таблицы
+    подменяются в content одной транзакцией. До подмены в content остаются
+    прежние данные, админка их читает.
+    """
+    tables = list(TABLES)
+    with sqlite3.connect(sqlite_path) as connection, psycopg2.connect(
+        **dsl, cursor_factory=DictCursor
+    ) as pg_conn:
+        sqlite_loader = SQLiteLoader(connection, batch_size)
+        postgres_saver = PostgresSaver(pg_conn, copy_format=copy_format)
+        postgres_saver.create_db_schema()
+        postgres_saver.create_import_state()
+        with pg_conn.cursor() as cursor:
+            create_shadow_tables(cursor, tables, unlogged)
+        pg_conn.commit()
+        high_water_marks = get_high_water_marks(sqlite_loader)
+
+        try:
+            started = time.perf_counter()
+            results = _load_waves(
+                sqlite_loader,
+                [sqlite_loader.tables_for_export],
+                workers,
+                initargs=(sqlite_path, dsl, batch_size, copy_format, SHADOW_SCHEMA),
+            )
+            print(f"Rows loaded in {time.perf_counter() - started:.2f}s")
+
+            started = time.perf_counter()
+            if unlogged:
+                set_logged(dsl, tables, workers)
+            with pg_conn.cursor() as cursor:
+                indexes, foreign_keys, validations = shadow_ddl(cursor, tables)
+            pg_conn.commit()
+            execute_parallel(dsl, indexes, workers)
+            # Добавление внешнего ключа блокирует обе таблицы, поэтому
+            # без проверки и по очереди, а проверка идёт параллельно.
+            with pg_conn.cursor() as cursor:
+                for statement in foreign_keys:
+                    cursor.execute(statement)
+            pg_conn.commit()
+            execute_parallel(dsl, validations, workers)
+            print(f"Indexes built in {time.perf_counter() - started:.2f}s")
+
+            with pg_conn.cursor() as cursor:
+                # Триггеры сводки и журнала изменений не срабатывают на
+                # теневых таблицах: изменения находятся сравнением с content
+                # до подмены, сводка пересчитывается после.
+                cursor.execute(
+                    "SELECT content.record_load_changes(%s)", (SHADOW_SCHEMA,)
+                )
+                swap_tables(cursor, tables)
+                cursor.execute("SELECT content.rebuild_film_summary()")
+            pg_conn.commit()
+        except BaseException:
+            pg_conn.rollback()
+            with pg_conn.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE")
+            pg_conn.commit()
+            raise
+
+        with pg_conn.cursor() as cursor:
+            drop_retired_tables(cursor)
+        pg_conn.commit()
+        check_loaded_data(connection, pg_conn)
+        set_high_water_marks(postgres_saver, high_water_marks)
+        postgres_saver.clear_checkpoints()
+        pg_conn.commit()
+
+    print_workers_throughput(results)
+    print("Import completed!")
+
+
+def dsl_from_env() -> dict:
+    return {
         "dbname": os.environ.get("DB_NAME"),
         "user": os.environ.get("DB_USER"),
         "password": os.environ.get("DB_PASSWORD"),
@@ -291,7 +864,148 @@ if __name__ == "__main__":
         "port": os.environ.get("DB_PORT"),
         "options": "-c search_path=content",
     }
-    with sqlite3.connect("db.sqlite") as sqlite_conn, psycopg2.connect(
-        **dsl, cursor_factory=DictCursor
-    ) as pg_conn:
-        load_from_sqlite(sqlite_conn, pg_conn)
+
+
+def main(args: argparse.Namespace, dsl: dict):
+    if args.bulk:
+        load_from_sqlite_bulk(
+            SQLITE_PATH,
+            dsl,
+            args.workers,
+            args.batch_size,
+            args.copy_format,
+            args.unlogged,
+        )
+    elif args.workers > 1:
+        load_from_sqlite_parallel(
+            SQLITE_PATH, dsl, args.workers, args.batch_size, args.copy_format
+        )
+    else:
+        with sqlite3.connect(SQLITE_PATH) as sqlite_conn, psycopg2.connect(
+            **dsl, cursor_factory=DictCursor
+        ) as pg_conn:
+            if args.incremental:
+                metrics = sync_from_sqlite(
+                    sqlite_conn, pg_conn, args.batch_size, args.copy_format
+                )
+            else:
+                rejects = None
+                if args.reject_file:
+                    rejects = RejectLog(
+                        args.reject_file, args.max_rejects, append=args.resume
+                    )
+                try:
+                    metrics = load_from_sqlite(
+                        sqlite_conn,
+                        pg_conn,
+                        args.batch_size,
+                        args.copy_format,
+                        args.resume,
+                        pipeline=args.pipeline,
+                        queue_size=args.queue_size,
+                        rejects=rejects,
+                    )
+                finally:
+                    if rejects is not None:
+                        rejects.close()
+                if rejects is not None and rejects.count:
+                    print(f"{rejects.count} rows rejected, see {rejects.path}")
+        if args.metrics_jsonl:
+            metrics.write_jsonl(args.metrics_jsonl)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос данных из SQLite в Postgres")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--copy-format", choices=COPY_FORMATS, default="binary")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="число параллельных воркеров, у каждого своё соединение с Postgres",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="перенести только строки, изменённые с прошлого запуска",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="продолжить прерванную загрузку с последней контрольной точки",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="загрузить через теневую схему и подменить таблицы целиком",
+    )
+    parser.add_argument(
+        "--unlogged",
+        action="store_true",
+        help="в режиме --bulk загружать в таблицы без записи в WAL",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="читать, кодировать и записывать пачки одновременно в разных потоках",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=PIPELINE_QUEUE_SIZE,
+        help="в режиме --pipeline: сколько пачек может ждать следующую стадию",
+    )
+    parser.add_argument(
+        "--reject-file",
+        help="пропускать строки, которые Postgres не принимает, "
+        "и записывать их с ошибкой в этот файл JSON Lines",
+    )
+    parser.add_argument(
+        "--max-rejects",
+        type=int,
+        help=f"с --reject-file: остановиться, если отклонено больше строк "
+        f"(по умолчанию {MAX_REJECTS})",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        help="дописать метрики загрузки по таблицам в файл JSON Lines",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        help="записать метрики загрузки в textfile для Prometheus",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        help="профилировать запуск: cpu - cProfile, memory - tracemalloc",
+    )
+    parser.add_argument("--profile-output", help="файл для результата профилирования")
+    args = parser.parse_args()
+
+    dsl = dsl_from_env()
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental is not supported with --workers")
+    if args.resume and (args.incremental or args.workers > 1):
+        parser.error("--resume is supported only for a sequential full load")
+
+    if args.bulk and (args.incremental or args.resume):
+        parser.error("--bulk is supported only for a full load")
+    if args.unlogged and not args.bulk:
+        parser.error("--unlogged requires --bulk")
+    if args.pipeline and (args.bulk or args.incremental or args.workers > 1):
+        parser.error("--pipeline is supported only for a sequential full load")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be positive")
+    if args.reject_file and (args.bulk or args.incremental or args.workers > 1):
+        parser.error("--reject-file is supported only for a sequential full load")
+    if args.max_rejects is not None and not args.reject_file:
+        parser.error("--max-rejects requires --reject-file")
+    if args.max_rejects is None:
+        args.max_rejects = MAX_REJECTS
+    if (args.metrics_jsonl or args.metrics_prom) and (args.bulk or args.workers > 1):
+        parser.error("metrics are collected only for a sequential load")
+
+    with profiling(args.profile, args.profile_output):
+        main(args, dsl)
@@ -0,0 +1,262 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2.extensions import cursor as _cursor
+
+PROFILE_MODES = ("cpu", "memory")
+PROFILE_TOP = 25
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+METRIC_PREFIX = "sqlite_to_postgres"
+
+_COPY_TARGET = re.compile(r"^\s*COPY\s+(?:\w+\.)?(\w+)", re.IGNORECASE)
+
+
+def quantile(values: List[float], q: float) -> float:
+    """Квантиль по ближайшему рангу, для пустого списка 0."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+@dataclass
+class TableMetrics:
+    table: str
+    seconds: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    rows: int = 0
+    batches: int = 0
+    bytes_sent: int = 0
+    batch_latencies: List[float] = field(default_factory=list)
+    server_copy_seconds: Optional[float] = None
+
+    def as_record(self) -> dict:
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "batches": self.batches,
+            "bytes_sent": self.bytes_sent,
+            "seconds": {
+                stage: round(value, 6) for stage, value in self.seconds.items()
+            },
+            "batch_latency": {
+                f"p{round(q * 100)}": round(quantile(self.batch_latencies, q), 6)
+                for q in LATENCY_QUANTILES
+            },
+            "server_copy_seconds": self.server_copy_seconds,
+        }
+
+
+class LoadMetrics:
+    """
+    Метрики одного запуска загрузчика по таблицам: время этапов (read,
+    copy, clear, verify), число строк и пачек, объём отправленных в COPY
+    данных, задержки пачек COPY и время COPY на сервере.
+
+    Время COPY на сервере берётся из pg_stat_statements как разница
+    total_exec_time до и после загрузки; если расширение не установлено,
+    оно остаётся None.
+    """
+
+    def __init__(self):
+        self.run_id: str = uuid.uuid4().hex
+        self.started_at: float = time.time()
+        self.tables: Dict[str, TableMetrics] = {}
+        self._server_copy_before: Optional[Dict[str, float]] = None
+
+    def table(self, table: str) -> TableMetrics:
+        if table not in self.tables:
+            self.tables[table] = TableMetrics(table)
+        return self.tables[table]
+
+    @contextmanager
+    def stage(self, table: str, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.table(table).seconds[stage] += time.perf_counter() - started
+
+    def record_read(self, table: str, seconds: float):
+        self.table(table).seconds["read"] += seconds
+
+    def record_batch(self, table: str, rows: int, bytes_sent: int, seconds: float):
+        metrics = self.table(table)
+        metrics.seconds["copy"] += seconds
+        metrics.rows += rows
+        metrics.batches += 1
+        metrics.bytes_sent += bytes_sent
+        metrics.batch_latencies.append(seconds)
+
+    def start_server_copy(self, cursor: _cursor):
+        self._server_copy_before = server_copy_seconds(cursor)
+
+    def finish_server_copy(self, cursor: _cursor):
+        if self._server_copy_before is None:
+            return
+        server_copy_after = server_copy_seconds(cursor)
+        if server_copy_after is None:
+            return
+        for table, seconds in server_copy_after.items():
+            if table in self.tables:
+                before = self._server_copy_before.get(table, 0.0)
+                self.tables[table].server_copy_seconds = round(seconds - before, 6)
+
+    def records(self) -> List[dict]:
+        return [
+            {
+                "run_id": self.run_id,
+                "started_at": self.started_at,
+                **metrics.as_record(),
+            }
+            for metrics in self.tables.values()
+        ]
+
+    def write_jsonl(self, path: str):
+        """Дописывает в файл по строке JSON на таблицу."""
+        with open(path, "a") as output:
+            for record in self.records():
+                output.write(json.dumps(record) + "\n")
+
+    def write_prometheus(self, path: str):
+        """
+        Записывает метрики в текстовом формате Prometheus (для textfile
+        collector node_exporter). Файл подменяется целиком через rename.
+        """
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{label_text}}} {value}")
+
+        tables = list(self.tables.values())
+        metric(
+            "stage_seconds",
+            "gauge",
+            "Wall time of a loader stage.",
+            [
+                ("", (("table", item.table), ("stage", stage)), seconds)
+                for item in tables
+                for stage, seconds in item.seconds.items()
+            ],
+        )
+        metric(
+            "rows",
+            "gauge",
+            "Rows copied to PostgreSQL.",
+            [("", (("table", item.table),), item.rows) for item in tables],
+        )
+        metric(
+            "bytes_sent",
+            "gauge",
+            "Bytes sent to PostgreSQL with COPY.",
+            [("", (("table", item.table),), item.bytes_sent) for item in tables],
+        )
+        latency_samples = []
+        for item in tables:
+            labels = (("table", item.table),)
+            for q in LATENCY_QUANTILES:
+                latency_samples.append(
+                    ("", labels + (("quantile", q),), quantile(item.batch_latencies, q))
+                )
+            latency_samples.append(("_sum", labels, sum(item.batch_latencies)))
+            latency_samples.append(("_count", labels, len(item.batch_latencies)))
+        metric(
+            "batch_latency_seconds",
+            "summary",
+            "Latency of a single COPY batch.",
+            latency_samples,
+        )
+        metric(
+            "server_copy_seconds",
+            "gauge",
+            "COPY execution time reported by pg_stat_statements.",
+            [
+                ("", (("table", item.table),), item.server_copy_seconds)
+                for item in tables
+                if item.server_copy_seconds is not None
+            ],
+        )
+        metric(
+            "last_run_timestamp_seconds",
+            "gauge",
+            "Start time of the last loader run.",
+            [("", (), self.started_at)],
+        )
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as output:
+            output.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+
+
+def server_copy_seconds(cursor: _cursor) -> Optional[Dict[str, float]]:
+    """Суммарное время COPY по таблицам из pg_stat_statements."""
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if cursor.fetchone() is None:
+        return None
+    try:
+        cursor.execute(
+            "SELECT query, total_exec_time FROM pg_stat_statements "
+            "WHERE query ILIKE 'COPY %'"
+        )
+        rows = cursor.fetchall()
+    except psycopg2.Error:
+        # Расширение создано, но не загружено через shared_preload_libraries.
+        cursor.connection.rollback()
+        return None
+    seconds: Dict[str, float] = defaultdict(float)
+    for query, total_exec_time in rows:
+        match = _COPY_TARGET.match(query)
+        if match:
+            seconds[match.group(1)] += total_exec_time / 1000
+    return seconds
+
+
+@contextmanager
+def profiling(mode: Optional[str], output: str = None):
+    """
+    Профилирование одного запуска: cpu - cProfile, результат сохраняется
+    в output для pstats/snakeviz; memory - tracemalloc, снимок сохраняется
+    в output. В обоих случаях печатаются самые тяжёлые места.
+    """
+    if mode is None:
+        yield
+        return
+    output = output or f"load_data.{mode}.prof"
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    elif mode == "memory":
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(output)
+            for statistic in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                print(statistic)
+            print(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}")
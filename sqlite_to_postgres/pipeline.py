@@ -0,0 +1,160 @@
+"""
+Конвейер из потоков, связанных ограниченными очередями.
+
+Источник читается в вызывающем потоке (соединение sqlite3 нельзя
+использовать из другого потока), каждая стадия работает в своём потоке.
+Полная очередь останавливает предыдущую стадию, поэтому между соседними
+стадиями в памяти не больше queue_size элементов. Ошибка любой стадии
+отменяет остальные и поднимается в вызывающем потоке.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+PIPELINE_QUEUE_SIZE = 4
+# Как часто ожидающая стадия проверяет, не отменён ли конвейер.
+POLL_INTERVAL = 0.1
+
+_END = object()
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+@dataclass
+class StageStats:
+    """
+    Время стадии: busy - работа, starved - ожидание элемента от предыдущей
+    стадии, blocked - ожидание места в очереди следующей.
+    """
+
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    starved_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+
+class _Channel:
+    """Ограниченная очередь, ожидание в которой прерывается отменой."""
+
+    def __init__(self, size: int, cancelled: threading.Event):
+        self._queue: queue.Queue = queue.Queue(maxsize=size)
+        self._cancelled = cancelled
+
+    def put(self, item) -> float:
+        started = time.perf_counter()
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            return time.perf_counter() - started
+        raise PipelineCancelled
+
+    def get(self) -> Tuple[Any, float]:
+        started = time.perf_counter()
+        while not self._cancelled.is_set():
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            return item, time.perf_counter() - started
+        raise PipelineCancelled
+
+
+def _run_stage(
+    handler: Callable,
+    inbox: _Channel,
+    outbox: Optional[_Channel],
+    stats: StageStats,
+    errors: list,
+    cancelled: threading.Event,
+):
+    try:
+        while True:
+            item, waited = inbox.get()
+            stats.starved_seconds += waited
+            if item is _END:
+                break
+            started = time.perf_counter()
+            result = handler(item)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += 1
+            if outbox is not None:
+                stats.blocked_seconds += outbox.put(result)
+        if outbox is not None:
+            outbox.put(_END)
+    except PipelineCancelled:
+        pass
+    except BaseException as error:
+        errors.append(error)
+        cancelled.set()
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: Sequence[Tuple[str, Callable]],
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    source_name: str = "source",
+) -> List[StageStats]:
+    """
+    Пропускает элементы source через стадии (имя, функция): результат
+    каждой функции передаётся следующей, результат последней отбрасывается.
+    Возвращает статистику источника и стадий по порядку.
+
+    Отмена срабатывает между элементами: стадия, занятая элементом,
+    сначала его дообработает.
+    """
+    cancelled = threading.Event()
+    channels = [_Channel(queue_size, cancelled) for _ in stages]
+    stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+    errors: list = []
+    threads = [
+        threading.Thread(
+            target=_run_stage,
+            args=(
+                handler,
+                channels[number],
+                channels[number + 1] if number + 1 < len(channels) else None,
+                stats[number + 1],
+                errors,
+                cancelled,
+            ),
+            name=f"pipeline-{name}",
+            daemon=True,
+        )
+        for number, (name, handler) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    source_stats = stats[0]
+    items = iter(source)
+    try:
+        while True:
+            started = time.perf_counter()
+            item = next(items, _END)
+            if item is _END:
+                break
+            source_stats.busy_seconds += time.perf_counter() - started
+            source_stats.items += 1
+            source_stats.blocked_seconds += channels[0].put(item)
+        channels[0].put(_END)
+    except PipelineCancelled:
+        pass
+    except BaseException:
+        cancelled.set()
+        raise
+    finally:
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return stats
@@ -0,0 +1,61 @@
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Sequence, Set
+
+from schema import TableSchema
+
+MAX_REJECTS = 100
+
+
+class TooManyRejects(ValueError):
+    pass
+
+
+class RejectLog:
+    """
+    Отклонённые при загрузке строки в файле JSON Lines: таблица SQLite,
+    rowid, значения по колонкам Postgres и ошибка записи.
+
+    При append=True (продолжение загрузки) файл дописывается, а уже
+    записанные в нём строки учитываются в лимите и при сверке данных.
+    Превышение max_rejects останавливает загрузку.
+    """
+
+    def __init__(self, path: str, max_rejects: int = MAX_REJECTS, append=False):
+        self.path: str = path
+        self.max_rejects: int = max_rejects
+        self.rowids: Dict[str, Set[int]] = defaultdict(set)
+        self.count: int = 0
+        if append and os.path.exists(path):
+            with open(path) as previous:
+                for line in previous:
+                    record = json.loads(line)
+                    self.rowids[record["table"]].add(record["rowid"])
+                    self.count += 1
+        self._file = open(path, "a" if append else "w")
+
+    def add(self, table: TableSchema, row: Sequence, error: str):
+        """Записывает строку (кортеж загрузчика, последним идёт rowid)."""
+        rowid = row[-1]
+        if rowid in self.rowids[table.sqlite_table]:
+            # Пачку, на которой загрузка остановилась, продолжение повторяет.
+            return
+        record = {
+            "table": table.sqlite_table,
+            "rowid": rowid,
+            "row": dict(zip(table.field_names, row)),
+            "error": error,
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        self.rowids[table.sqlite_table].add(rowid)
+        self.count += 1
+        if self.count > self.max_rejects:
+            raise TooManyRejects(
+                f"Too many rejected rows: {self.count} > {self.max_rejects}, "
+                f"see {self.path}"
+            )
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Optional, Tuple
+
+from copy_stream import RowCodec, row_codec
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    type: str
+    sqlite_name: Optional[str] = None
+
+    @property
+    def sqlite_column(self) -> str:
+        return self.sqlite_name or self.name
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Описание переносимой таблицы: имена в SQLite и Postgres, типы колонок,
+    ключ сопоставления строк и таблицы, на которые она ссылается.
+
+    Строки таблицы передаются обычными кортежами в порядке columns, всё,
+    что нужно для их чтения и записи, вычисляется один раз на таблицу.
+    """
+
+    sqlite_table: str
+    table_name: str
+    columns: Tuple[Column, ...]
+    conflict_keys: Tuple[str, ...] = ("id",)
+    dependencies: Tuple[str, ...] = ()
+
+    @cached_property
+    def field_names(self) -> Tuple[str, ...]:
+        return tuple(column.name for column in self.columns)
+
+    @cached_property
+    def field_types(self) -> Tuple[str, ...]:
+        return tuple(column.type for column in self.columns)
+
+    @cached_property
+    def sqlite_columns(self) -> Tuple[str, ...]:
+        return tuple(column.sqlite_column for column in self.columns)
+
+    @cached_property
+    def changed_at_column(self) -> str:
+        if "updated_at" in self.field_names:
+            return "coalesce(updated_at, created_at)"
+        return "created_at"
+
+    def codec(self, copy_format: str = "binary") -> RowCodec:
+        return row_codec(self.field_types, copy_format)
+
+
+FILMWORK = TableSchema(
+    sqlite_table="film_work",
+    table_name="filmwork",
+    columns=(
+        Column("id", "uuid"),
+        Column("title", "text"),
+        Column("description", "text"),
+        Column("creation_date", "date"),
+        Column("certificate", "text"),
+        Column("file_path", "text"),
+        Column("rating", "float8"),
+        Column("type", "text"),
+        Column("created_at", "timestamptz"),
+        Column("updated_at", "timestamptz"),
+    ),
+)
+
+GENRE = TableSchema(
+    sqlite_table="genre",
+    table_name="genre",
+    columns=(
+        Column("id", "uuid"),
+        Column("name", "text"),
+        Column("description", "text"),
+        Column("created_at", "timestamptz"),
+        Column("updated_at", "timestamptz"),
+    ),
+)
+
+PERSON = TableSchema(
+    sqlite_table="person",
+    table_name="person",
+    columns=(
+        Column("id", "uuid"),
+        Column("full_name", "text"),
+        Column("birth_date", "date"),
+        Column("created_at", "timestamptz"),
+        Column("updated_at", "timestamptz"),
+    ),
+)
+
+GENRE_FILMWORK = TableSchema(
+    sqlite_table="genre_film_work",
+    table_name="genre_filmwork",
+    columns=(
+        Column("filmwork_id", "uuid", sqlite_name="film_work_id"),
+        Column("genre_id", "uuid"),
+        Column("created_at", "timestamptz"),
+    ),
+    conflict_keys=("filmwork_id", "genre_id"),
+    dependencies=("film_work", "genre"),
+)
+
+PERSON_FILMWORK = TableSchema(
+    sqlite_table="person_film_work",
+    table_name="person_filmwork",
+    columns=(
+        Column("filmwork_id", "uuid", sqlite_name="film_work_id"),
+        Column("person_id", "uuid"),
+        Column("role", "text"),
+        Column("created_at", "timestamptz"),
+    ),
+    conflict_keys=("filmwork_id", "person_id", "role"),
+    dependencies=("film_work", "person"),
+)
+
+# Переносимые таблицы в порядке, не нарушающем внешние ключи.
+TABLES: Tuple[TableSchema, ...] = (
+    FILMWORK,
+    GENRE,
+    PERSON,
+    GENRE_FILMWORK,
+    PERSON_FILMWORK,
+)
+
+TABLE_SCHEMAS: Dict[str, TableSchema] = {table.sqlite_table: table for table in TABLES}
@@ -0,0 +1,243 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+
+import psycopg2
+from psycopg2.extensions import cursor as _cursor
+
+from schema import TableSchema
+
+CONTENT_SCHEMA = "content"
+SHADOW_SCHEMA = "content_shadow"
+RETIRED_SCHEMA = "content_retired"
+
+SWAP_LOCK_TIMEOUT = "10s"
+
+
+def _to_shadow(definition: str, table_names: List[str]) -> str:
+    """
+    Переносит в теневую схему ссылки на загружаемые таблицы. Функции
+    content в выражениях индексов остаются на месте.
+    """
+    qualifier = re.compile(
+        rf"\b{CONTENT_SCHEMA}\.(?=(?:{'|'.join(map(re.escape, table_names))})\b)"
+    )
+    return qualifier.sub(f"{SHADOW_SCHEMA}.", definition)
+
+
+def create_shadow_tables(
+    cursor: _cursor, tables: Iterable[TableSchema], unlogged: bool = False
+):
+    """
+    Создаёт теневую схему с копиями таблиц content без индексов и ограничений.
+
+    Колонки с nextval() получают собственные последовательности, чтобы не
+    зависеть от последовательностей таблиц, которые будут заменены.
+    Триггеры копируются, так как они заполняют вычисляемые колонки и после
+    подмены должны остаться на таблицах.
+    """
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SHADOW_SCHEMA}")
+    table_kind = "UNLOGGED TABLE" if unlogged else "TABLE"
+    for table in tables:
+        name = table.table_name
+        cursor.execute(
+            f"CREATE {table_kind} {SHADOW_SCHEMA}.{name} "
+            f"(LIKE {CONTENT_SCHEMA}.{name})"
+        )
+        cursor.execute(
+            """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+              AND column_default LIKE 'nextval(%%'
+            """,
+            (CONTENT_SCHEMA, name),
+        )
+        for (column,) in cursor.fetchall():
+            sequence = f"{SHADOW_SCHEMA}.{name}_{column}_seq"
+            cursor.execute(
+                f"CREATE SEQUENCE {sequence} "
+                f"OWNED BY {SHADOW_SCHEMA}.{name}.{column}"
+            )
+            cursor.execute(
+                f"ALTER TABLE {SHADOW_SCHEMA}.{name} "
+                f"ALTER COLUMN {column} SET DEFAULT nextval('{sequence}')"
+            )
+        cursor.execute("SET LOCAL search_path TO pg_catalog")
+        cursor.execute(
+            "SELECT pg_get_triggerdef(oid) FROM pg_trigger "
+            "WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+            (f"{CONTENT_SCHEMA}.{name}",),
+        )
+        triggers = cursor.fetchall()
+        cursor.execute("RESET search_path")
+        for (definition,) in triggers:
+            cursor.execute(
+                definition.replace(
+                    f" ON {CONTENT_SCHEMA}.{name} ", f" ON {SHADOW_SCHEMA}.{name} ", 1
+                )
+            )
+
+
+def shadow_ddl(
+    cursor: _cursor, tables: Iterable[TableSchema]
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Собирает по каталогу content команды для теневых таблиц: ключи и
+    индексы, добавление внешних ключей без проверки и их проверку.
+    """
+    table_names = [table.table_name for table in tables]
+    # Без search_path каталог возвращает имена, полностью квалифицированные схемой.
+    cursor.execute("SET LOCAL search_path TO pg_catalog")
+    cursor.execute(
+        """
+        SELECT con.conname, con.contype, rel.relname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class rel ON rel.oid = con.conrelid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        WHERE nsp.nspname = %s AND rel.relname = ANY(%s)
+          AND con.contype IN ('p', 'u', 'f', 'c')
+        ORDER BY con.conname
+        """,
+        (CONTENT_SCHEMA, table_names),
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(idx.indexrelid)
+        FROM pg_index idx
+        JOIN pg_class rel ON rel.oid = idx.indrelid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        WHERE nsp.nspname = %s AND rel.relname = ANY(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = idx.indexrelid AND con.contype IN ('p', 'u', 'x')
+          )
+        """,
+        (CONTENT_SCHEMA, table_names),
+    )
+    indexes = [
+        _to_shadow(definition, table_names) for (definition,) in cursor.fetchall()
+    ]
+    cursor.execute("RESET search_path")
+
+    keys, foreign_keys, validations = [], [], []
+    for name, kind, table, definition in constraints:
+        alter_table = f"ALTER TABLE {SHADOW_SCHEMA}.{table}"
+        if kind in ("p", "u"):
+            keys.append(f"{alter_table} ADD CONSTRAINT {name} {definition}")
+        else:
+            definition = _to_shadow(definition, table_names)
+            foreign_keys.append(
+                f"{alter_table} ADD CONSTRAINT {name} {definition} NOT VALID"
+            )
+            validations.append(f"{alter_table} VALIDATE CONSTRAINT {name}")
+    return keys + indexes, foreign_keys, validations
+
+
+def _execute_autocommit(dsl: dict, statement: str):
+    with psycopg2.connect(**dsl) as pg_conn:
+        pg_conn.autocommit = True
+        with pg_conn.cursor() as cursor:
+            cursor.execute(statement)
+
+
+def execute_parallel(dsl: dict, statements: List[str], workers: int):
+    """Выполняет независимые команды DDL, каждую в своём соединении."""
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for future in [
+            executor.submit(_execute_autocommit, dsl, statement)
+            for statement in statements
+        ]:
+            future.result()
+
+
+def set_logged(dsl: dict, tables: Iterable[TableSchema], workers: int):
+    execute_parallel(
+        dsl,
+        [
+            f"ALTER TABLE {SHADOW_SCHEMA}.{table.table_name} SET LOGGED"
+            for table in tables
+        ],
+        workers,
+    )
+
+
+def swap_tables(cursor: _cursor, tables: Iterable[TableSchema]):
+    """
+    Подменяет таблицы content теневыми в одной транзакции.
+
+    Старые таблицы переносятся в схему content_retired вместе с индексами и
+    последовательностями, остальные объекты content не затрагиваются.
+    Внешние ключи других таблиц content на заменяемые таблицы и
+    представления, которые их читают, пересоздаются.
+    """
+    tables = list(tables)
+    table_names = [table.table_name for table in tables]
+    cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+    cursor.execute("SET LOCAL search_path TO pg_catalog")
+    cursor.execute(
+        """
+        SELECT con.conname, rel.relname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class rel ON rel.oid = con.conrelid
+        JOIN pg_class ref ON ref.oid = con.confrelid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        JOIN pg_namespace ref_nsp ON ref_nsp.oid = ref.relnamespace
+        WHERE con.contype = 'f'
+          AND nsp.nspname = %s AND NOT rel.relname = ANY(%s)
+          AND ref_nsp.nspname = %s AND ref.relname = ANY(%s)
+        """,
+        (CONTENT_SCHEMA, table_names, CONTENT_SCHEMA, table_names),
+    )
+    external_foreign_keys = cursor.fetchall()
+    # Представления ссылаются на таблицы по oid и после переноса старых
+    # таблиц в content_retired указывали бы на них, поэтому пересоздаются.
+    cursor.execute(
+        """
+        SELECT DISTINCT view.relname, pg_get_viewdef(view.oid)
+        FROM pg_depend dep
+        JOIN pg_rewrite rule ON rule.oid = dep.objid
+        JOIN pg_class view ON view.oid = rule.ev_class
+        JOIN pg_namespace view_nsp ON view_nsp.oid = view.relnamespace
+        JOIN pg_class rel ON rel.oid = dep.refobjid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        WHERE dep.classid = 'pg_rewrite'::regclass
+          AND dep.refclassid = 'pg_class'::regclass
+          AND view.relkind = 'v' AND view.oid <> rel.oid
+          AND view_nsp.nspname = %s
+          AND nsp.nspname = %s AND rel.relname = ANY(%s)
+        """,
+        (CONTENT_SCHEMA, CONTENT_SCHEMA, table_names),
+    )
+    dependent_views = cursor.fetchall()
+    cursor.execute("RESET search_path")
+
+    cursor.execute(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {RETIRED_SCHEMA}")
+    for name, table, _ in external_foreign_keys:
+        cursor.execute(f"ALTER TABLE {CONTENT_SCHEMA}.{table} DROP CONSTRAINT {name}")
+    for table_name in table_names:
+        cursor.execute(
+            f"ALTER TABLE {CONTENT_SCHEMA}.{table_name} SET SCHEMA {RETIRED_SCHEMA}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {SHADOW_SCHEMA}.{table_name} SET SCHEMA {CONTENT_SCHEMA}"
+        )
+    for name, table, definition in external_foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {CONTENT_SCHEMA}.{table} "
+            f"ADD CONSTRAINT {name} {definition} NOT VALID"
+        )
+        cursor.execute(
+            f"ALTER TABLE {CONTENT_SCHEMA}.{table} VALIDATE CONSTRAINT {name}"
+        )
+    for name, definition in dependent_views:
+        cursor.execute(
+            f"CREATE OR REPLACE VIEW {CONTENT_SCHEMA}.{name} AS {definition}"
+        )
+    cursor.execute(f"DROP SCHEMA {SHADOW_SCHEMA}")
+
+
+def drop_retired_tables(cursor: _cursor):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE")
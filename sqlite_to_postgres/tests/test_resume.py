@@ -0,0 +1,167 @@
+"""
+Продолжение прерванной загрузки: сбой посреди таблицы, повторный запуск
+с resume=True и сравнение результата с чистой загрузкой. Параллельная
+загрузка после прерванной не оставляет её контрольных точек.
+
+Нужен Postgres из переменных окружения DB_*: тест создаёт отдельную базу
+test_<DB_NAME>_loader и удаляет её в конце. Запуск из каталога
+sqlite_to_postgres:
+
+    python -m unittest discover tests
+"""
+import io
+import sqlite3
+import unittest
+from collections import Counter
+from contextlib import closing, redirect_stdout
+from unittest import mock
+
+import psycopg2
+
+from load_data import (
+    BATCH_SIZE,
+    PostgresSaver,
+    dsl_from_env,
+    load_from_sqlite,
+    load_from_sqlite_parallel,
+)
+from schema import TABLE_SCHEMAS, TABLES
+
+SQLITE_PATH = "db.sqlite"
+
+
+class InjectedFailure(Exception):
+    pass
+
+
+def fail_after_copy(sqlite_table: str, batch_number: int):
+    """
+    Падение после COPY пачки batch_number таблицы, до фиксации её
+    контрольной точки: строки пачки уже переданы, но не зафиксированы.
+    """
+    table_name = TABLE_SCHEMAS[sqlite_table].table_name
+    copy = PostgresSaver._copy
+    calls = Counter()
+
+    def failing_copy(self, table, *args, **kwargs):
+        copy(self, table, *args, **kwargs)
+        calls[table.table_name] += 1
+        if table.table_name == table_name and calls[table_name] == batch_number:
+            raise InjectedFailure(f"{sqlite_table}, batch {batch_number}")
+
+    return mock.patch.object(PostgresSaver, "_copy", failing_copy)
+
+
+class ResumeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dsl = dsl_from_env()
+        cls.test_db = f"test_{dsl['dbname']}_loader"
+        cls.admin_dsl = dsl
+        cls.dsl = {**dsl, "dbname": cls.test_db}
+        cls._execute_admin(f"DROP DATABASE IF EXISTS {cls.test_db}")
+        cls._execute_admin(f"CREATE DATABASE {cls.test_db}")
+        cls.load()
+        cls.clean_rows = cls.table_rows()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._execute_admin(f"DROP DATABASE IF EXISTS {cls.test_db}")
+
+    @classmethod
+    def _execute_admin(cls, sql: str):
+        with closing(psycopg2.connect(**cls.admin_dsl)) as pg_conn:
+            pg_conn.autocommit = True
+            with pg_conn.cursor() as cursor:
+                cursor.execute(sql)
+
+    @classmethod
+    def load(cls, **kwargs):
+        with closing(sqlite3.connect(SQLITE_PATH)) as connection, closing(
+            psycopg2.connect(**cls.dsl)
+        ) as pg_conn, redirect_stdout(io.StringIO()):
+            load_from_sqlite(connection, pg_conn, **kwargs)
+
+    @classmethod
+    def table_rows(cls) -> dict:
+        """Строки таблиц по колонкам загрузчика, со всеми повторами."""
+        rows = {}
+        with closing(
+            psycopg2.connect(**cls.dsl)
+        ) as pg_conn, pg_conn.cursor() as cursor:
+            for table in TABLES:
+                columns = ", ".join(table.field_names)
+                cursor.execute(
+                    f"SELECT {columns} FROM content.{table.table_name} "
+                    f"ORDER BY {columns}"
+                )
+                rows[table.table_name] = cursor.fetchall()
+        return rows
+
+    def checkpoint(self, table_name: str):
+        with closing(
+            psycopg2.connect(**self.dsl)
+        ) as pg_conn, pg_conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT last_rowid, rows_committed FROM content.import_checkpoint "
+                "WHERE table_name = %s",
+                (table_name,),
+            )
+            return cursor.fetchone()
+
+    def assert_resume_matches_clean_load(
+        self, sqlite_table: str, batch_number: int, **kwargs
+    ):
+        with fail_after_copy(sqlite_table, batch_number):
+            with self.assertRaises(InjectedFailure):
+                self.load(**kwargs)
+
+        table_name = TABLE_SCHEMAS[sqlite_table].table_name
+        committed = (batch_number - 1) * BATCH_SIZE
+        if committed:
+            self.assertEqual(self.checkpoint(table_name)[1], committed)
+        else:
+            self.assertIsNone(self.checkpoint(table_name))
+        self.assertEqual(len(self.table_rows()[table_name]), committed)
+
+        self.load(resume=True, **kwargs)
+        resumed_rows = self.table_rows()
+        for table in TABLES:
+            with self.subTest(table=table.table_name):
+                self.assertEqual(
+                    len(resumed_rows[table.table_name]),
+                    len(self.clean_rows[table.table_name]),
+                )
+                self.assertEqual(
+                    resumed_rows[table.table_name], self.clean_rows[table.table_name]
+                )
+
+    def test_resume_after_failure_in_first_batch(self):
+        self.assert_resume_matches_clean_load("genre", 1)
+
+    def test_resume_after_failure_mid_table(self):
+        self.assert_resume_matches_clean_load("person_film_work", 5)
+
+    def test_resume_after_failure_in_last_batch_of_table(self):
+        self.assert_resume_matches_clean_load("film_work", 2)
+
+    def test_resume_pipelined_load(self):
+        self.assert_resume_matches_clean_load("person_film_work", 5, pipeline=True)
+
+    def test_parallel_load_clears_checkpoints(self):
+        with fail_after_copy("person_film_work", 5):
+            with self.assertRaises(InjectedFailure):
+                self.load()
+        table_name = TABLE_SCHEMAS["person_film_work"].table_name
+        self.assertIsNotNone(self.checkpoint(table_name))
+
+        with redirect_stdout(io.StringIO()):
+            load_from_sqlite_parallel(SQLITE_PATH, self.dsl, workers=2)
+        for table in TABLES:
+            with self.subTest(table=table.table_name):
+                self.assertIsNone(self.checkpoint(table.table_name))
+        self.assertEqual(self.table_rows(), self.clean_rows)
+
+
+if __name__ == "__main__":
+    unittest.main()